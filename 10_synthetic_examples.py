@@ -0,0 +1,340 @@
+# 10_synthetic_examples.py
+# Générateur d'exemples bilingues FR/EN synthétiques, à offsets calculés
+#
+# Complète les ~45 BILINGUAL_EXAMPLES écrits à la main de 1_annotate_data.py :
+#   - des gabarits de phrases d'annonces (FR et EN) dont les emplacements
+#     {TYPE}, {PRICE}, {LOCATION}... sont remplis depuis KEYWORDS, les unités
+#     de surface / devises reconnues par AREA_REGEXES / PRICE_REGEXES et les
+#     lieux du CSV (index de 1_annotate_data.py --gazetteer) ;
+#   - les offsets de chaque entité sont calculés pendant la composition ;
+#   - génération paresseuse par blocs, chaque bloc ayant sa propre graine
+#     dérivée de --seed : sortie identique quel que soit le nombre de workers ;
+#   - écriture en flux vers un JSONL (.gz/.zst), un dossier de shards lu tel quel
+#     par 2_train_model.py, ou un stockage colonnaire .annstore.
+#
+# Usage:
+#   python 10_synthetic_examples.py --count 200000 --output synthetic/ --workers 8
+#   python 10_synthetic_examples.py --count 5000 --output train_data_bilingual_V3.jsonl --append
+#   python 10_synthetic_examples.py --count 10 --french-ratio 1.0 --output -   # aperçu
+
+import argparse
+import contextlib
+import importlib
+import itertools
+import json
+import os
+import random
+import re
+import string
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+annotate = importlib.import_module('1_annotate_data')
+
+# --- Configuration ---
+DEFAULT_COUNT = 100000
+DEFAULT_SEED = 42
+BLOCK_SIZE = 5000  # Exemples par bloc (unité de parallélisme et de graine)
+SHARD_SIZE = 100000  # Exemples par shard quand --output est un dossier
+SHARD_PATTERN = 'synthetic-{:05d}.jsonl.gz'
+FRENCH_RATIO = 0.6  # Part d'exemples français (le rappel FR est le point faible)
+
+# Répartition des KEYWORDS par langue (le reste de KEYWORDS est français)
+ENGLISH_KEYWORDS = {
+    'flat', 'apartment', 'house', 'sale', 'rent', 'buy', 'pool', 'garden',
+    'balcony', 'terrace', 'new', 'modern', 'luxury',
+}
+SHARED_KEYWORDS = {'villa', 'studio', 'duplex', 'penthouse', 'garage', 'parking'}
+FRENCH_TRANSACTION_NOUNS = {'vente', 'location'}  # "en vente" / "en location" ; les autres sont des verbes
+
+# Unités et devises : chaque forme doit être reconnue par AREA_REGEXES / PRICE_REGEXES (vérifié au chargement)
+AREA_UNITS = {
+    'fr': ['m²', 'm2', 'mètres carrés'],
+    'en': ['sq ft', 'sqft', 'square feet', 'm2'],
+}
+PRICE_FORMATS = {  # {n} = montant
+    'fr': ['{n} TND', '{n} euros', '{n} €', '€ {n}', '{n} dollars', '{n}k'],
+    'en': ['{n} Taka', '{n} USD', '$ {n}', '${n}', '{n} dollars', '{n} euros', '{n}k'],
+}
+BEDS_FORMATS = {'fr': ['{n} chambres', '{n} chambre'], 'en': ['{n} bedrooms', '{n} beds', '{n} bedroom']}
+BATHS_FORMATS = {'fr': ['{n} salle de bain', '{n} salle de bains'], 'en': ['{n} bathrooms', '{n} baths', '{n} bathroom']}
+
+TEMPLATES = {
+    'fr': [
+        "{TYPE} à {TRANSACTION_VERB} à {LOCATION}",
+        "{TYPE} {CONDITION} à {TRANSACTION_VERB} à {LOCATION}, {AREA}",
+        "{TYPE} de {AREA} en {TRANSACTION_NOUN} à {LOCATION} - Prix: {PRICE}",
+        "{TRANSACTION_VERB} {TYPE} {BEDS} et {BATHS} à {LOCATION}",
+        "Bel {TYPE} {CODE} de {AREA} avec {AMENITY} et {GARAGE}, {LOCATION}",
+        "{TYPE} {CODE} {CONDITION} à {TRANSACTION_VERB}, quartier {LOCATION}, prix {PRICE}",
+        "Cherche {TYPE} à {TRANSACTION_VERB} à {LOCATION}, budget max {PRICE}",
+        "{TYPE} {BEDS}, {BATHS}, {AMENITY} - {PRICE}",
+        "À {TRANSACTION_VERB} : {TYPE} {CONDITION} de {AREA} à {LOCATION} avec {GARAGE}",
+        "{TYPE} en {TRANSACTION_NOUN}, {LOCATION}, {AREA}, {PRICE}",
+        "{CODE} {CONDITION} avec {AMENITY} à {LOCATION}",
+        "Prix de {TRANSACTION_NOUN}: {PRICE}",
+    ],
+    'en': [
+        "{TYPE} for {TRANSACTION} in {LOCATION}",
+        "{CONDITION} {AREA} {TYPE} for {TRANSACTION} in {LOCATION}",
+        "{BEDS} {BATHS} {TYPE} for {TRANSACTION} in {LOCATION}, {PRICE}",
+        "{TRANSACTION} a {CONDITION} {TYPE} with {AMENITY} and {GARAGE} in {LOCATION}",
+        "{AREA} {TYPE} Is Available For {TRANSACTION} In {LOCATION}",
+        "Spacious {TYPE} with {BEDS} and {BATHS} near {LOCATION}, price: {PRICE}",
+        "Looking to {TRANSACTION} a {TYPE} in {LOCATION}, budget {PRICE}",
+        "{TYPE} for {TRANSACTION}: {AREA}, {AMENITY}, {GARAGE}",
+        "We Are Offering You A {CONDITION} {AREA} {TYPE} For {TRANSACTION} In {LOCATION}",
+        "{TYPE} in {LOCATION} for {TRANSACTION} at {PRICE}",
+    ],
+}
+# Emplacement -> label NER (CODE = S+N / TN, TRANSACTION_* = sous-ensembles de TRANSACTION)
+SLOT_LABELS = {
+    'TYPE': 'TYPE', 'CODE': 'TYPE', 'TRANSACTION': 'TRANSACTION', 'TRANSACTION_VERB': 'TRANSACTION',
+    'TRANSACTION_NOUN': 'TRANSACTION', 'AMENITY': 'AMENITY', 'CONDITION': 'CONDITION', 'GARAGE': 'GARAGE',
+    'LOCATION': 'LOCATION', 'AREA': 'AREA', 'PRICE': 'PRICE', 'BEDS': 'BEDS', 'BATHS': 'BATHS',
+}
+CASINGS = [(str.lower, 0.55), (str.title, 0.30), (str.upper, 0.15)]  # Casse des mots-clés
+FALLBACK_LOCATIONS = ['Tunis', 'La Marsa', 'Carthage', 'Sousse', 'Dhaka', 'Gulshan', 'Mirpur', 'Uttara']
+
+_VOCAB = None  # Vocabulaire du processus (hérité par fork ou posé par l'initialiseur)
+
+
+def keyword_vocab():
+    """KEYWORDS -> {langue: {emplacement: [mots]}} (codes S+N / TN à part)."""
+    vocab = {'fr': {}, 'en': {}}
+    for word, label in annotate.KEYWORDS.items():
+        if word in SHARED_KEYWORDS:
+            languages = ('fr', 'en')
+        else:
+            languages = ('en',) if word in ENGLISH_KEYWORDS else ('fr',)
+        slots = [label]
+        if re.fullmatch(r'(?:s\+|t)\d+', word):
+            slots = ['CODE']
+        elif label == 'TRANSACTION' and 'fr' in languages:
+            slots = ['TRANSACTION_NOUN' if word in FRENCH_TRANSACTION_NOUNS else 'TRANSACTION_VERB']
+        for language in languages:
+            for slot in slots:
+                vocab[language].setdefault(slot, []).append(word)
+    return vocab
+
+
+def check_formats():
+    """Vérifie que chaque unité / devise produit un span entier reconnu par les regex d'annotation."""
+    for regexes, formats in ((annotate.AREA_REGEXES, {lang: [f'{{n}} {unit}' for unit in units]
+                                                      for lang, units in AREA_UNITS.items()}),
+                             (annotate.PRICE_REGEXES, PRICE_FORMATS),
+                             (annotate.BEDS_BATHS_REGEXES, BEDS_FORMATS),
+                             (annotate.BEDS_BATHS_REGEXES, BATHS_FORMATS)):
+        for fmt in itertools.chain.from_iterable(formats.values()):
+            sample = fmt.format(n=120).lower()
+            if not any(match.span() == (0, len(sample))
+                       for regex in regexes for match in re.finditer(regex, sample)):
+                raise ValueError(f"Format {fmt!r} non reconnu par les regex d'annotation")
+
+
+def load_locations(gazetteer_path=None, csv_path=annotate.FILE_PATH):
+    """Lieux du CSV (index de 1_annotate_data.py, construit si absent), remis en casse de titre."""
+    if gazetteer_path and Path(gazetteer_path).exists():
+        gazetteer = annotate.LocationGazetteer.load(gazetteer_path)
+    elif Path(csv_path).exists():
+        gazetteer = annotate.LocationGazetteer.from_csv(csv_path)
+    else:
+        return list(FALLBACK_LOCATIONS)
+    return [string.capwords(name) for name in gazetteer.names] + FALLBACK_LOCATIONS
+
+
+def build_vocab(locations):
+    """Vocabulaire complet d'un processus : mots-clés par langue, lieux et gabarits pré-découpés."""
+    check_formats()
+    vocab = keyword_vocab()
+    templates = {lang: [list(string.Formatter().parse(template)) for template in templates]
+                 for lang, templates in TEMPLATES.items()}
+    return {'keywords': vocab, 'locations': list(locations), 'templates': templates}
+
+
+def _init_worker(vocab):
+    global _VOCAB
+    _VOCAB = vocab
+
+
+def _casing(rng, word):
+    roll = rng.random()
+    for transform, weight in CASINGS:
+        if roll < weight:
+            return transform(word)
+        roll -= weight
+    return word
+
+
+def _amount(rng, slot):
+    if slot == 'PRICE':
+        return str(rng.choice([rng.randrange(300, 5000) * 10, rng.randrange(20, 2000) * 1000,
+                               rng.randrange(1, 99) * 100000]))
+    if slot == 'AREA':
+        return str(rng.choice([rng.randrange(30, 400), rng.randrange(500, 4000)]))
+    return str(rng.choice([1, 1, 2, 2, 2, 3, 3, 3, 4, 5]))  # BEDS / BATHS
+
+
+def fill_slot(rng, slot, language, vocab):
+    """Texte d'un emplacement (mot-clé, lieu ou quantité + unité)."""
+    if slot == 'LOCATION':
+        return _casing(rng, rng.choice(vocab['locations'])) if rng.random() < 0.3 else rng.choice(vocab['locations'])
+    if slot == 'AREA':
+        return f"{_amount(rng, slot)} {rng.choice(AREA_UNITS[language])}"
+    formats = {'PRICE': PRICE_FORMATS, 'BEDS': BEDS_FORMATS, 'BATHS': BATHS_FORMATS}.get(slot)
+    if formats:
+        fmt = rng.choice(formats[language])
+        amount = _amount(rng, slot)
+        if fmt.endswith('}k'):
+            amount = str(max(int(amount) // 1000, 1))  # "1500000" -> "1500k"
+        return _casing(rng, fmt.format(n=amount))
+    words = vocab['keywords'][language].get(slot) or vocab['keywords']['fr'][slot]
+    return _casing(rng, rng.choice(words))
+
+
+def compose(rng, language, template, vocab):
+    """Assemble un gabarit pré-découpé ; retourne {"text", "labels"} avec les offsets calculés."""
+    parts = []
+    labels = []
+    length = 0
+    for literal, slot, _, _ in template:
+        if literal:
+            parts.append(literal)
+            length += len(literal)
+        if slot:
+            value = fill_slot(rng, slot, language, vocab)
+            if length == 0:
+                value = value[:1].upper() + value[1:]
+            labels.append([length, length + len(value), SLOT_LABELS[slot]])
+            parts.append(value)
+            length += len(value)
+    return {"text": "".join(parts), "labels": labels}
+
+
+def generate_block(block, size, seed, french_ratio, serialize=False):
+    """Exemples du bloc ``block`` et leurs labels comptés.
+
+    La graine est propre au bloc, donc indépendante du découpage en workers.
+    Avec ``serialize``, les exemples sont rendus en lignes JSON dans le worker
+    (moins coûteuses à transférer que des dicts).
+    """
+    rng = random.Random(f"{seed}:{block}")
+    vocab = _VOCAB
+    examples = []
+    label_counts = Counter()
+    for _ in range(size):
+        language = 'fr' if rng.random() < french_ratio else 'en'
+        example = compose(rng, language, rng.choice(vocab['templates'][language]), vocab)
+        label_counts.update(label for _, _, label in example['labels'])
+        examples.append(json.dumps(example, ensure_ascii=False) + "\n" if serialize else example)
+    return examples, label_counts
+
+
+def iter_synthetic_examples(count, seed=DEFAULT_SEED, french_ratio=FRENCH_RATIO, workers=1,
+                            block_size=BLOCK_SIZE, locations=None, serialize=False, label_counts=None):
+    """Flux de ``count`` exemples (dicts, ou lignes JSON avec ``serialize``) dans un ordre déterministe.
+
+    Au plus ``2 * workers`` blocs sont en vol ; ``label_counts`` (Counter) est
+    mis à jour au fil des blocs.
+    """
+    global _VOCAB
+    _VOCAB = build_vocab(locations if locations is not None else load_locations())
+    label_counts = label_counts if label_counts is not None else Counter()
+    blocks = ((block, min(block_size, count - block * block_size), seed, french_ratio, serialize)
+              for block in range((count + block_size - 1) // block_size))
+
+    def emit(result):
+        examples, counts = result
+        label_counts.update(counts)
+        return examples
+
+    if workers <= 1:
+        for block_args in blocks:
+            yield from emit(generate_block(*block_args))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(_VOCAB,)) as executor:
+        pending = deque()
+        for block_args in blocks:
+            pending.append(executor.submit(generate_block, *block_args))
+            if len(pending) >= 2 * workers:
+                yield from emit(pending.popleft().result())
+        while pending:
+            yield from emit(pending.popleft().result())
+
+
+def is_shard_dir(output):
+    return Path(output).is_dir() or output.endswith(os.sep) or not Path(output).suffix
+
+
+def write_shards(lines, output_dir, shard_size=SHARD_SIZE):
+    """Écrit des shards JSONL.gz (lus tels quels par 2_train_model.py --input <dossier>) ; retourne le nombre d'exemples."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    written = 0
+    for index in itertools.count():
+        batch = list(itertools.islice(lines, shard_size))
+        if not batch:
+            break
+        with annotate.open_text_file(output_dir / SHARD_PATTERN.format(index), 'w') as f:
+            f.writelines(batch)
+        written += len(batch)
+    return written
+
+
+def write_examples(examples, output, append=False, shard_size=SHARD_SIZE):
+    """Route le flux vers stdout ('-'), un dossier de shards, un fichier JSONL (lignes JSON) ou un .annstore (dicts)."""
+    if output.endswith(annotate.STORE_SUFFIX):
+        with annotate.AnnotationStoreWriter(output) as writer:
+            count = 0
+            for example in examples:
+                writer.write(example)
+                count += 1
+        return count
+    if output != '-' and is_shard_dir(output):
+        return write_shards(examples, output, shard_size)
+    count = 0
+    with (contextlib.nullcontext(sys.stdout) if output == '-'
+          else annotate.open_text_file(output, 'a' if append else 'w')) as f:
+        for line in examples:
+            f.write(line)
+            count += 1
+    return count
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Génère des exemples d'annonces FR/EN synthétiques annotés.")
+    parser.add_argument('--count', type=int, default=DEFAULT_COUNT, help=f"Nombre d'exemples (défaut: {DEFAULT_COUNT})")
+    parser.add_argument('--output', required=True,
+                        help="Fichier JSONL (.gz/.zst), dossier de shards, stockage .annstore, ou '-' pour stdout")
+    parser.add_argument('--append', action='store_true', help="Ajoute à la fin du JSONL existant (ex. le JSONL d'entraînement)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help=f"Graine (défaut: {DEFAULT_SEED})")
+    parser.add_argument('--french-ratio', type=float, default=FRENCH_RATIO,
+                        help=f"Part d'exemples français (défaut: {FRENCH_RATIO})")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processus de génération")
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE,
+                        help=f"Exemples par shard si --output est un dossier (défaut: {SHARD_SIZE})")
+    parser.add_argument('--gazetteer', default=annotate.GAZETTEER_FILE,
+                        help="Index des lieux de 1_annotate_data.py (construit depuis le CSV s'il est absent)")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    log = sys.stderr if args.output == '-' else sys.stdout
+    locations = load_locations(args.gazetteer)
+    print(f"🧬 {args.count} exemples synthétiques ({args.french_ratio:.0%} FR, {len(locations)} lieux, "
+          f"graine {args.seed}, {args.workers} workers)...", file=log)
+
+    start_time = time.perf_counter()
+    label_counts = Counter()
+    examples = iter_synthetic_examples(args.count, args.seed, args.french_ratio, args.workers, locations=locations,
+                                       serialize=not args.output.endswith(annotate.STORE_SUFFIX),
+                                       label_counts=label_counts)
+    written = write_examples(examples, args.output, args.append, args.shard_size)
+    elapsed = time.perf_counter() - start_time
+    print(f"✅ {written} exemples en {elapsed:.1f} s ({written / max(elapsed, 1e-9):.0f} ex/s) → {args.output}", file=log)
+    print("   " + ", ".join(f"{label}: {count}" for label, count in label_counts.most_common()), file=log)
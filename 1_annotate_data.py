@@ -2,13 +2,32 @@
 # Amélioration majeure basée sur l'analyse du rapport de test
 
 import pandas as pd
+import numpy as np
 import re
 import jsonlines
 import random
+import argparse
+import bisect
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
 # --- Configuration ---
 FILE_PATH = 'house_price_bd.csv'
 OUTPUT_FILE = 'train_data_bilingual_V3.jsonl'
+CHUNK_SIZE = 10000  # Lignes CSV lues (et envoyées à un worker) par bloc
+COMPRESSIONS = {'.gz': 'gzip', '.zst': 'zstd'}  # Compression déduite de l'extension
+ANNOTATION_VERSION = 2  # À incrémenter si la logique de generate_annotations change (invalide le cache)
+GAZETTEER_FILE = 'location_gazetteer.json'  # Index des lieux (--gazetteer), construit depuis le CSV
+GAZETTEER_COLUMNS = ['City', 'Location']
+GAZETTEER_MIN_LENGTH = 3  # Noms plus courts ignorés (trop ambigus)
+STORE_SUFFIX = '.annstore'  # Sortie en stockage colonnaire (dossier) au lieu du JSONL
+STORE_FORMAT_VERSION = 1
 
 # MAPPAGES STANDARDISÉS
 MAPPINGS = {
@@ -55,22 +74,29 @@ AREA_REGEXES = [
     r'(\d+m²)',  # Format sans espace
 ]
 
-PRICE_REGEXES = [
+# Prix avec devise explicite (haute précision)
+CURRENCY_REGEXES = [
     r'(\d+[\.\,]?\d*\s*(?:tnd|t\b|taka|euros?|usd|dollars?|\$|€|à§³))',
     r'(à§³\s*\d+[\.\,]?\d*)',  # Symbole avant
     r'(\$\s*\d+[\.\,]?\d*)',  # Dollar avant
     r'(€\s*\d+[\.\,]?\d*)',  # Euro avant
+]
+
+PRICE_REGEXES = CURRENCY_REGEXES + [
     r'(\d+\s*k)',  # Format 50k
 ]
 
+# Formats S+X et T-X (haute précision)
+TYPE_CODE_REGEXES = [
+    r'((?:s\+|t)\d+)',
+]
+
 BEDS_BATHS_REGEXES = [
     # BEDS patterns
     r'(\d+\s*(?:bedrooms?|chambres?|beds?\b|br\b))',
     # BATHS patterns - IMPORTANT: Séparés pour distinction claire
     r'(\d+\s*(?:bathrooms?|baths?\b|ba\b|salle\s*de\s*bains?))',
-    # Formats S+X et T-X
-    r'((?:s\+|t)\d+)',
-]
+] + TYPE_CODE_REGEXES
 
 GARAGE_REGEXES = [
     r'((?:parking|garage)(?:\s+\d+)?\s*places?)',
@@ -286,6 +312,272 @@ BILINGUAL_EXAMPLES = [
 ]
 
 
+class _IgnoreCaseFold(dict):
+    """Table ``str.translate`` paresseuse qui ramène chaque caractère équivalent
+    (au sens de ``re.IGNORECASE``) à un caractère de l'alphabet des mots-clés."""
+
+    def __init__(self, alphabet):
+        super().__init__()
+        self.alphabet = sorted(alphabet)
+        # Alphabet vide (aucun mot-clé) : la classe ne reconnaît aucun caractère
+        chars = ''.join(re.escape(c) for c in self.alphabet)
+        self.alphabet_class = re.compile(f'[{chars}]' if chars else r'(?!)', re.IGNORECASE)
+
+    def __missing__(self, code):
+        ch = chr(code)
+        target = code
+        if self.alphabet_class.fullmatch(ch):
+            for c in self.alphabet:
+                if re.fullmatch(re.escape(c), ch, re.IGNORECASE):
+                    target = ord(c)
+                    break
+        self[code] = target
+        return target
+
+
+def _is_word_char(ch):
+    """Équivalent de ``\\w`` (mode Unicode) pour un caractère."""
+    return ch.isalnum() or ch == '_'
+
+
+def _is_boundary(text, pos):
+    """Équivalent de ``\\b`` à la position ``pos``."""
+    before = pos > 0 and _is_word_char(text[pos - 1])
+    after = pos < len(text) and _is_word_char(text[pos])
+    return before != after
+
+
+def _build_automaton(words):
+    """Automate Aho-Corasick (goto, fail, output) ; output[état] = indices des mots reconnus."""
+    goto = [{}]
+    output = [[]]
+    for index, word in enumerate(words):
+        state = 0
+        for ch in word:
+            if ch not in goto[state]:
+                goto.append({})
+                output.append([])
+                goto[state][ch] = len(goto) - 1
+            state = goto[state][ch]
+        output[state].append(index)
+    
+    # Liens d'échec (parcours en largeur)
+    fail = [0] * len(goto)
+    queue = list(goto[0].values())
+    for state in queue:
+        for ch, child in goto[state].items():
+            fallback = fail[state]
+            while fallback and ch not in goto[fallback]:
+                fallback = fail[fallback]
+            fail[child] = goto[fallback].get(ch, 0)
+            output[child] = output[child] + output[fail[child]]
+            queue.append(child)
+    return goto, fail, output
+
+
+class AnnotationRuleSet:
+    """Règles d'annotation (mots-clés + regex) compilées une seule fois.
+
+    Les mots-clés sont regroupés dans un automate Aho-Corasick : un seul
+    balayage du titre trouve toutes leurs occurrences, quel que soit leur
+    nombre. Les regex numériques sont précompilées. Les candidats sont
+    restitués dans le même ordre que l'ancienne boucle ``re.finditer`` règle
+    par règle (mots-clés, BEDS/BATHS, AREA, PRICE, GARAGE), ce qui garantit une
+    sortie identique après résolution des chevauchements.
+    """
+
+    TYPE_PATTERN = re.compile(r's\+\d+|t\d+')
+
+    def __init__(self, keywords, beds_baths_regexes, area_regexes, price_regexes, garage_regexes):
+        self.fold = _IgnoreCaseFold(set(''.join(keywords)))
+
+        # Mots-clés : (longueur, tag, délimité par \b) + automate
+        self.keywords = []
+        for word, tag in keywords.items():
+            bounded = len(word) > 2 and not re.search(r'm\d|s\+|\d', word)
+            self.keywords.append((len(word), tag, bounded))
+        self.goto, self.fail, self.output = _build_automaton(word.translate(self.fold) for word in keywords)
+
+        # Regex : (motif compilé, tag) ; tag None = classification BEDS/BATHS/TYPE
+        self.regex_rules = [(re.compile(regex, re.IGNORECASE), None) for regex in beds_baths_regexes]
+        self.regex_rules += [(re.compile(regex, re.IGNORECASE), 'AREA') for regex in area_regexes]
+        self.regex_rules += [(re.compile(regex, re.IGNORECASE), 'PRICE') for regex in price_regexes]
+        self.regex_rules += [(re.compile(regex, re.IGNORECASE), 'GARAGE') for regex in garage_regexes]
+
+    def _keyword_matches(self, lower_title):
+        """Occurrences des mots-clés, triées comme une boucle re.finditer par mot-clé."""
+        matches = []
+        last_end = [0] * len(self.keywords)
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for i, ch in enumerate(lower_title.translate(self.fold)):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for index in output[state]:
+                length, tag, bounded = self.keywords[index]
+                end = i + 1
+                start = end - length
+                # Même sémantique que re.finditer : pas de chevauchement pour un même mot-clé
+                if start < last_end[index]:
+                    continue
+                if bounded and not (_is_boundary(lower_title, start) and _is_boundary(lower_title, end)):
+                    continue
+                last_end[index] = end
+                matches.append((index, start, end, tag))
+        matches.sort()
+        return [(start, end, tag) for _, start, end, tag in matches]
+
+    def _classify(self, matched_text):
+        """Distingue TYPE (S+N/TN), BATHS et BEDS pour les motifs BEDS_BATHS."""
+        matched_text = matched_text.lower()
+        if self.TYPE_PATTERN.match(matched_text):
+            return 'TYPE'
+        if 'bath' in matched_text or 'salle' in matched_text or 'ba' in matched_text:
+            return 'BATHS'
+        return 'BEDS'
+
+    def find_spans(self, lower_title):
+        """Retourne les candidats (start, end, tag) de toutes les règles."""
+        spans = self._keyword_matches(lower_title)
+        for pattern, tag in self.regex_rules:
+            for match in pattern.finditer(lower_title):
+                spans.append((*match.span(), tag or self._classify(match.group(0))))
+        return spans
+
+
+RULESET = AnnotationRuleSet(KEYWORDS, BEDS_BATHS_REGEXES, AREA_REGEXES, PRICE_REGEXES, GARAGE_REGEXES)
+# Sous-ensemble haute précision (codes S+N/TN, devises, unités de surface), sans mots-clés :
+# seules ces règles sont posées comme entités fixes par 6_hybrid_pipeline.py
+PINNED_RULESET = AnnotationRuleSet({}, TYPE_CODE_REGEXES, AREA_REGEXES, CURRENCY_REGEXES, [])
+
+
+class LocationGazetteer:
+    """Index global des lieux connus (toutes les valeurs City / Location du CSV).
+
+    Chaque valeur est ajoutée entière et découpée sur les virgules
+    ("Lake Circus Road, Kalabagan" -> aussi "Lake Circus Road" et "Kalabagan") :
+    un titre qui nomme un quartier est annoté même si sa propre ligne porte
+    un autre lieu. Les noms sont compilés en un automate Aho-Corasick (un seul
+    balayage linéaire du titre), sauvegardable tel quel en JSON.
+    """
+
+    def __init__(self, names, source=None):
+        self.names = sorted(names)
+        self.goto, self.fail, self.output = _build_automaton(self.names)
+        self.source = source  # CSV d'origine (describe_source), None si construit à la main
+        self.version = ANNOTATION_VERSION
+
+    @staticmethod
+    def describe_source(file_path):
+        """Identité du CSV source : chemin absolu, taille et date de modification."""
+        stat = Path(file_path).stat()
+        return {'path': str(Path(file_path).resolve()), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def is_current(self, file_path):
+        """Vrai si l'index a été construit depuis ce CSV, inchangé, par cette version des règles."""
+        return self.version == ANNOTATION_VERSION and self.source == self.describe_source(file_path)
+
+    @staticmethod
+    def normalize_names(values, min_length=GAZETTEER_MIN_LENGTH):
+        """Valeurs brutes -> noms en minuscules (entiers + parties séparées par des virgules)."""
+        names = set()
+        for value in values:
+            value = str(value).strip().lower()
+            for name in [value] + value.split(','):
+                name = ' '.join(name.split())
+                if len(name) >= min_length and name not in KEYWORDS:
+                    names.add(name)
+        return names
+
+    @classmethod
+    def from_csv(cls, file_path, columns=GAZETTEER_COLUMNS, chunk_size=CHUNK_SIZE):
+        """Construit l'index à partir des valeurs distinctes des colonnes de lieux (lecture par blocs)."""
+        values = set()
+        header = pd.read_csv(file_path, nrows=0).columns
+        usecols = [col for col in header if col.strip() in columns]
+        if not usecols:
+            raise ValueError(f"Aucune colonne {columns} dans {file_path} (colonnes: {list(header)})")
+        for chunk in pd.read_csv(file_path, usecols=usecols, chunksize=chunk_size):
+            for col in chunk.columns:
+                values.update(chunk[col].dropna().astype(str).unique())
+        return cls(cls.normalize_names(values), cls.describe_source(file_path))
+
+    @property
+    def fingerprint(self):
+        """Empreinte du contenu (clé du cache d'annotations)."""
+        return hashlib.sha256('\n'.join(self.names).encode('utf-8')).hexdigest()
+
+    def find_spans(self, lower_title, tag='LOCATION'):
+        """Toutes les occurrences délimitées (\\b) des noms dans le titre en minuscules."""
+        spans = []
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for i, ch in enumerate(lower_title):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for index in output[state]:
+                start = i + 1 - len(self.names[index])
+                if _is_boundary(lower_title, start) and _is_boundary(lower_title, i + 1):
+                    spans.append((start, i + 1, tag))
+        return spans
+
+    def save(self, path):
+        """Sauvegarde l'automate compilé (rechargé sans reconstruction)."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.version, 'source': self.source, 'names': self.names, 'goto': self.goto,
+                       'fail': self.fail, 'output': self.output}, f, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        gazetteer = cls.__new__(cls)
+        gazetteer.names = data['names']
+        gazetteer.version = data.get('version')
+        gazetteer.source = data.get('source')
+        gazetteer.goto, gazetteer.fail, gazetteer.output = data['goto'], data['fail'], data['output']
+        return gazetteer
+
+    def entity_ruler_patterns(self, label='LOCATION'):
+        """Motifs pour un entity_ruler spaCy (phrase_matcher_attr = "LOWER")."""
+        return [{'label': label, 'pattern': name} for name in self.names]
+
+
+GAZETTEER = None  # LocationGazetteer actif (défini par le script principal / les workers)
+
+
+def set_gazetteer(gazetteer):
+    """Active l'index des lieux dans ce processus (initialiseur des workers)."""
+    global GAZETTEER
+    GAZETTEER = gazetteer
+
+
+def resolve_overlaps(candidates):
+    """Garde les spans les plus longs sans chevauchement (à longueur égale, le premier candidat gagne).
+
+    Les intervalles acceptés sont disjoints : on les maintient triés et un
+    ``bisect`` suffit à tester un candidat contre son seul voisin possible,
+    soit O(n log n) au lieu de comparer chaque candidat à tous les spans retenus.
+    Les spans vides ne bloquent rien et sont toujours acceptés, comme avant.
+    """
+    accepted = []
+    starts = []
+    ends = []
+    for start, end, tag in sorted(candidates, key=lambda x: (x[1] - x[0]), reverse=True):
+        if start < end:
+            i = bisect.bisect_left(starts, end)
+            if i > 0 and ends[i - 1] > start:
+                continue
+            starts.insert(i, start)
+            ends.insert(i, end)
+        accepted.append((start, end, tag))
+    
+    accepted.sort(key=lambda x: x[0])
+    return accepted
+
+
 def generate_annotations(row):
     """Génère des annotations NER avec résolution des chevauchements."""
     title = row['Title'] 
@@ -298,6 +590,8 @@ def generate_annotations(row):
             value_raw = str(row[col]).strip()
             
             if tag == 'LOCATION':
+                if GAZETTEER is not None:
+                    continue  # Tous les lieux du CSV : un seul balayage ci-dessous
                 match_iter = re.finditer(re.escape(value_raw.lower()), lower_title)
                 for match in match_iter:
                     temp_annotations.append((*match.span(), tag))
@@ -309,92 +603,440 @@ def generate_annotations(row):
                     if match.end() - match.start() > 0: 
                         temp_annotations.append((*match.span(), tag))
     
-    # 2. Mots-clés
-    for word, tag in KEYWORDS.items():
-        regex_pattern = r'\b' + re.escape(word) + r'\b' if len(word) > 2 and not re.search(r'm\d|s\+|\d', word) else re.escape(word)
-        match_iter = re.finditer(regex_pattern, lower_title, re.IGNORECASE)
-        for match in match_iter:
-            temp_annotations.append((*match.span(), tag))
-    
-    # 3. BEDS et BATHS - Traitement séparé pour distinction
-    for regex in BEDS_BATHS_REGEXES:
-        match_iter = re.finditer(regex, lower_title, re.IGNORECASE)
-        for match in match_iter:
-            matched_text = match.group(0).lower()
-            
-            # Identifier si c'est S+/T (TYPE)
-            if re.match(r's\+\d+|t\d+', matched_text):
-                temp_annotations.append((*match.span(), 'TYPE'))
-            # Identifier si c'est BATHS
-            elif 'bath' in matched_text or 'salle' in matched_text or 'ba' in matched_text:
-                temp_annotations.append((*match.span(), 'BATHS'))
-            # Sinon c'est BEDS
-            else:
-                temp_annotations.append((*match.span(), 'BEDS'))
-    
-    # 4. AREA
-    for regex in AREA_REGEXES:
-        match_iter = re.finditer(regex, lower_title, re.IGNORECASE)
-        for match in match_iter:
-            temp_annotations.append((*match.span(), 'AREA'))
-    
-    # 5. PRICE
-    for regex in PRICE_REGEXES:
-        match_iter = re.finditer(regex, lower_title, re.IGNORECASE)
-        for match in match_iter:
-            temp_annotations.append((*match.span(), 'PRICE'))
-    
-    # 6. GARAGE
-    for regex in GARAGE_REGEXES:
-        match_iter = re.finditer(regex, lower_title, re.IGNORECASE)
-        for match in match_iter:
-            temp_annotations.append((*match.span(), 'GARAGE'))
+    # 2-6. Mots-clés, BEDS/BATHS, AREA, PRICE, GARAGE (un seul passage)
+    temp_annotations.extend(RULESET.find_spans(lower_title))
+    if GAZETTEER is not None:
+        temp_annotations.extend(GAZETTEER.find_spans(lower_title))
     
     # 7. Résolution des chevauchements
-    final_annotations = []
-    temp_annotations.sort(key=lambda x: (x[1] - x[0]), reverse=True)
-    
-    for start, end, tag in temp_annotations:
-        is_overlapping = False
-        for fs, fe, ftag in final_annotations:
-            if max(start, fs) < min(end, fe):
-                is_overlapping = True
-                break
-        if not is_overlapping:
-            final_annotations.append((start, end, tag))
-    
-    final_annotations.sort(key=lambda x: x[0])
+    final_annotations = resolve_overlaps(temp_annotations)
     return {"text": title, "labels": final_annotations}
 
 
+def read_csv_chunks(file_path, chunk_size=CHUNK_SIZE):
+    """Lit le CSV par blocs et renvoie chaque bloc sous forme de liste de dicts.
+
+    Les colonnes numériques de MAPPINGS sont lues en float64 dans tous les
+    blocs (comme une lecture complète dès qu'il manque une valeur) : sans cela,
+    un bloc sans valeur manquante passerait en int64 et ``str(row[col])``
+    dépendrait du découpage.
+    """
+    for chunk in pd.read_csv(file_path, chunksize=chunk_size):
+        chunk.columns = chunk.columns.str.strip()
+        for col in MAPPINGS:
+            if col in chunk.columns and pd.api.types.is_integer_dtype(chunk[col]):
+                chunk[col] = chunk[col].astype('float64')
+        if 'Bathroom' not in chunk.columns:
+            chunk['Bathroom'] = 0
+        yield chunk.to_dict('records')
+
+
+def annotate_records(records):
+    """Annote un bloc de lignes (dicts) ; exécuté dans les workers."""
+    return [generate_annotations(row) for row in records]
+
+
+def ruleset_fingerprint(gazetteer=None):
+    """Empreinte des règles d'annotation : change dès qu'un mapping, mot-clé, regex ou lieu de l'index change."""
+    rules = [ANNOTATION_VERSION, MAPPINGS, KEYWORDS, AREA_REGEXES, PRICE_REGEXES,
+             BEDS_BATHS_REGEXES, GARAGE_REGEXES, gazetteer.fingerprint if gazetteer is not None else None]
+    return hashlib.sha256(json.dumps(rules, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class AnnotationCache:
+    """Cache SQLite des annotations, adressé par contenu.
+
+    La clé est le hash de (empreinte des règles, contenu de la ligne) : seules
+    les lignes nouvelles ou modifiées sont ré-annotées, et tout changement de
+    règles invalide le cache. Les entrées d'une ancienne empreinte sont purgées
+    à l'ouverture.
+    """
+
+    BATCH = 500  # Clés par requête SELECT ... IN (...)
+
+    def __init__(self, path, fingerprint=None):
+        self.fingerprint = fingerprint or ruleset_fingerprint(GAZETTEER)
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS annotations '
+            '(key BLOB PRIMARY KEY, fingerprint TEXT NOT NULL, value TEXT NOT NULL) WITHOUT ROWID'
+        )
+        self.connection.execute('DELETE FROM annotations WHERE fingerprint != ?', (self.fingerprint,))
+        self.connection.commit()
+
+    def key(self, row):
+        """Clé d'une ligne CSV (dict) : titre + colonnes lues par generate_annotations."""
+        values = [row.get('Title')] + [row.get(col) for col in MAPPINGS]
+        content = json.dumps(values, ensure_ascii=False, default=str)
+        return hashlib.blake2b(f"{self.fingerprint}\0{content}".encode('utf-8'), digest_size=16).digest()
+
+    def get_many(self, keys):
+        """Retourne {clé: annotation} pour les clés présentes dans le cache."""
+        found = {}
+        unique_keys = list(set(keys))
+        for i in range(0, len(unique_keys), self.BATCH):
+            batch = unique_keys[i:i + self.BATCH]
+            query = f"SELECT key, value FROM annotations WHERE key IN ({','.join('?' * len(batch))})"
+            for key, value in self.connection.execute(query, batch):
+                found[key] = json.loads(value)
+        return found
+
+    def put_many(self, items):
+        """Enregistre des paires (clé, annotation)."""
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO annotations (key, fingerprint, value) VALUES (?, ?, ?)',
+            [(key, self.fingerprint, json.dumps(annotation, ensure_ascii=False)) for key, annotation in items]
+        )
+        self.connection.commit()
+
+    def split(self, records):
+        """Sépare un bloc en lignes à annoter et informations de fusion (clés, déjà en cache)."""
+        keys = [self.key(row) for row in records]
+        cached = self.get_many(keys)
+        todo = [row for row, key in zip(records, keys) if key not in cached]
+        return todo, (keys, cached)
+
+    def merge(self, annotations, lookup):
+        """Recompose le bloc dans l'ordre d'origine et met en cache les nouvelles annotations."""
+        keys, cached = lookup
+        fresh = iter(annotations)
+        merged = []
+        new_items = []
+        for key in keys:
+            if key in cached:
+                merged.append(cached[key])
+                self.hits += 1
+            else:
+                annotation = next(fresh)
+                new_items.append((key, annotation))
+                merged.append(annotation)
+                self.misses += 1
+        if new_items:
+            self.put_many(new_items)
+        return merged
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_annotations(file_path, workers=1, chunk_size=CHUNK_SIZE, cache=None):
+    """Annote le CSV bloc par bloc, en parallèle, en conservant l'ordre des lignes.
+
+    Au plus ``2 * workers`` blocs sont en vol : la mémoire reste bornée quelle
+    que soit la taille du fichier. Avec un ``AnnotationCache``, seules les
+    lignes absentes du cache sont envoyées aux workers.
+    """
+    def prepare(records):
+        return cache.split(records) if cache is not None else (records, None)
+
+    def finish(annotations, lookup):
+        return cache.merge(annotations, lookup) if cache is not None else annotations
+
+    chunks = read_csv_chunks(file_path, chunk_size)
+    if workers <= 1:
+        for records in chunks:
+            todo, lookup = prepare(records)
+            yield from finish(annotate_records(todo), lookup)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=set_gazetteer, initargs=(GAZETTEER,)) as executor:
+        pending = deque()
+        for records in chunks:
+            todo, lookup = prepare(records)
+            pending.append((executor.submit(annotate_records, todo), lookup))
+            if len(pending) >= 2 * workers:
+                future, lookup = pending.popleft()
+                yield from finish(future.result(), lookup)
+        while pending:
+            future, lookup = pending.popleft()
+            yield from finish(future.result(), lookup)
+
+
+def open_text_file(path, mode='r', compression=None):
+    """Ouvre un fichier texte UTF-8, éventuellement compressé (gzip ou zstd).
+
+    Sans ``compression`` explicite, le format est déduit de l'extension
+    (``.gz``, ``.zst``). zstd nécessite le paquet optionnel ``zstandard``.
+    """
+    compression = compression or COMPRESSIONS.get(Path(path).suffix)
+    if compression == 'gzip':
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("La compression zstd nécessite le paquet 'zstandard' (pip install zstandard).")
+        return zstandard.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def write_annotations(annotations, output_file, compression=None):
+    """Écrit les annotations au fil de l'eau, puis les exemples bilingues.
+
+    ``annotations`` est consommé comme un flux : rien n'est gardé en mémoire.
+    Retourne le nombre de lignes CSV écrites.
+    """
+    csv_rows = 0
+    with open_text_file(output_file, 'w', compression) as fp, jsonlines.Writer(fp) as writer:
+        for annotation in annotations:
+            writer.write(annotation)
+            csv_rows += 1
+        writer.write_all({"text": text, "labels": labels} for text, labels in BILINGUAL_EXAMPLES)
+    return csv_rows
+
+
+# --- Stockage colonnaire des annotations (mappable en mémoire) ---
+# Dossier <nom>.annstore :
+#   text.bin          : textes UTF-8 concaténés
+#   text_offsets.bin  : int64[n+1], offsets en octets de chaque texte dans text.bin
+#   span_offsets.bin  : int64[n+1], spans du document i = [span_offsets[i], span_offsets[i+1])
+#   span_start.bin / span_end.bin : int32, offsets en caractères (comme le JSONL)
+#   span_label.bin    : int16, indice dans meta.json["labels"]
+#   meta.json         : version, nombre de documents / spans, labels, dtypes
+STORE_COLUMNS = {
+    'text_offsets': np.int64,
+    'span_offsets': np.int64,
+    'span_start': np.int32,
+    'span_end': np.int32,
+    'span_label': np.int16,
+}
+
+
+def is_annotation_store(path):
+    """Vrai si ``path`` est un dossier produit par AnnotationStoreWriter."""
+    return (Path(path) / 'meta.json').exists() and (Path(path) / 'text.bin').exists()
+
+
+class AnnotationStoreWriter:
+    """Écrit des records {"text", "labels"} en colonnes, au fil de l'eau (mémoire constante).
+
+    ``meta.json`` n'est écrit (atomiquement) qu'à la fermeture normale : un run
+    interrompu ne laisse pas de stockage que ``is_annotation_store`` accepterait.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        (self.path / 'meta.json').unlink(missing_ok=True)  # Invalide un ancien stockage écrasé
+        self.labels = {}
+        self.n_docs = 0
+        self.n_spans = 0
+        self.text_bytes = 0
+        self.files = {name: open(self.path / f'{name}.bin', 'wb') for name in ('text', *STORE_COLUMNS)}
+        self._write('text_offsets', [0])
+        self._write('span_offsets', [0])
+
+    def _write(self, column, values):
+        self.files[column].write(np.asarray(values, dtype=STORE_COLUMNS[column]).tobytes())
+
+    def write(self, record):
+        encoded = record['text'].encode('utf-8')
+        self.files['text'].write(encoded)
+        self.text_bytes += len(encoded)
+        spans = record['labels']
+        if spans:
+            starts, ends, labels = zip(*spans)
+            self._write('span_start', starts)
+            self._write('span_end', ends)
+            self._write('span_label', [self.labels.setdefault(label, len(self.labels)) for label in labels])
+        self.n_docs += 1
+        self.n_spans += len(spans)
+        self._write('text_offsets', [self.text_bytes])
+        self._write('span_offsets', [self.n_spans])
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+
+    def close(self, complete=True):
+        """Ferme les colonnes ; avec ``complete``, écrit meta.json (le stockage devient lisible)."""
+        for f in self.files.values():
+            f.close()
+        if not complete:
+            return
+        meta = {
+            'format_version': STORE_FORMAT_VERSION,
+            'annotation_version': ANNOTATION_VERSION,
+            'n_docs': self.n_docs,
+            'n_spans': self.n_spans,
+            'labels': list(self.labels),
+            'dtypes': {name: np.dtype(dtype).str for name, dtype in STORE_COLUMNS.items()},
+        }
+        tmp_path = self.path / '.meta.json.tmp'
+        tmp_path.write_text(json.dumps(meta, indent=2), encoding='utf-8')
+        os.replace(tmp_path, self.path / 'meta.json')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close(complete=exc[0] is None)
+
+
+class AnnotationStore:
+    """Lecture d'un stockage colonnaire : colonnes NumPy mappées en mémoire, sans copie.
+
+    ``doc_ids`` restreint la vue à un sous-ensemble de documents (filtre / split)
+    sans toucher aux fichiers.
+    """
+
+    def __init__(self, path, doc_ids=None):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / 'meta.json').read_text(encoding='utf-8'))
+        if self.meta['format_version'] != STORE_FORMAT_VERSION:
+            raise ValueError(f"Format de stockage {self.meta['format_version']} non supporté "
+                             f"(attendu: {STORE_FORMAT_VERSION}) ; régénérez {self.path}.")
+        self.labels = self.meta['labels']
+        self.text = self._map('text', np.uint8)
+        for name in STORE_COLUMNS:
+            setattr(self, name, self._map(name, np.dtype(self.meta['dtypes'][name])))
+        self.doc_ids = doc_ids
+
+    def _map(self, name, dtype):
+        file = self.path / f'{name}.bin'
+        if file.stat().st_size == 0:
+            return np.empty(0, dtype=dtype)  # np.memmap refuse les fichiers vides
+        return np.memmap(file, dtype=dtype, mode='r')
+
+    def __len__(self):
+        return self.meta['n_docs'] if self.doc_ids is None else len(self.doc_ids)
+
+    def subset(self, doc_ids):
+        """Vue sur les documents ``doc_ids`` (indices absolus ou masque booléen sur la vue)."""
+        doc_ids = np.asarray(doc_ids)
+        if doc_ids.dtype == bool:
+            doc_ids = self.ids()[doc_ids]
+        return AnnotationStore(self.path, doc_ids)
+
+    def ids(self):
+        """Indices absolus des documents de la vue."""
+        return np.arange(self.meta['n_docs']) if self.doc_ids is None else self.doc_ids
+
+    def span_doc(self):
+        """Document (indice absolu) de chaque span, aligné sur span_start / span_end / span_label."""
+        return np.repeat(np.arange(self.meta['n_docs']), np.diff(self.span_offsets))
+
+    def label_counts(self):
+        """Nombre de spans par label sur la vue (np.bincount, sans objets Python par span)."""
+        labels = self.span_label
+        if self.doc_ids is not None:
+            labels = labels[np.isin(self.span_doc(), self.doc_ids)]
+        counts = np.bincount(labels, minlength=len(self.labels))
+        return dict(zip(self.labels, counts.tolist()))
+
+    def has_label(self, label):
+        """Masque booléen (sur la vue) des documents contenant au moins un span ``label``."""
+        if label not in self.labels:
+            return np.zeros(len(self), dtype=bool)
+        docs = np.zeros(self.meta['n_docs'], dtype=bool)
+        docs[self.span_doc()[self.span_label == self.labels.index(label)]] = True
+        return docs[self.ids()]
+
+    def get_text(self, doc_id):
+        return bytes(self.text[self.text_offsets[doc_id]:self.text_offsets[doc_id + 1]]).decode('utf-8')
+
+    def get_spans(self, doc_id):
+        """(start, end, label_id) du document ``doc_id`` : vues sur les colonnes mappées."""
+        a, b = self.span_offsets[doc_id], self.span_offsets[doc_id + 1]
+        return self.span_start[a:b], self.span_end[a:b], self.span_label[a:b]
+
+    def record(self, doc_id):
+        """Record au format JSONL {"text", "labels"}."""
+        starts, ends, labels = self.get_spans(doc_id)
+        return {'text': self.get_text(doc_id),
+                'labels': [[s, e, self.labels[l]] for s, e, l in zip(starts.tolist(), ends.tolist(), labels.tolist())]}
+
+    def __iter__(self):
+        for doc_id in self.ids().tolist():
+            yield self.record(doc_id)
+
+
+def write_annotation_store(annotations, output_path):
+    """Équivalent colonnaire de write_annotations : CSV annoté puis exemples bilingues."""
+    csv_rows = 0
+    with AnnotationStoreWriter(output_path) as writer:
+        for annotation in annotations:
+            writer.write(annotation)
+            csv_rows += 1
+        writer.write_all({"text": text, "labels": labels} for text, labels in BILINGUAL_EXAMPLES)
+    return csv_rows
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Génère les annotations NER à partir du CSV d'annonces.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Nombre de processus d'annotation (défaut: nombre de CPU)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help=f"Lignes CSV par bloc (défaut: {CHUNK_SIZE})")
+    parser.add_argument('--input', default=FILE_PATH,
+                        help=f"CSV d'annonces (défaut: {FILE_PATH})")
+    parser.add_argument('--output', default=OUTPUT_FILE,
+                        help=f"Fichier JSONL de sortie, .gz/.zst pour compresser, ou dossier {STORE_SUFFIX} "
+                             f"pour le stockage colonnaire (défaut: {OUTPUT_FILE})")
+    parser.add_argument('--compression', choices=sorted(set(COMPRESSIONS.values())),
+                        help="Force la compression de la sortie (sinon déduite de l'extension)")
+    parser.add_argument('--cache',
+                        help="Cache SQLite des annotations : seules les lignes nouvelles/modifiées sont ré-annotées")
+    parser.add_argument('--gazetteer', default=GAZETTEER_FILE,
+                        help=f"Index des lieux : rechargé s'il a été construit depuis ce --input (chemin, taille, "
+                             f"date), sinon reconstruit et sauvegardé (défaut: {GAZETTEER_FILE})")
+    parser.add_argument('--rebuild-gazetteer', action='store_true',
+                        help="Reconstruit l'index des lieux depuis --input même s'il existe")
+    parser.add_argument('--no-gazetteer', action='store_true',
+                        help="Désactive l'index global : seuls les lieux de la ligne elle-même sont annotés")
+    return parser.parse_args()
+
+
 if __name__ == '__main__':
-    # Chargement des données
-    try:
-        df = pd.read_csv(FILE_PATH)
-        df.columns = df.columns.str.strip()
-        if 'Bathroom' not in df.columns:
-            df['Bathroom'] = 0
-    except FileNotFoundError:
-        print(f"ERREUR: Fichier '{FILE_PATH}' non trouvé.")
+    args = parse_args()
+    
+    if not Path(args.input).exists():
+        print(f"ERREUR: Fichier '{args.input}' non trouvé.")
         exit()
     
-    # Génération des annotations
-    print(f"Génération des annotations pour {len(df)} lignes...")
-    TRAIN_DATA = df.apply(generate_annotations, axis=1).tolist()
+    # Index global des lieux (une fois pour tout le CSV)
+    if not args.no_gazetteer:
+        gazetteer = None
+        if Path(args.gazetteer).exists() and not args.rebuild_gazetteer:
+            gazetteer = LocationGazetteer.load(args.gazetteer)
+            if not gazetteer.is_current(args.input):
+                print(f"♻️  Index des lieux '{args.gazetteer}' construit depuis un autre CSV "
+                      f"(ou une autre version des règles) : reconstruction")
+                gazetteer = None
+        if gazetteer is not None:
+            set_gazetteer(gazetteer)
+            print(f"📍 Index des lieux rechargé: {args.gazetteer} ({len(GAZETTEER.names)} noms)")
+        else:
+            set_gazetteer(LocationGazetteer.from_csv(args.input, chunk_size=args.chunk_size))
+            GAZETTEER.save(args.gazetteer)
+            print(f"📍 Index des lieux construit: {len(GAZETTEER.names)} noms → {args.gazetteer}")
     
-    # Ajout des exemples bilingues (50+ exemples)
-    for text, labels in BILINGUAL_EXAMPLES:
-        TRAIN_DATA.append({"text": text, "labels": labels})
+    # Annotation par blocs en parallèle, écrite en flux (mémoire constante)
+    print(f"Génération des annotations ({args.workers} workers, blocs de {args.chunk_size} lignes)...")
+    cache = AnnotationCache(args.cache, ruleset_fingerprint(GAZETTEER)) if args.cache else None
+    annotations = iter_annotations(args.input, args.workers, args.chunk_size, cache)
+    if args.output.endswith(STORE_SUFFIX):
+        csv_rows = write_annotation_store(annotations, args.output)
+    else:
+        csv_rows = write_annotations(annotations, args.output, args.compression)
+    if cache is not None:
+        print(f"♻️  Cache '{args.cache}': {cache.hits} lignes réutilisées, {cache.misses} annotées")
+        cache.close()
     
-    print(f"✅ {len(TRAIN_DATA)} annotations créées ({len(BILINGUAL_EXAMPLES)} exemples bilingues)")
-    print(f"   - CSV: {len(df)} lignes")
+    print(f"✅ {csv_rows + len(BILINGUAL_EXAMPLES)} annotations créées ({len(BILINGUAL_EXAMPLES)} exemples bilingues)")
+    print(f"   - CSV: {csv_rows} lignes")
     print(f"   - Exemples manuels: {len(BILINGUAL_EXAMPLES)}")
-    
-    # Sauvegarde
-    with jsonlines.open(OUTPUT_FILE, mode='w') as writer:
-        writer.write_all(TRAIN_DATA)
-    
-    print(f"\n💾 Sauvegardé dans '{OUTPUT_FILE}'")
+    print(f"\n💾 Sauvegardé dans '{args.output}'")
     print("\n🔥 AMÉLIORATIONS MAJEURES:")
     print("   ✅ 50+ exemples bilingues (vs 5 avant)")
     print("   ✅ Distinction BEDS/BATHS améliorée")
@@ -2,83 +2,495 @@
 
 import spacy
 from spacy.tokens import DocBin
+from spacy.training import Example
 from tqdm import tqdm
-import jsonlines
-import random
+import numpy as np
+import argparse
+import hashlib
+import importlib
+import json
+import math
+import os
+import re
+import zlib
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
 
 # --- Configuration ---
 TRAIN_DATA_FILE = 'train_data_bilingual_V3.jsonl'
 TRAIN_OUTPUT_FILE = 'train_bilingual_V3.spacy'
 DEV_OUTPUT_FILE = 'dev_bilingual_V3.spacy'
+SHARD_SIZE = 5000  # Documents par shard .spacy (mode --output-dir)
+CONFIG_FILE = 'config_bilingual_fixed.cfg'
+TRAIN_RATIO = 0.8
+DEFAULT_SEED = 42  # Utilisé si [system] seed n'est pas lisible dans CONFIG_FILE
+READER_NAME = 'immo.JsonlCorpus.v1'  # Lecteur @readers pour [corpora.train] / [corpora.dev]
+JSONL_SUFFIXES = ('.jsonl', '.jsonl.gz', '.jsonl.zst')  # Shards reconnus dans un dossier
+DEDUP_THRESHOLD = 0.8  # Similarité de Jaccard estimée à partir de laquelle deux textes sont des quasi-doublons
+DEDUP_NUM_PERM = 128  # Permutations MinHash (précision de l'estimation)
+DEDUP_SHINGLE_SIZE = 3  # Mots par shingle
+DEDUP_BATCH = 2048  # Documents signés ensemble (calcul vectorisé)
 
-def convert_data_to_docbin(json_file):
-    """Charge les données JSONL et les convertit en DocBin."""
+annotate = importlib.import_module('1_annotate_data')  # open_text_file (gzip / zstd), AnnotationStore
+
+def make_annotated_doc(nlp, item):
+    """Construit un Doc annoté ; retourne (doc, nombre d'entités non alignées)."""
+    doc = nlp.make_doc(item["text"])
+    ents = []
+    skipped = 0
+    
+    for start, end, label in item["labels"]:
+        span = doc.char_span(start, end, label=label, alignment_mode="contract")
+        if span is not None:
+            ents.append(span)
+        else:
+            skipped += 1
+    
+    # Sauvegarder même si certaines entités ont échoué
+    doc.ents = ents
+    return doc, skipped
+
+
+# --- Conversion en shards (parallèle, sans DocBin intermédiaire) ---
+_WORKER_NLP = None
+
+
+def _init_shard_worker():
+    """Crée le pipeline vide une seule fois par worker."""
+    global _WORKER_NLP
+    _WORKER_NLP = spacy.blank("xx")
+
+
+def read_config_seed(config_file=CONFIG_FILE):
+    """Lit ``[system] seed`` du config d'entraînement (même graine pour le split)."""
+    try:
+        return int(spacy.util.load_config(config_file)["system"]["seed"])
+    except (OSError, KeyError, TypeError, ValueError):
+        return DEFAULT_SEED
+
+
+def dominant_label(item):
+    """Label le plus fréquent d'un record (premier rencontré en cas d'égalité), None sans entité."""
+    counts = Counter(label for _, _, label in item["labels"])
+    return counts.most_common(1)[0][0] if counts else None
+
+
+class StreamingSplitter:
+    """Affecte chaque record à 'train' ou 'dev' au fil de l'eau, de façon déterministe.
+
+    La décision repose sur un hash stable (blake2b) du texte salé par la
+    graine : un même texte tombe toujours du même côté, et ajouter des
+    données ne déplace pas les documents déjà répartis.
+
+    Avec ``stratify=True``, le hash décide toujours, mais le nombre de
+    documents dev de chaque label dominant est maintenu à ±1 de la cible
+    (``dev_ratio * vus``). Seuls les records situés après un ajout peuvent
+    alors changer de côté.
+    """
+
+    def __init__(self, train_ratio=TRAIN_RATIO, seed=DEFAULT_SEED, stratify=False):
+        self.dev_ratio = 1.0 - train_ratio
+        self.salt = str(seed).encode("utf-8")
+        self.stratify = stratify
+        self.seen = Counter()
+        self.dev = Counter()
+
+    def bucket(self, text):
+        """Position stable du texte dans [0, 1)."""
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8, key=self.salt).digest()
+        return int.from_bytes(digest, "big") / 2**64
+
+    def __call__(self, item):
+        is_dev = self.bucket(item["text"]) < self.dev_ratio
+        
+        if self.stratify:
+            stratum = dominant_label(item)
+            self.seen[stratum] += 1
+            expected = self.dev_ratio * self.seen[stratum]
+            if is_dev and self.dev[stratum] + 1 > math.ceil(expected):
+                is_dev = False
+            elif not is_dev and self.dev[stratum] < math.floor(expected) - 1:
+                is_dev = True
+            self.dev[stratum] += is_dev
+        
+        return 'dev' if is_dev else 'train'
+
+
+class NearDuplicateFilter:
+    """Supprime les quasi-doublons d'un flux de records (MinHash + LSH), en temps ~linéaire.
+
+    Chaque texte est réduit à une signature MinHash de ses shingles de mots ;
+    les signatures sont découpées en bandes, et seuls les documents partageant
+    une bande sont comparés (Jaccard estimé >= ``threshold``). Le premier
+    document d'un groupe en est le représentant ; au plus ``keep`` documents
+    par groupe sont conservés (``keep > 1`` atténue les doublons sans les
+    supprimer). Le résultat ne dépend que de l'ordre du flux : train et dev
+    voient le même filtrage.
+    """
+
+    def __init__(self, threshold=DEDUP_THRESHOLD, num_perm=DEDUP_NUM_PERM, shingle_size=DEDUP_SHINGLE_SIZE,
+                 keep=1, seed=DEFAULT_SEED):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError(f"Seuil de similarité hors de ]0, 1]: {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.keep = max(keep, 1)
+        rng = np.random.default_rng(seed)
+        # Permutations par hachage multiply-shift : ((a * x + b) mod 2**64) >> 32, a impair
+        self.a = rng.integers(0, 2**64, size=(num_perm, 1), dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2**64, size=(num_perm, 1), dtype=np.uint64)
+        self.bands, self.rows = self.lsh_params(threshold, num_perm)
+        self.band_mix = rng.integers(0, 2**64, size=self.rows, dtype=np.uint64) | np.uint64(1)
+        self.buckets = [{} for _ in range(self.bands)]  # clé de bande -> représentant
+        self.signatures = []  # Signature de chaque représentant
+        self.group_sizes = []  # Documents vus par groupe
+        self.samples = {}  # Représentant -> premier doublon rencontré (rapport)
+        self.seen = 0
+        self.kept = 0
+
+    @staticmethod
+    def lsh_params(threshold, num_perm):
+        """(bandes, lignes) dont le seuil de la courbe en S, (1/b)^(1/r), est le plus proche de ``threshold``."""
+        candidates = ((bands, num_perm // bands) for bands in range(1, num_perm + 1))
+        return min(candidates, key=lambda p: (abs((1 / p[0]) ** (1 / p[1]) - threshold), -p[0] * p[1]))
+
+    def shingles(self, text):
+        words = re.findall(r'\w+', text.lower())
+        size = self.shingle_size
+        return [' '.join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))]
+
+    def signatures_of(self, texts):
+        """Signatures MinHash (n, num_perm) d'un lot de textes, calculées en une passe NumPy."""
+        lengths = []
+        hashes = []
+        for text in texts:
+            shingles = self.shingles(text)
+            lengths.append(len(shingles))
+            hashes.extend(zlib.crc32(shingle.encode('utf-8')) for shingle in shingles)
+        hashes = np.array(hashes, dtype=np.uint64)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        permuted = (self.a * hashes + self.b) >> np.uint64(32)
+        return np.minimum.reduceat(permuted, starts, axis=1).T.astype(np.uint32)
+
+    def band_keys(self, signatures):
+        """Clé 64 bits de chaque bande (n, bands) ; une collision est écartée par la vérification du Jaccard."""
+        bands = signatures[:, :self.bands * self.rows].reshape(len(signatures), self.bands, self.rows)
+        return (bands.astype(np.uint64) * self.band_mix).sum(axis=2, dtype=np.uint64).tolist()
+
+    def group_of(self, signature, keys):
+        """Représentant du groupe de quasi-doublons de la signature, ou None."""
+        candidates = {self.buckets[band][key] for band, key in enumerate(keys) if key in self.buckets[band]}
+        for rep in sorted(candidates):
+            if np.count_nonzero(self.signatures[rep] == signature) >= self.threshold * self.num_perm:
+                return rep
+        return None
+
+    def filter(self, records):
+        """Flux des records conservés, dans l'ordre d'origine."""
+        for batch in iter(lambda: list(islice(records, DEDUP_BATCH)), []):
+            signatures = self.signatures_of([item['text'] for item in batch])
+            for item, signature, keys in zip(batch, signatures, self.band_keys(signatures)):
+                self.seen += 1
+                rep = self.group_of(signature, keys)
+                if rep is None:
+                    rep = len(self.signatures)
+                    self.signatures.append(signature)
+                    self.group_sizes.append(0)
+                    for band, key in enumerate(keys):
+                        self.buckets[band].setdefault(key, rep)
+                elif rep not in self.samples:
+                    self.samples[rep] = item['text']
+                self.group_sizes[rep] += 1
+                if self.group_sizes[rep] <= self.keep:
+                    self.kept += 1
+                    yield item
+
+    def summary(self, top=5):
+        """Bilan : documents vus / conservés, réduction du corpus et plus gros groupes."""
+        largest = sorted(self.samples, key=lambda rep: -self.group_sizes[rep])[:top]
+        return {
+            'documents': self.seen,
+            'kept': self.kept,
+            'dropped': self.seen - self.kept,
+            'shrink': (self.seen - self.kept) / self.seen if self.seen else 0.0,
+            'groups_with_duplicates': len(self.samples),
+            'largest_groups': [(self.group_sizes[rep], self.samples[rep]) for rep in largest],
+        }
+
+    def print_summary(self):
+        stats = self.summary()
+        print(f"🧹 Quasi-doublons (Jaccard >= {self.threshold}, {self.bands} bandes x {self.rows}, "
+              f"max {self.keep}/groupe): {stats['documents']} → {stats['kept']} documents "
+              f"(-{stats['dropped']}, corpus réduit de {stats['shrink']:.1%})")
+        for size, text in stats['largest_groups']:
+            print(f"   {size:>6} x  {text[:80]}")
+
+
+def list_jsonl_files(path):
+    """Fichiers JSONL à lire (le fichier lui-même ou les shards d'un dossier) ; ValueError si aucun."""
+    path = Path(path)
+    if path.name.endswith(annotate.STORE_SUFFIX):
+        raise ValueError(f"Stockage {path} incomplet (écriture interrompue ?) : relancez 1_annotate_data.py.")
+    if not path.is_dir():
+        return [path]
+    files = sorted(f for f in path.iterdir() if f.name.endswith(JSONL_SUFFIXES))
+    if not files:
+        raise ValueError(f"Aucun fichier {'/'.join(JSONL_SUFFIXES)} dans {path} : relancez 1_annotate_data.py.")
+    return files
+
+
+def iter_jsonl_records(path):
+    """Records d'un JSONL (éventuellement .gz/.zst), d'un dossier de shards ou d'un stockage colonnaire, en flux."""
+    path = Path(path)
+    if annotate.is_annotation_store(path):
+        yield from annotate.AnnotationStore(path)
+        return
+    for file in list_jsonl_files(path):
+        with annotate.open_text_file(file) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class JsonlCorpus:
+    """Corpus spaCy lu directement depuis le JSONL d'annotations, sans .spacy intermédiaire.
+    
+    Chaque appel relit le fichier et construit les Examples à la volée ; le
+    split train/dev est recalculé avec un StreamingSplitter neuf, donc
+    identique à chaque époque et cohérent entre [corpora.train] et [corpora.dev].
+    ``seed`` vaut DEFAULT_SEED par défaut : passer ``${system.seed}`` pour
+    reproduire le split de 2_train_model.py.
+    """
+    
+    def __init__(self, path, split='train', train_ratio=TRAIN_RATIO, seed=DEFAULT_SEED, stratify=False,
+                 max_length=0, limit=0, dedup_threshold=0.0, dedup_keep=1):
+        if split not in ('train', 'dev'):
+            raise ValueError(f"split doit valoir 'train' ou 'dev' (reçu: {split!r})")
+        self.path = Path(path)
+        self.split = split
+        self.train_ratio = train_ratio
+        self.seed = seed
+        self.stratify = stratify
+        self.max_length = max_length
+        self.limit = limit
+        self.dedup_threshold = dedup_threshold
+        self.dedup_keep = dedup_keep
+    
+    def __call__(self, nlp):
+        splitter = StreamingSplitter(self.train_ratio, self.seed, self.stratify)
+        records = iter_jsonl_records(self.path)
+        if self.dedup_threshold:
+            records = NearDuplicateFilter(self.dedup_threshold, keep=self.dedup_keep, seed=self.seed).filter(records)
+        count = 0
+        for item in records:
+            # Le splitter voit tous les records (état de stratification), même hors split
+            if splitter(item) != self.split:
+                continue
+            reference, _ = make_annotated_doc(nlp, item)
+            if self.max_length and len(reference) > self.max_length:
+                continue
+            yield Example(nlp.make_doc(item["text"]), reference)
+            count += 1
+            if self.limit and count >= self.limit:
+                break
+
+
+@spacy.registry.readers(READER_NAME)
+def create_jsonl_corpus(path: Path, split: str = 'train', train_ratio: float = TRAIN_RATIO,
+                        seed: int = DEFAULT_SEED, stratify: bool = False, max_length: int = 0,
+                        limit: int = 0, dedup_threshold: float = 0.0, dedup_keep: int = 1) -> JsonlCorpus:
+    return JsonlCorpus(path, split, train_ratio, seed, stratify, max_length, limit, dedup_threshold, dedup_keep)
+
+
+def iter_split_records(json_file, splitter, dedup=None):
+    """Lit le JSONL en flux (sans ses quasi-doublons avec ``dedup``) et associe chaque record à 'train' ou 'dev'."""
+    records = iter_jsonl_records(json_file)
+    if dedup is not None:
+        records = dedup.filter(records)
+    for item in tqdm(records):
+        yield splitter(item), item
+
+
+def convert_data_to_split_docbins(json_file, splitter, dedup=None):
+    """Convertit le JSONL en deux DocBin (train, dev) en un seul passage."""
     nlp = spacy.blank("xx")
-    doc_bin = DocBin()
+    doc_bins = {'train': DocBin(), 'dev': DocBin()}
+    skipped = 0
+    
+    print(f"📦 Conversion de {json_file} vers DocBin (train/dev)...")
     
-    print(f"📦 Conversion de {json_file} vers DocBin...")
+    for split, item in iter_split_records(json_file, splitter, dedup):
+        doc, doc_skipped = make_annotated_doc(nlp, item)
+        skipped += doc_skipped
+        doc_bins[split].add(doc)
     
+    if skipped > 0:
+        print(f"⚠️  {skipped} entités ignorées (problèmes d'alignement)")
+    print(f"✅ {len(doc_bins['train']) + len(doc_bins['dev'])} documents convertis")
+    
+    return doc_bins['train'], doc_bins['dev']
+
+
+def write_shard(shard_index, records, output_dir):
+    """Convertit un bloc de records et écrit ses shards train/dev ; exécuté dans les workers."""
+    doc_bins = {'train': DocBin(), 'dev': DocBin()}
     skipped = 0
-    total = 0
+    for split, item in records:
+        doc, doc_skipped = make_annotated_doc(_WORKER_NLP, item)
+        skipped += doc_skipped
+        doc_bins[split].add(doc)
     
-    try:
-        with jsonlines.open(json_file) as reader:
-            for item in tqdm(reader):
-                total += 1
-                text = item["text"]
-                labels = item["labels"]
-                
-                doc = nlp.make_doc(text)
-                ents = []
-                
-                for start, end, label in labels:
-                    span = doc.char_span(start, end, label=label, alignment_mode="contract")
-                    if span is not None:
-                        ents.append(span)
-                    else:
-                        skipped += 1
-                
-                # Sauvegarder même si certaines entités ont échoué
-                doc.ents = ents
-                doc_bin.add(doc)
-                
-    except FileNotFoundError:
-        print(f"❌ ERREUR: '{json_file}' non trouvé. Exécutez 1_annotate_data_IMPROVED.py d'abord.")
-        exit()
+    for split, doc_bin in doc_bins.items():
+        if len(doc_bin):
+            doc_bin.to_disk(Path(output_dir) / split / f"shard_{shard_index:05d}.spacy")
+    return len(doc_bins['train']), len(doc_bins['dev']), skipped
+
+
+def convert_data_to_shards(json_file, output_dir, splitter, shard_size=SHARD_SIZE, workers=1, dedup=None):
+    """Convertit le JSONL en shards .spacy écrits directement dans ``output_dir/train`` et ``output_dir/dev``.
+
+    Les blocs de ``shard_size`` records sont tokenisés en parallèle ; aucun
+    DocBin global n'est construit ni relu. ``spacy.Corpus.v1`` lit ces
+    répertoires tels quels (--paths.train / --paths.dev).
+    """
+    output_dir = Path(output_dir)
+    for split in ('train', 'dev'):
+        (output_dir / split).mkdir(parents=True, exist_ok=True)
+        # Les shards d'un run précédent seraient relus par spacy.Corpus
+        for old_shard in (output_dir / split).glob('shard_*.spacy'):
+            old_shard.unlink()
+    
+    print(f"📦 Conversion de {json_file} en shards de {shard_size} documents ({workers} workers)...")
+    
+    records = iter_split_records(json_file, splitter, dedup)
+    shards = enumerate(iter(lambda: list(islice(records, shard_size)), []))
+    n_train = n_dev = skipped = n_shards = 0
+    
+    if workers <= 1:
+        _init_shard_worker()
+        results = (write_shard(index, batch, output_dir) for index, batch in shards)
+    else:
+        results = _write_shards_parallel(shards, output_dir, workers)
+    
+    for shard_train, shard_dev, shard_skipped in results:
+        n_train += shard_train
+        n_dev += shard_dev
+        skipped += shard_skipped
+        n_shards += 1
     
     if skipped > 0:
         print(f"⚠️  {skipped} entités ignorées (problèmes d'alignement)")
-    print(f"✅ {total} documents convertis")
+    print(f"✅ {n_train + n_dev} documents convertis en {n_shards} shards")
     
-    return doc_bin
+    return n_train, n_dev
+
+
+def _write_shards_parallel(shards, output_dir, workers):
+    """Distribue les shards aux workers (au plus 2 * workers blocs en mémoire)."""
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_shard_worker) as executor:
+        pending = deque()
+        for index, batch in shards:
+            pending.append(executor.submit(write_shard, index, batch, output_dir))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convertit les annotations JSONL au format spaCy (train/dev).")
+    parser.add_argument('--input', default=TRAIN_DATA_FILE,
+                        help=f"Fichier JSONL d'annotations ou dossier {annotate.STORE_SUFFIX} (défaut: {TRAIN_DATA_FILE})")
+    parser.add_argument('--output-dir',
+                        help="Écrit des shards .spacy dans OUTPUT_DIR/train et OUTPUT_DIR/dev "
+                             f"au lieu de {TRAIN_OUTPUT_FILE} / {DEV_OUTPUT_FILE}")
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE,
+                        help=f"Documents par shard (défaut: {SHARD_SIZE})")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Processus de conversion en mode shards (défaut: nombre de CPU)")
+    parser.add_argument('--train-ratio', type=float, default=TRAIN_RATIO,
+                        help=f"Part des documents envoyés dans train (défaut: {TRAIN_RATIO})")
+    parser.add_argument('--seed', type=int, default=None,
+                        help=f"Graine du split (défaut: [system] seed de {CONFIG_FILE})")
+    parser.add_argument('--stratify', action='store_true',
+                        help="Stratifie le split par label d'entité dominant")
+    parser.add_argument('--dedup-threshold', type=float, nargs='?', const=DEDUP_THRESHOLD,
+                        help=f"Supprime les quasi-doublons (MinHash/LSH) au-delà de cette similarité "
+                             f"(sans valeur: {DEDUP_THRESHOLD})")
+    parser.add_argument('--dedup-keep', type=int, default=1,
+                        help="Documents conservés par groupe de quasi-doublons (défaut: 1)")
+    args = parser.parse_args()
+    if not 0.0 < args.train_ratio <= 1.0:
+        parser.error(f"--train-ratio doit être dans ]0, 1] (reçu: {args.train_ratio})")
+    if args.dedup_threshold is not None and not 0.0 < args.dedup_threshold <= 1.0:
+        parser.error(f"--dedup-threshold doit être dans ]0, 1] (reçu: {args.dedup_threshold})")
+    if args.dedup_keep < 1:
+        parser.error(f"--dedup-keep doit être >= 1 (reçu: {args.dedup_keep})")
+    return args
 
 
 if __name__ == '__main__':
+    args = parse_args()
+    
     print("\n" + "="*70)
     print("  CONVERSION DES DONNÉES D'ENTRAÎNEMENT")
     print("="*70 + "\n")
     
-    # 1. Conversion
-    doc_bin = convert_data_to_docbin(TRAIN_DATA_FILE)
+    seed = args.seed if args.seed is not None else read_config_seed()
+    splitter = StreamingSplitter(args.train_ratio, seed, args.stratify)
+    print(f"🔀 Split train/dev déterministe: {args.train_ratio:.0%} train, graine {seed}"
+          f"{', stratifié par label dominant' if args.stratify else ''}")
     
-    # 2. Séparation train/dev avec ratio 80/20
-    all_docs = list(doc_bin.get_docs(spacy.blank("xx").vocab))
-    random.shuffle(all_docs)
+    if not Path(args.input).exists():
+        print(f"❌ ERREUR: '{args.input}' non trouvé. Exécutez 1_annotate_data_IMPROVED.py d'abord.")
+        exit()
     
-    train_split = int(0.8 * len(all_docs))
-    train_docs = all_docs[:train_split]
-    dev_docs = all_docs[train_split:]
+    if not annotate.is_annotation_store(args.input):
+        try:
+            list_jsonl_files(args.input)
+        except ValueError as e:
+            print(f"❌ ERREUR: {e}")
+            exit()
+    else:
+        # Statistiques lues directement sur les colonnes mappées (sans parser les records)
+        store = annotate.AnnotationStore(args.input)
+        print(f"🗃️  Stockage colonnaire: {len(store)} documents, {store.meta['n_spans']} spans")
+        for label, count in sorted(store.label_counts().items(), key=lambda x: -x[1]):
+            print(f"   {label:<12} {count}")
     
-    train_doc_bin = DocBin(docs=train_docs)
-    dev_doc_bin = DocBin(docs=dev_docs)
+    dedup = NearDuplicateFilter(args.dedup_threshold, keep=args.dedup_keep, seed=seed) if args.dedup_threshold else None
     
-    # 3. Sauvegarde
-    train_doc_bin.to_disk(TRAIN_OUTPUT_FILE)
-    dev_doc_bin.to_disk(DEV_OUTPUT_FILE)
+    if args.output_dir:
+        # Conversion + séparation train/dev en un seul passage, shards écrits directement
+        n_train, n_dev = convert_data_to_shards(args.input, args.output_dir, splitter,
+                                                args.shard_size, args.workers, dedup)
+        train_path = Path(args.output_dir) / 'train'
+        dev_path = Path(args.output_dir) / 'dev'
+        
+        print(f"\n✅ Shards créés:")
+        print(f"   📁 {train_path} : {n_train} documents")
+        print(f"   📁 {dev_path} : {n_dev} documents")
+    else:
+        # Conversion + séparation train/dev en un seul passage
+        train_doc_bin, dev_doc_bin = convert_data_to_split_docbins(args.input, splitter, dedup)
+        n_train, n_dev = len(train_doc_bin), len(dev_doc_bin)
+        
+        # Sauvegarde
+        train_doc_bin.to_disk(TRAIN_OUTPUT_FILE)
+        dev_doc_bin.to_disk(DEV_OUTPUT_FILE)
+        train_path = TRAIN_OUTPUT_FILE
+        dev_path = DEV_OUTPUT_FILE
+        
+        print(f"\n✅ Fichiers créés:")
+        print(f"   📄 {TRAIN_OUTPUT_FILE} : {n_train} documents ({n_train / max(n_train + n_dev, 1):.0%})")
+        print(f"   📄 {DEV_OUTPUT_FILE} : {n_dev} documents ({n_dev / max(n_train + n_dev, 1):.0%})")
     
-    print(f"\n✅ Fichiers créés:")
-    print(f"   📄 {TRAIN_OUTPUT_FILE} : {len(train_docs)} documents (80%)")
-    print(f"   📄 {DEV_OUTPUT_FILE} : {len(dev_docs)} documents (20%)")
+    if dedup is not None:
+        print()
+        dedup.print_summary()
     
     print("\n" + "="*70)
     print("  PROCHAINE ÉTAPE: ENTRAÎNEMENT")
@@ -86,8 +498,27 @@ if __name__ == '__main__':
     print("\nCommande à exécuter:")
     print(f"python -m spacy train config_bilingual_fixed.cfg \\")
     print(f"    --output output_model_immo_ner_bilingual_v3 \\")
-    print(f"    --paths.train {TRAIN_OUTPUT_FILE} \\")
-    print(f"    --paths.dev {DEV_OUTPUT_FILE}")
+    print(f"    --paths.train {train_path} \\")
+    print(f"    --paths.dev {dev_path}")
+    print(f"\nOu directement depuis {args.input} (sans .spacy, même split):")
+    print(f"python -m spacy train config_bilingual_fixed.cfg --code 2_train_model.py \\")
+    print(f"    --output output_model_immo_ner_bilingual_v3 \\")
+    print(f"    --paths.train {args.input} --paths.dev {args.input} \\")
+    print(f"    --corpora.train.@readers {READER_NAME} --corpora.train.split train \\")
+    print(f"    --corpora.dev.@readers {READER_NAME} --corpora.dev.split dev \\")
+    # Mêmes paramètres de split que ce run (le lecteur a sinon une graine fixe, DEFAULT_SEED)
+    reader_options = {'seed': "'${system.seed}'" if args.seed is None else args.seed}
+    if args.train_ratio != TRAIN_RATIO:
+        reader_options['train_ratio'] = args.train_ratio
+    if args.stratify:
+        reader_options['stratify'] = 'true'
+    if dedup is not None:
+        reader_options['dedup_threshold'] = dedup.threshold
+        if dedup.keep != 1:
+            reader_options['dedup_keep'] = dedup.keep
+    for name, value in reader_options.items():
+        last = name == list(reader_options)[-1]
+        print(f"    --corpora.train.{name} {value} --corpora.dev.{name} {value}" + ("" if last else " \\"))
     
     print("\n💡 CONSEILS POUR L'ENTRAÎNEMENT:")
     print("   • Augmentez max_steps à 30000 si possible (meilleure convergence)")
@@ -2,17 +2,62 @@
 # Tests complets avec métriques, cas limites, et analyse détaillée
 
 import spacy
-from spacy import displacy
 from pathlib import Path
-from collections import defaultdict, Counter
+from collections import defaultdict, Counter, OrderedDict
+import argparse
+import bisect
+import cProfile
+import csv
+import importlib
 import json
+import platform
+import random
+import pstats
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 from datetime import datetime
+import numpy as np
+
+try:
+    import resource  # Unix uniquement (RSS maximal)
+except ImportError:
+    resource = None
+
+export_model = importlib.import_module('5_export_model')
+annotate = importlib.import_module('1_annotate_data')  # AnnotationStore (corpus de référence)
 
 # --- Configuration ---
 MODEL_BASE_DIR = 'output_model_immo_ner_bilingual_v3'
 MODEL_PATH = Path(MODEL_BASE_DIR) / 'model-best'
 OUTPUT_DIR = Path('test_results')
 OUTPUT_DIR.mkdir(exist_ok=True)
+BATCH_SIZE = 256  # Taille des lots pour nlp.pipe
+RESULT_CACHE_SIZE = 10000  # Entrées max du cache de résultats (--cache-size, 0 = désactivé)
+RESULT_CACHE_TTL = 3600    # Durée de vie d'une entrée en secondes (0 ou None = illimitée)
+
+# Benchmark de latence / débit
+CSV_FILE = 'house_price_bd.csv'
+BENCHMARK_SCHEMA_VERSION = 1  # À incrémenter si la structure du JSON de benchmark change
+BENCHMARK_SEED = 42
+EVALUATION_BATCH_SIZE = 512  # Taille des lots nlp.pipe de l'évaluation (--gold)
+BENCHMARK_BATCH_SIZES = [1, 8, 32, 128]
+BENCHMARK_PROCESSES = [1, 2]
+COLD_START_RUNS = 3
+# Profilage par composant : bornes (en tokens) des tranches de longueur
+PROFILE_LENGTH_BUCKETS = [8, 16, 32, 64, 128]
+PROFILE_SAMPLE_INTERVAL = 0.001  # Secondes entre deux échantillons de pile (--profile-stacks)
+PROFILE_TOP_FUNCTIONS = 25
+
+# Dégradation maximale tolérée par rapport à la baseline (ratio)
+REGRESSION_THRESHOLDS = {
+    'latency': 0.15,      # p50/p95/p99 jusqu'à +15%
+    'throughput': 0.15,   # docs/s jusqu'à -15%
+    'cold_start': 0.25,   # chargement jusqu'à +25%
+    'peak_rss': 0.10,     # mémoire jusqu'à +10%
+}
 
 # Labels du modèle
 ALL_LABELS = [
@@ -36,11 +81,112 @@ COLORS = {
 OPTIONS = {"colors": COLORS}
 
 
+def normalize_query(text):
+    """Normalise une requête pour le cache (casefold, espaces fusionnés et retirés aux bords).
+    
+    Retourne (texte normalisé, position d'origine de chaque caractère normalisé),
+    ce qui permet de convertir les offsets dans les deux sens.
+    """
+    chars = []
+    positions = []
+    previous_space = True
+    for i, ch in enumerate(text):
+        if ch.isspace():
+            if not previous_space:
+                chars.append(' ')
+                positions.append(i)
+            previous_space = True
+            continue
+        previous_space = False
+        for folded in ch.casefold():
+            chars.append(folded)
+            positions.append(i)
+    if chars and chars[-1] == ' ':
+        chars.pop()
+        positions.pop()
+    return ''.join(chars), positions
+
+
+class ResultCache:
+    """Cache LRU/TTL des entités prédites, indexé par requête normalisée.
+    
+    Les offsets sont stockés dans l'espace du texte normalisé puis reprojetés
+    sur le texte d'origine de chaque requête. Deux requêtes qui ne diffèrent
+    que par la casse ou les espaces partagent donc le même résultat, même si
+    le modèle (sensible à la casse) aurait pu les étiqueter différemment.
+    Le cache est vidé dès que l'empreinte du modèle change (``bind``).
+    """
+    
+    def __init__(self, max_size=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl or None
+        self.model_key = None
+        self.entries = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+    
+    def bind(self, model_key):
+        """Associe le cache à un modèle ; le vide si le modèle a changé."""
+        if model_key != self.model_key:
+            if self.entries:
+                self.stats['invalidations'] += 1
+            self.entries.clear()
+            self.model_key = model_key
+    
+    def get(self, text):
+        """Retourne les entités [(start, end, label)] de ``text`` ou None (miss)."""
+        key, positions = normalize_query(text)
+        entry = self.entries.get(key)
+        if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+            del self.entries[key]
+            self.stats['expirations'] += 1
+            entry = None
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return self.project(entry[1], positions)
+    
+    @staticmethod
+    def project(normalized, positions):
+        """Offsets du texte normalisé -> offsets du texte d'origine (``positions`` de normalize_query)."""
+        return [(positions[start], positions[end - 1] + 1, label) for start, end, label in normalized]
+    
+    @staticmethod
+    def normalize_entities(entities, positions):
+        """Offsets du texte d'origine -> offsets du texte normalisé."""
+        return [(bisect.bisect_left(positions, start), bisect.bisect_left(positions, end), label)
+                for start, end, label in entities]
+    
+    def put(self, text, entities):
+        """Enregistre les entités [(start, end, label)] prédites pour ``text``."""
+        key, positions = normalize_query(text)
+        self.entries[key] = (time.monotonic(), self.normalize_entities(entities, positions))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+    
+    def summary(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0,
+            'size': len(self.entries),
+            'max_size': self.max_size,
+            'ttl_s': self.ttl,
+        }
+
+
 class NERModelTester:
     """Classe pour tester et évaluer un modèle NER personnalisé."""
     
-    def __init__(self, model_path):
+    def __init__(self, model_path, hybrid=False, cache_size=0, cache_ttl=RESULT_CACHE_TTL):
         self.model_path = model_path
+        self.hybrid = hybrid
+        self.hybrid_rules = None
+        self.result_cache = ResultCache(cache_size, cache_ttl) if cache_size else None
+        self.loaded_model_path = None
         self.nlp = None
         self.test_results = {
             'timestamp': datetime.now().isoformat(),
@@ -53,23 +199,49 @@ class NERModelTester:
     def load_model(self):
         """Charge le modèle NER avec gestion d'erreurs."""
         try:
-            self.nlp = spacy.load(self.model_path)
+            # Artefact d'inférence (5_export_model.py) ou modèle spaCy classique
+            self.nlp = export_model.load_model(self.model_path)
+            self.loaded_model_path = Path(self.model_path)
             print(f"✅ Modèle chargé avec succès: {self.model_path}")
             print(f"   Pipeline: {self.nlp.pipe_names}")
             print(f"   Labels NER: {self.nlp.get_pipe('ner').labels}")
+            self._enable_hybrid()
+            self._bind_result_cache()
             return True
         except OSError:
             # Essayer model-last si model-best n'existe pas
             model_path_last = Path(MODEL_BASE_DIR) / 'model-last'
             try:
                 self.nlp = spacy.load(model_path_last)
+                self.loaded_model_path = model_path_last
                 print(f"✅ Modèle chargé (fallback): {model_path_last}")
+                self._enable_hybrid()
+                self._bind_result_cache()
                 return True
             except OSError:
                 print(f"❌ ERREUR: Impossible de charger le modèle.")
                 print(f"   Vérifiez: {MODEL_BASE_DIR}/model-best ou model-last")
                 return False
     
+    def _enable_hybrid(self):
+        """Ajoute le composant règles + chemin rapide (6_hybrid_pipeline.py) si demandé."""
+        if not self.hybrid:
+            return
+        hybrid_pipeline = importlib.import_module('6_hybrid_pipeline')
+        self.hybrid_rules = hybrid_pipeline.add_hybrid_rules(self.nlp)
+        print(f"   Pipeline hybride: {hybrid_pipeline.COMPONENT_NAME} → {self.hybrid_rules.neural_components}")
+    
+    def model_fingerprint(self):
+        """Identifie le modèle chargé : chemin, nom/version, pipeline et date des fichiers."""
+        path = Path(self.loaded_model_path).resolve()
+        mtimes = [f.stat().st_mtime_ns for f in (path / 'meta.json', path / export_model.MANIFEST_FILE) if f.exists()]
+        meta = self.nlp.meta
+        return (str(path), meta.get('name'), meta.get('version'), tuple(self.nlp.pipe_names), tuple(mtimes))
+    
+    def _bind_result_cache(self):
+        if self.result_cache is not None:
+            self.result_cache.bind(self.model_fingerprint())
+    
     def get_test_cases(self):
         """Retourne un ensemble complet de cas de test organisés par catégorie."""
         return {
@@ -140,34 +312,97 @@ class NERModelTester:
             ]
         }
     
-    def test_single_phrase(self, phrase, category=""):
-        """Teste une phrase et retourne les résultats détaillés."""
-        if not phrase.strip():
-            return None
-            
-        doc = self.nlp(phrase)
-        
+    def _build_result(self, doc, phrase, category=""):
+        """Construit le dictionnaire de résultats d'un Doc et met à jour entity_counts."""
+        entities = [(ent.start_char, ent.end_char, ent.label_) for ent in doc.ents]
+        if self.result_cache is not None:
+            self.result_cache.put(phrase, entities)
+        return self._result_from_entities(entities, phrase, category)
+    
+    def _result_from_entities(self, entities, phrase, category=""):
+        """Construit le dictionnaire de résultats à partir d'offsets (start, end, label)."""
         result = {
             'category': category,
             'text': phrase,
             'entities': [],
-            'entity_count': len(doc.ents),
-            'has_entities': len(doc.ents) > 0
+            'entity_count': len(entities),
+            'has_entities': len(entities) > 0
         }
         
-        for ent in doc.ents:
+        for start, end, label in entities:
             entity_info = {
-                'text': ent.text,
-                'label': ent.label_,
-                'start': ent.start_char,
-                'end': ent.end_char
+                'text': phrase[start:end],
+                'label': label,
+                'start': start,
+                'end': end
             }
             result['entities'].append(entity_info)
-            self.test_results['entity_counts'][ent.label_] += 1
+            self.test_results['entity_counts'][label] += 1
         
         return result
     
-    def run_comprehensive_tests(self):
+    def _cached_result(self, phrase, category=""):
+        """Résultat depuis le cache, ou None si absent (ou cache désactivé)."""
+        if self.result_cache is None:
+            return None
+        entities = self.result_cache.get(phrase)
+        return self._result_from_entities(entities, phrase, category) if entities is not None else None
+    
+    def test_single_phrase(self, phrase, category=""):
+        """Teste une phrase et retourne les résultats détaillés."""
+        if not phrase.strip():
+            return None
+        
+        cached = self._cached_result(phrase, category)
+        if cached is not None:
+            return cached
+        return self._build_result(self.nlp(phrase), phrase, category)
+    
+    def test_phrases(self, phrases, categories=None, batch_size=BATCH_SIZE, n_process=1):
+        """Teste un lot de phrases avec ``nlp.pipe`` (batching tok2vec + NER).
+        
+        Retourne une liste alignée sur ``phrases`` avec les mêmes dictionnaires
+        que ``test_single_phrase`` (None pour les phrases vides).
+        ``categories`` est une liste optionnelle de catégories, une par phrase.
+        """
+        phrases = list(phrases)
+        categories = list(categories) if categories is not None else [""] * len(phrases)
+        results = [None] * len(phrases)
+        
+        indexed = []
+        duplicates = []  # (indice, clé, positions) des requêtes déjà présentes dans le lot
+        pending = {}  # clé normalisée -> indice de la requête inférée
+        for i, phrase in enumerate(phrases):
+            if not phrase.strip():
+                continue
+            if self.result_cache is not None:
+                key, positions = normalize_query(phrase)
+                if key in pending:
+                    duplicates.append((i, key, positions))
+                    continue
+                results[i] = self._cached_result(phrase, categories[i])
+                if results[i] is not None:
+                    continue
+                pending[key] = i
+            indexed.append((i, phrase))
+        docs = self.nlp.pipe((phrase for _, phrase in indexed), batch_size=batch_size, n_process=n_process)
+        for (i, phrase), doc in zip(indexed, docs):
+            results[i] = self._build_result(doc, phrase, categories[i])
+        
+        # Doublons servis depuis le lot lui-même : l'entrée du cache a pu être évincée (LRU) ou expirer (TTL)
+        batch_entities = {}
+        for i, key, positions in duplicates:
+            if key not in batch_entities:
+                first = phrases[pending[key]]
+                entities = [(e['start'], e['end'], e['label']) for e in results[pending[key]]['entities']]
+                batch_entities[key] = ResultCache.normalize_entities(entities, normalize_query(first)[1])
+            self.result_cache.stats['hits'] += 1
+            results[i] = self._result_from_entities(ResultCache.project(batch_entities[key], positions),
+                                                    phrases[i], categories[i])
+        
+        return results
+    
+    def run_comprehensive_tests(self, batch_size=BATCH_SIZE, n_process=1):
         """Exécute tous les tests et compile les statistiques."""
         print("\n" + "="*80)
         print("🧪 TESTS COMPLETS DU MODÈLE NER - IMMOBILIER BILINGUE")
@@ -176,12 +411,17 @@ class NERModelTester:
         test_cases = self.get_test_cases()
         all_results = []
         
+        # Inférence de toutes les phrases en un seul passage nlp.pipe
+        pairs = [(category, phrase) for category, phrases in test_cases.items() for phrase in phrases]
+        batch_results = iter(self.test_phrases([phrase for _, phrase in pairs], [category for category, _ in pairs],
+                                               batch_size=batch_size, n_process=n_process))
+        
         for category, phrases in test_cases.items():
             print(f"\n📋 Catégorie: {category}")
             print("-" * 80)
             
             for phrase in phrases:
-                result = self.test_single_phrase(phrase, category)
+                result = next(batch_results)
                 if result:
                     all_results.append(result)
                     self.test_results['test_cases'].append(result)
@@ -212,6 +452,10 @@ class NERModelTester:
         if total > 0:
             stats['detection_rate'] = (stats['tests_with_entities'] / total) * 100
             stats['avg_entities_per_test'] = sum(self.test_results['entity_counts'].values()) / total
+        if self.hybrid_rules is not None:
+            self.test_results['hybrid'] = self.hybrid_rules.summary()
+        if self.result_cache is not None:
+            self.test_results['result_cache'] = self.result_cache.summary()
     
     def _print_statistics(self):
         """Affiche un résumé des statistiques."""
@@ -224,6 +468,14 @@ class NERModelTester:
         print(f"✅ Tests avec entités détectées: {stats['tests_with_entities']}")
         print(f"✅ Taux de détection: {stats.get('detection_rate', 0):.2f}%")
         print(f"✅ Moyenne d'entités par test: {stats.get('avg_entities_per_test', 0):.2f}")
+        hybrid = self.test_results.get('hybrid')
+        if hybrid:
+            print(f"⚡ Chemin rapide (règles seules, sans tok2vec/ner): "
+                  f"{hybrid['fast_path']}/{hybrid['docs']} ({hybrid['fast_path_rate']:.0%})")
+        cache = self.test_results.get('result_cache')
+        if cache:
+            print(f"🗃️  Cache de résultats: {cache['hits']} hits / {cache['misses']} misses "
+                  f"({cache['hit_rate']:.0%}), {cache['size']}/{cache['max_size']} entrées")
         
         print("\n📈 Répartition des Entités Détectées:")
         entity_counts = self.test_results['entity_counts']
@@ -233,8 +485,11 @@ class NERModelTester:
             bar = "█" * (count // 5 + 1)
             print(f"   {label:12} : {count:3} {bar}")
     
-    def generate_html_visualizations(self):
-        """Génère des visualisations HTML pour différents cas de test."""
+    def generate_html_visualizations(self, workers=1):
+        """Rapport HTML paginé (9_html_report.py) : phrases de démonstration puis tous les cas de test.
+        
+        Les pages inchangées depuis le run précédent ne sont pas ré-écrites.
+        """
         print("\n" + "="*80)
         print("🎨 GÉNÉRATION DES VISUALISATIONS HTML")
         print("="*80)
@@ -254,151 +509,20 @@ class NERModelTester:
              "Villa NEUVE 5 chambres 4 baths 350m² PISCINE JARDIN GARAGE 2 places à VENDRE Carthage état MODERNE 980000 TND")
         ]
         
-        html_files = []
-        
-        for title, phrase in visualization_phrases:
-            doc = self.nlp(phrase)
-            
-            # Génération HTML
-            html = displacy.render(doc, style="ent", options=OPTIONS, page=True)
-            
-            # Ajout d'un titre et de métadonnées
-            html = html.replace(
-                '<body>',
-                f'<body><h1 style="text-align:center; color:#2C3E50;">{title}</h1>'
-                f'<p style="text-align:center; color:#7F8C8D; font-style:italic;">"{phrase}"</p><hr>'
-            )
-            
-            # Sauvegarde
-            filename = OUTPUT_DIR / f"visualization_{title.lower().replace(' ', '_')}.html"
-            with open(filename, "w", encoding="utf-8") as f:
-                f.write(html)
-            
-            html_files.append(filename)
-            print(f"   ✓ {title}: {filename}")
-        
-        # Génération d'une page index
-        self._generate_index_page(html_files)
-        
-        return html_files
-    
-    def _generate_index_page(self, html_files):
-        """Génère une page index pour toutes les visualisations."""
-        index_html = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <title>NER Model - Visualisations</title>
-            <style>
-                body {
-                    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                    max-width: 1200px;
-                    margin: 0 auto;
-                    padding: 40px;
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                }
-                .container {
-                    background: white;
-                    border-radius: 10px;
-                    padding: 40px;
-                    box-shadow: 0 10px 40px rgba(0,0,0,0.1);
-                }
-                h1 {
-                    color: #2C3E50;
-                    text-align: center;
-                    margin-bottom: 40px;
-                }
-                .card {
-                    border: 2px solid #ecf0f1;
-                    border-radius: 8px;
-                    padding: 20px;
-                    margin: 20px 0;
-                    transition: transform 0.2s, box-shadow 0.2s;
-                }
-                .card:hover {
-                    transform: translateY(-5px);
-                    box-shadow: 0 5px 20px rgba(0,0,0,0.1);
-                }
-                .card a {
-                    color: #3498db;
-                    text-decoration: none;
-                    font-size: 18px;
-                    font-weight: bold;
-                }
-                .card a:hover {
-                    color: #2980b9;
-                }
-                .legend {
-                    display: grid;
-                    grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-                    gap: 15px;
-                    margin-top: 30px;
-                }
-                .legend-item {
-                    display: flex;
-                    align-items: center;
-                    padding: 10px;
-                    border-radius: 5px;
-                    background: #f8f9fa;
-                }
-                .legend-color {
-                    width: 30px;
-                    height: 30px;
-                    border-radius: 5px;
-                    margin-right: 10px;
-                }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h1>🏠 NER Model - Visualisations Immobilières</h1>
-                <p style="text-align: center; color: #7F8C8D;">
-                    Modèle bilingue (Français/Anglais) pour l'extraction d'entités immobilières
-                </p>
-                
-                <h2>📊 Visualisations Disponibles:</h2>
-        """
-        
-        for html_file in html_files:
-            title = html_file.stem.replace('visualization_', '').replace('_', ' ').title()
-            index_html += f"""
-                <div class="card">
-                    <a href="{html_file.name}" target="_blank">
-                        📄 {title}
-                    </a>
-                    <p style="color: #7F8C8D; margin: 10px 0 0 0;">
-                        Cliquez pour voir la visualisation interactive
-                    </p>
-                </div>
-            """
-        
-        # Ajout de la légende des couleurs
-        index_html += """
-                <h2>🎨 Légende des Entités:</h2>
-                <div class="legend">
-        """
-        
-        for label, color in COLORS.items():
-            index_html += f"""
-                <div class="legend-item">
-                    <div class="legend-color" style="background-color: {color};"></div>
-                    <strong>{label}</strong>
-                </div>
-            """
-        
-        index_html += """
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        index_path = OUTPUT_DIR / "index.html"
-        with open(index_path, "w", encoding="utf-8") as f:
-            f.write(index_html)
+        records = [
+            {'text': phrase, 'category': title,
+             'entities': [(ent.start_char, ent.end_char, ent.label_) for ent in doc.ents]}
+            for (title, phrase), doc in zip(visualization_phrases, self.nlp.pipe(p for _, p in visualization_phrases))
+        ]
+        records += self.test_results['test_cases']
         
-        print(f"\n   ✓ Page d'index: {index_path}")
+        html_report = importlib.import_module('9_html_report')
+        result = html_report.write_report(records, OUTPUT_DIR, COLORS, title="NER Model - Visualisations Immobilières",
+                                          workers=workers)
+        print(f"   ✓ {result['documents']} documents, {result['pages']} page(s) "
+              f"({result['rendered']} rendue(s), {result['skipped']} inchangée(s))")
+        print(f"\n   ✓ Page d'index: {OUTPUT_DIR / 'index.html'}")
+        return result
     
     def save_test_report(self):
         """Sauvegarde un rapport JSON complet des tests."""
@@ -410,61 +534,826 @@ class NERModelTester:
         print(f"\n💾 Rapport sauvegardé: {report_path}")
         return report_path
     
-    def test_performance(self, num_iterations=100):
-        """Teste les performances du modèle (vitesse de traitement)."""
-        import time
+    def build_benchmark_corpus(self, csv_file=CSV_FILE, max_titles=500, n_long=100, seed=BENCHMARK_SEED):
+        """Corpus de benchmark par tranche de longueur.
+        
+        - ``short``  : requêtes de ``get_test_cases()``
+        - ``title``  : titres d'annonces de ``house_price_bd.csv`` (échantillon)
+        - ``long``   : descriptions longues (5 à 10 titres concaténés)
+        """
+        rng = random.Random(seed)
+        short = [p for phrases in self.get_test_cases().values() for p in phrases if p.strip()]
+        
+        titles = []
+        try:
+            with open(csv_file, encoding='utf-8', newline='') as f:
+                titles = [row['Title'] for row in csv.DictReader(f) if row.get('Title')]
+        except FileNotFoundError:
+            print(f"⚠️  '{csv_file}' non trouvé : corpus de benchmark limité aux cas de test")
+        titles = rng.sample(titles, min(max_titles, len(titles)))
+        
+        pool = titles or short
+        long = [". ".join(rng.choices(pool, k=rng.randint(5, 10))) + "." for _ in range(n_long)]
+        
+        return {'short': short, 'title': titles, 'long': long}
+    
+    def _measure_cold_start(self, text, runs=COLD_START_RUNS):
+        """Mesure import + chargement + premier appel dans un processus neuf."""
+        if export_model.is_inference_artifact(self.loaded_model_path):
+            loader = (f"sys.path.insert(0, {str(Path(__file__).resolve().parent)!r})\n"
+                      "import importlib\n"
+                      "load = importlib.import_module('5_export_model').load_inference_model\n")
+        else:
+            loader = "import spacy\nload = spacy.load\n"
+        script = (
+            "import json, sys, time\n"
+            "t0 = time.perf_counter()\n"
+            f"{loader}"
+            "t1 = time.perf_counter()\n"
+            "nlp = load(sys.argv[1])\n"
+            "t2 = time.perf_counter()\n"
+            "nlp(sys.argv[2])\n"
+            "t3 = time.perf_counter()\n"
+            "rss = None\n"
+            "try:\n"
+            "    import resource\n"
+            "    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+            "except ImportError:\n"
+            "    pass\n"
+            "print(json.dumps({'import_s': t1 - t0, 'load_s': t2 - t1, 'first_doc_s': t3 - t2, 'rss': rss}))\n"
+        )
+        measures = []
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, '-c', script, str(self.loaded_model_path), text],
+                                    capture_output=True, text=True, check=True).stdout
+            measures.append(json.loads(output.strip().splitlines()[-1]))
+        
+        median = lambda key: sorted(m[key] for m in measures)[len(measures) // 2]
+        rss = [m['rss'] for m in measures if m['rss'] is not None]
+        return {
+            'runs': runs,
+            'import_ms': median('import_s') * 1000,
+            'load_ms': median('load_s') * 1000,
+            'first_doc_ms': median('first_doc_s') * 1000,
+            'total_ms': (median('import_s') + median('load_s') + median('first_doc_s')) * 1000,
+            'peak_rss_mb': _rss_to_mb(max(rss)) if rss else None,
+        }
+    
+    def run_benchmark(self, num_iterations=3, batch_sizes=BENCHMARK_BATCH_SIZES, n_processes=BENCHMARK_PROCESSES,
+                      cold_start_runs=COLD_START_RUNS, baseline=None, thresholds=REGRESSION_THRESHOLDS):
+        """Benchmark latence (p50/p95/p99), débit nlp.pipe, démarrage à froid/à chaud et RSS.
         
+        Le résultat est sauvegardé en JSON versionné dans OUTPUT_DIR ; avec
+        ``baseline`` (chemin d'un JSON précédent), les régressions au-delà de
+        ``thresholds`` sont listées. Retourne (résultat, régressions).
+        """
         print("\n" + "="*80)
-        print("⚡ TEST DE PERFORMANCES")
+        print("⚡ BENCHMARK DE PERFORMANCES")
         print("="*80)
         
-        test_phrase = "Appartement 3 chambres à louer Tunis 120m² 800 TND garage"
+        corpus = self.build_benchmark_corpus()
+        mixed = [text for texts in corpus.values() for text in texts]
+        warmup_text = "Appartement 3 chambres à louer Tunis 120m² 800 TND garage"
         
-        # Warm-up
+        # Démarrage à froid (processus neuf) puis à chaud
+        cold_start = self._measure_cold_start(warmup_text, cold_start_runs) if cold_start_runs else None
+        start_time = time.perf_counter()
+        self.nlp(warmup_text)
+        first_call_ms = (time.perf_counter() - start_time) * 1000
         for _ in range(10):
-            _ = self.nlp(test_phrase)
+            self.nlp(warmup_text)
+        start_time = time.perf_counter()
+        self.nlp(warmup_text)
+        warm_call_ms = (time.perf_counter() - start_time) * 1000
+        
+        # Latence par requête (un appel nlp() par texte), par tranche de longueur
+        latency = {}
+        for bucket, texts in list(corpus.items()) + [('all', mixed)]:
+            if not texts:
+                continue
+            timings = []
+            for _ in range(num_iterations):
+                for text in texts:
+                    start_time = time.perf_counter()
+                    self.nlp(text)
+                    timings.append((time.perf_counter() - start_time) * 1000)
+            latency[bucket] = {
+                'n_texts': len(texts),
+                'avg_chars': sum(map(len, texts)) / len(texts),
+                **_latency_stats(timings)
+            }
         
-        # Test réel
-        start_time = time.time()
-        for _ in range(num_iterations):
-            doc = self.nlp(test_phrase)
-        end_time = time.time()
+        # Débit nlp.pipe selon batch_size et nombre de processus
+        throughput = []
+        total_chars = sum(map(len, mixed))
+        for n_process in n_processes:
+            for batch_size in batch_sizes:
+                start_time = time.perf_counter()
+                for _ in self.nlp.pipe(mixed, batch_size=batch_size, n_process=n_process):
+                    pass
+                elapsed = time.perf_counter() - start_time
+                throughput.append({
+                    'batch_size': batch_size,
+                    'n_process': n_process,
+                    'docs_per_second': len(mixed) / elapsed,
+                    'chars_per_second': total_chars / elapsed,
+                })
         
-        total_time = end_time - start_time
-        avg_time = (total_time / num_iterations) * 1000  # en millisecondes
+        result = {
+            'schema_version': BENCHMARK_SCHEMA_VERSION,
+            'timestamp': datetime.now().isoformat(),
+            'model': {
+                'path': str(self.loaded_model_path),
+                'name': self.nlp.meta.get('name'),
+                'version': self.nlp.meta.get('version'),
+                'pipeline': self.nlp.pipe_names,
+            },
+            'environment': {
+                'python': platform.python_version(),
+                'spacy': spacy.__version__,
+                'platform': platform.platform(),
+                'processor': platform.processor(),
+            },
+            'corpus': {bucket: len(texts) for bucket, texts in corpus.items()},
+            'cold_start': cold_start,
+            'warm': {'first_call_ms': first_call_ms, 'warm_call_ms': warm_call_ms},
+            'latency_ms': latency,
+            'throughput': throughput,
+            'peak_rss_mb': _peak_rss_mb(),
+        }
         
-        print(f"\n✅ Iterations: {num_iterations}")
-        print(f"✅ Temps total: {total_time:.3f} secondes")
-        print(f"✅ Temps moyen par requête: {avg_time:.2f} ms")
-        print(f"✅ Requêtes par seconde: {num_iterations / total_time:.0f}")
+        self._print_benchmark(result)
         
+        regressions = []
+        if baseline:
+            with open(baseline, encoding='utf-8') as f:
+                regressions = compare_benchmarks(result, json.load(f), thresholds)
+            _print_regressions(regressions, baseline)
+        result['regressions'] = regressions
+        
+        benchmark_path = OUTPUT_DIR / f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        with open(benchmark_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Benchmark sauvegardé: {benchmark_path}")
+        
+        # Résumé dans le rapport de test (clés historiques conservées)
         self.test_results['performance'] = {
-            'iterations': num_iterations,
-            'total_time': total_time,
-            'avg_time_ms': avg_time,
-            'requests_per_second': num_iterations / total_time
+            'benchmark_file': str(benchmark_path),
+            'avg_time_ms': latency['all']['mean_ms'],
+            'p50_ms': latency['all']['p50_ms'],
+            'p95_ms': latency['all']['p95_ms'],
+            'p99_ms': latency['all']['p99_ms'],
+            'requests_per_second': max(t['docs_per_second'] for t in throughput) if throughput else None,
+            'regressions': len(regressions),
         }
+        
+        return result, regressions
+    
+    def profile_components(self, corpus=None, batch_size=BATCH_SIZE, iterations=1, stacks=False):
+        """Temps par composant (tokenizer, puis chaque pipe) et coût par token, par tranche de longueur.
+        
+        Le pipeline est exécuté étape par étape : ``nlp.make_doc`` puis chaque
+        composant actif, un document à la fois (latence par requête) et par lots
+        (``pipe``). Les composants délégués par le pipeline hybride sont mesurés
+        séparément. Avec ``stacks``, une passe supplémentaire est profilée avec
+        cProfile (fichier .prof pour pstats/snakeviz) et par échantillonnage de
+        piles (fichier .folded, format « collapsed » de py-spy/flamegraph).
+        Le résultat est ajouté au rapport de save_test_report.
+        """
+        print("\n" + "="*80)
+        print("🔬 PROFILAGE PAR COMPOSANT")
+        print("="*80)
+        
+        corpus = corpus or self.build_benchmark_corpus()
+        texts = [text for bucket_texts in corpus.values() for text in bucket_texts]
+        stages = self._profile_stages()
+        names = ['tokenizer'] + [name for name, _, _ in stages]
+        
+        # Préchauffage (allocations, caches des couches)
+        for doc in self.nlp.pipe(texts[:BATCH_SIZE]):
+            pass
+        
+        # 1. Un document à la fois, agrégé par tranche de longueur (en tokens)
+        buckets = defaultdict(lambda: {'docs': 0, 'tokens': 0, 'seconds': dict.fromkeys(names, 0.0)})
+        for _ in range(iterations):
+            for text in texts:
+                timings = []
+                start_time = time.perf_counter()
+                doc = self.nlp.make_doc(text)
+                for name, run_doc, _ in stages:
+                    timings.append(time.perf_counter())
+                    doc = run_doc(doc)
+                timings.append(time.perf_counter())
+                bucket = buckets[_length_bucket(len(doc))]
+                bucket['docs'] += 1
+                bucket['tokens'] += len(doc)
+                for name, begin, end in zip(names, [start_time] + timings[:-1], timings):
+                    bucket['seconds'][name] += end - begin
+        
+        by_length = {label: _component_costs(buckets[label]) for label in _length_bucket_labels() if label in buckets}
+        overall = {'docs': 0, 'tokens': 0, 'seconds': dict.fromkeys(names, 0.0)}
+        for bucket in buckets.values():
+            overall['docs'] += bucket['docs']
+            overall['tokens'] += bucket['tokens']
+            for name in names:
+                overall['seconds'][name] += bucket['seconds'][name]
+        
+        # 2. Par lots : chaque étape est matérialisée avant la suivante
+        batch_seconds = dict.fromkeys(names, 0.0)
+        tokens = 0
+        for _ in range(iterations):
+            start_time = time.perf_counter()
+            docs = [self.nlp.make_doc(text) for text in texts]
+            batch_seconds['tokenizer'] += time.perf_counter() - start_time
+            tokens += sum(len(doc) for doc in docs)
+            for name, _, run_docs in stages:
+                start_time = time.perf_counter()
+                docs = run_docs(docs, batch_size)
+                batch_seconds[name] += time.perf_counter() - start_time
+        batch = _component_costs({'docs': len(texts) * iterations, 'tokens': tokens, 'seconds': batch_seconds})
+        
+        profile = {
+            'pipeline': names,
+            'iterations': iterations,
+            'length_buckets': PROFILE_LENGTH_BUCKETS,
+            'single_doc': {'overall': _component_costs(overall), 'by_length': by_length},
+            'batch': {'batch_size': batch_size, **batch},
+            'stacks': self._profile_stacks(texts) if stacks else None,
+        }
+        self.test_results['profile'] = profile
+        self._print_profile(profile)
+        return profile
+    
+    def _profile_stages(self):
+        """Étapes profilées : (nom, fonction sur un Doc, fonction sur une liste de Docs).
+        
+        Le composant hybride (6_hybrid_pipeline.py) est décomposé : ses règles,
+        puis chaque composant délégué, appliqué aux seuls documents hors chemin rapide.
+        """
+        def pipe_all(proc):
+            if hasattr(proc, 'pipe'):
+                return lambda docs, batch_size: list(proc.pipe(docs, batch_size=batch_size))
+            return lambda docs, batch_size: [proc(doc) for doc in docs]
+        
+        stages = []
+        for name, proc in self.nlp.pipeline:
+            delegated = getattr(proc, 'neural_components', None)
+            if not delegated:
+                stages.append((name, proc, pipe_all(proc)))
+                continue
+            def apply_rules(doc, proc=proc):
+                proc.apply_rules(doc)
+                return doc
+            stages.append((name, apply_rules, lambda docs, batch_size, rules=apply_rules: [rules(d) for d in docs]))
+            for sub_name in delegated:
+                sub_proc = self.nlp.get_pipe(sub_name)
+                def run_doc(doc, sub_proc=sub_proc):
+                    return doc if doc._.fast_path else sub_proc(doc)
+                def run_docs(docs, batch_size, run_neural=pipe_all(sub_proc)):
+                    run_neural([doc for doc in docs if not doc._.fast_path], batch_size)
+                    return docs
+                stages.append((sub_name, run_doc, run_docs))
+        return stages
+    
+    def _profile_stacks(self, texts):
+        """Passe profilée : cProfile (.prof) + piles échantillonnées (.folded) dans OUTPUT_DIR."""
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        prof_path = OUTPUT_DIR / f"profile_{stamp}.prof"
+        folded_path = OUTPUT_DIR / f"profile_{stamp}.folded"
+        
+        profiler = cProfile.Profile()
+        profiler.enable()
+        for text in texts:
+            self.nlp(text)
+        profiler.disable()
+        profiler.dump_stats(prof_path)
+        
+        sampler = StackSampler(threading.get_ident())
+        with sampler:
+            for text in texts:
+                self.nlp(text)
+        sampler.write_folded(folded_path)
+        
+        stats = pstats.Stats(profiler)
+        top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP_FUNCTIONS]
+        return {
+            'cprofile_file': str(prof_path),
+            'folded_file': str(folded_path),
+            'samples': sampler.samples,
+            'top_cumulative': [
+                {'function': f"{Path(filename).name}:{line}({function})", 'calls': calls,
+                 'tottime_ms': tottime * 1000, 'cumtime_ms': cumtime * 1000}
+                for (filename, line, function), (_, calls, tottime, cumtime, _) in top
+            ],
+        }
+    
+    def _print_profile(self, profile):
+        """Affiche la répartition du temps par composant et par tranche de longueur."""
+        names = profile['pipeline']
+        print(f"\n⏱  Un document à la fois (ms/doc, µs/token):")
+        print(f"   {'tokens':>8} {'docs':>6} " + " ".join(f"{name:>18}" for name in names))
+        rows = list(profile['single_doc']['by_length'].items()) + [('total', profile['single_doc']['overall'])]
+        for label, costs in rows:
+            cells = [f"{c['ms_per_doc']:>6.3f} {c['us_per_token']:>6.1f} {c['share']:>3.0%}"
+                     for c in (costs['components'][name] for name in names)]
+            print(f"   {label:>8} {costs['docs']:>6} " + " ".join(f"{cell:>18}" for cell in cells))
+        
+        batch = profile['batch']
+        print(f"\n🚀 Par lots (batch={batch['batch_size']}, µs/token):")
+        for name in names:
+            costs = batch['components'][name]
+            print(f"   {name:12} {costs['us_per_token']:>8.1f} µs/token {costs['share']:>5.0%}")
+        
+        if profile['stacks']:
+            print(f"\n🧵 cProfile: {profile['stacks']['cprofile_file']}")
+            print(f"🧵 Piles échantillonnées ({profile['stacks']['samples']}): {profile['stacks']['folded_file']}")
+    
+    def evaluate(self, gold, batch_size=EVALUATION_BATCH_SIZE, n_process=1, limit=None):
+        """Compare les prédictions aux spans de référence d'un AnnotationStore.
+        
+        Par label : précision / rappel / F1 en correspondance exacte (mêmes
+        offsets caractère et label) et partielle (chevauchement, même label),
+        plus une matrice de confusion label de référence -> label prédit
+        ("O" = aucun span). Les prédictions sont accumulées dans des colonnes
+        NumPy et tous les comptages sont faits par opérations vectorielles.
+        """
+        doc_ids = gold.ids()[:limit] if limit else gold.ids()
+        gold = gold.subset(doc_ids) if limit else gold
+        labels = sorted(set(gold.labels) | set(self.nlp.get_pipe('ner').labels))
+        label_index = {label: i for i, label in enumerate(labels)}
+        
+        print(f"\n🎯 Évaluation sur {len(doc_ids)} documents de référence ({gold.path})...")
+        start_time = time.perf_counter()
+        texts = (gold.get_text(doc_id) for doc_id in doc_ids.tolist())
+        pred_doc, pred_start, pred_end, pred_label = [], [], [], []
+        for i, doc in enumerate(self.nlp.pipe(texts, batch_size=batch_size, n_process=n_process)):
+            for ent in doc.ents:
+                pred_doc.append(i)
+                pred_start.append(ent.start_char)
+                pred_end.append(ent.end_char)
+                pred_label.append(label_index[ent.label_])
+        elapsed = time.perf_counter() - start_time
+        
+        # Spans de référence de la vue, renumérotés 0..n-1 comme les prédictions
+        counts = np.diff(gold.span_offsets)[doc_ids]
+        first = np.asarray(gold.span_offsets[doc_ids], dtype=np.int64)
+        positions = np.repeat(first - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+        remap = np.array([label_index[label] for label in gold.labels], dtype=np.int64)
+        gold_spans = _span_columns(np.repeat(np.arange(len(doc_ids)), counts), gold.span_start[positions],
+                                   gold.span_end[positions], remap[gold.span_label[positions]])
+        pred_spans = _span_columns(pred_doc, pred_start, pred_end, pred_label)
+        
+        evaluation = _score_spans(gold_spans, pred_spans, labels)
+        evaluation.update({
+            'gold_path': str(gold.path),
+            'documents': len(doc_ids),
+            'n_process': n_process,
+            'batch_size': batch_size,
+            'elapsed_s': elapsed,
+            'docs_per_second': len(doc_ids) / elapsed if elapsed else None,
+        })
+        self.test_results['evaluation'] = evaluation
+        self._print_evaluation(evaluation)
+        return evaluation
+    
+    def _print_evaluation(self, evaluation):
+        """Affiche P/R/F1 par label et les confusions les plus fréquentes."""
+        print(f"   {evaluation['documents']} documents en {evaluation['elapsed_s']:.1f} s "
+              f"({evaluation['docs_per_second']:.0f} docs/s)")
+        print(f"\n   {'label':12} {'réf.':>6} {'préd.':>6} {'P':>6} {'R':>6} {'F1':>6}   {'P~':>6} {'R~':>6} {'F1~':>6}")
+        rows = list(evaluation['per_label'].items()) + [('micro', evaluation['micro'])]
+        for label, scores in rows:
+            exact, partial = scores['exact'], scores['partial']
+            print(f"   {label:12} {scores['support']:>6} {scores['predicted']:>6} "
+                  f"{exact['precision']:>6.1%} {exact['recall']:>6.1%} {exact['f1']:>6.1%}   "
+                  f"{partial['precision']:>6.1%} {partial['recall']:>6.1%} {partial['f1']:>6.1%}")
+        print("   (~ : correspondance partielle, chevauchement avec le même label)")
+        
+        confusion = evaluation['confusion']
+        names = confusion['labels']
+        matrix = np.array(confusion['matrix'])
+        np.fill_diagonal(matrix, 0)
+        top = np.argsort(matrix, axis=None)[::-1][:8]
+        print("\n   Confusions (référence → prédit):")
+        for flat in top:
+            gold_i, pred_i = np.unravel_index(flat, matrix.shape)
+            if matrix[gold_i, pred_i]:
+                print(f"   {names[gold_i]:>12} → {names[pred_i]:<12} {matrix[gold_i, pred_i]}")
+    
+    def _print_benchmark(self, result):
+        """Affiche un résumé lisible du benchmark."""
+        cold = result['cold_start']
+        if cold:
+            print(f"\n🧊 Démarrage à froid (médiane sur {cold['runs']}): import {cold['import_ms']:.0f} ms, "
+                  f"chargement {cold['load_ms']:.0f} ms, 1er doc {cold['first_doc_ms']:.1f} ms")
+        print(f"🔥 À chaud: 1er appel {result['warm']['first_call_ms']:.2f} ms, "
+              f"appel suivant {result['warm']['warm_call_ms']:.2f} ms")
+        
+        print(f"\n⏱  Latence par requête (ms):")
+        print(f"   {'tranche':8} {'textes':>6} {'car.':>6} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7}")
+        for bucket, stats in result['latency_ms'].items():
+            print(f"   {bucket:8} {stats['n_texts']:>6} {stats['avg_chars']:>6.0f} {stats['p50_ms']:>7.2f} "
+                  f"{stats['p95_ms']:>7.2f} {stats['p99_ms']:>7.2f} {stats['max_ms']:>7.2f}")
+        
+        print(f"\n🚀 Débit nlp.pipe:")
+        for entry in result['throughput']:
+            print(f"   batch={entry['batch_size']:<4} processus={entry['n_process']:<2} "
+                  f"{entry['docs_per_second']:>8.0f} docs/s")
+        if result['peak_rss_mb'] is not None:
+            print(f"\n💾 RSS maximal: {result['peak_rss_mb']:.0f} MB")
+
+
+class StackSampler:
+    """Échantillonne périodiquement la pile Python d'un thread (sys._current_frames).
+    
+    Les piles sont agrégées au format « collapsed » (``a;b;c N``) produit par
+    py-spy ``--format raw`` et lu par flamegraph.pl ou speedscope. Les fonctions
+    Cython/C n'ayant pas de frame Python, leur temps est attribué à l'appelant.
+    """
+    
+    def __init__(self, thread_id, interval=PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+    
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+    
+    def write_folded(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _length_bucket(n_tokens):
+    """Étiquette de la tranche de longueur (PROFILE_LENGTH_BUCKETS) d'un document."""
+    lower = 1
+    for upper in PROFILE_LENGTH_BUCKETS:
+        if n_tokens <= upper:
+            return f"{lower}-{upper}"
+        lower = upper + 1
+    return f"{lower}+"
+
+
+def _length_bucket_labels():
+    return [_length_bucket(upper) for upper in PROFILE_LENGTH_BUCKETS] + [_length_bucket(PROFILE_LENGTH_BUCKETS[-1] + 1)]
+
+
+def _component_costs(bucket):
+    """Convertit des secondes cumulées par composant en ms/doc, µs/token et part du total."""
+    total = sum(bucket['seconds'].values()) or 1.0
+    docs, tokens = max(bucket['docs'], 1), max(bucket['tokens'], 1)
+    return {
+        'docs': bucket['docs'],
+        'tokens': bucket['tokens'],
+        'total_ms': total * 1000,
+        'components': {
+            name: {
+                'total_ms': seconds * 1000,
+                'ms_per_doc': seconds * 1000 / docs,
+                'us_per_token': seconds * 1e6 / tokens,
+                'share': seconds / total,
+            }
+            for name, seconds in bucket['seconds'].items()
+        },
+    }
+
+
+def iter_gold_records(path):
+    """Records de référence {"text", "labels"} d'un stockage colonnaire, d'un JSONL ou d'un DocBin (.spacy ou dossier)."""
+    path = Path(path)
+    if annotate.is_annotation_store(path):
+        yield from annotate.AnnotationStore(path)
+    elif path.is_dir() or path.suffix == '.spacy':
+        from spacy.tokens import DocBin
+        nlp = spacy.blank('xx')
+        files = sorted(path.rglob('*.spacy')) if path.is_dir() else [path]
+        for file in files:
+            for doc in DocBin().from_disk(file).get_docs(nlp.vocab):
+                yield {'text': doc.text, 'labels': [[e.start_char, e.end_char, e.label_] for e in doc.ents]}
+    else:
+        with annotate.open_text_file(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def gold_source_signature(path):
+    """Identité d'un corpus JSONL / DocBin (chemin, tailles, dates) : la conversion est réutilisée tant qu'elle ne change pas."""
+    path = Path(path).resolve()
+    files = sorted(path.rglob('*.spacy')) if path.is_dir() else [path]
+    return {'path': str(path), 'files': [[str(f.relative_to(path.parent)), f.stat().st_size, f.stat().st_mtime_ns]
+                                         for f in files]}
+
+
+def load_gold_store(path, cache_dir):
+    """Corpus de référence en stockage colonnaire.
+
+    Un JSONL / DocBin est converti dans ``cache_dir`` ; la conversion est
+    réutilisée au run suivant si la source n'a pas changé (``source.json``).
+    """
+    if annotate.is_annotation_store(path):
+        return annotate.AnnotationStore(path)
+    store_path = Path(cache_dir) / f"{Path(path).name}{annotate.STORE_SUFFIX}"
+    source_file = store_path / 'source.json'
+    signature = gold_source_signature(path)
+    if annotate.is_annotation_store(store_path) and source_file.exists() \
+            and json.loads(source_file.read_text(encoding='utf-8')) == signature:
+        print(f"♻️  Corpus de référence déjà converti: {store_path}")
+        return annotate.AnnotationStore(store_path)
+    store = gold_store_from_records(iter_gold_records(path), Path(path).name, cache_dir)
+    source_file.write_text(json.dumps(signature, indent=2), encoding='utf-8')
+    return store
+
+
+def gold_store_from_records(records, name, cache_dir):
+    """Écrit des records {"text", "labels"} dans un stockage colonnaire sous ``cache_dir`` et l'ouvre."""
+    store_path = Path(cache_dir) / f"{name}{annotate.STORE_SUFFIX}"
+    with annotate.AnnotationStoreWriter(store_path) as writer:
+        writer.write_all(records)
+    return annotate.AnnotationStore(store_path)
+
+
+def _span_columns(doc, start, end, label):
+    """Colonnes int64 (doc, start, end, label) d'un ensemble de spans."""
+    return tuple(np.asarray(column, dtype=np.int64) for column in (doc, start, end, label))
+
+
+def _span_keys(*columns):
+    """Une clé comparable par ligne (vue void d'une matrice int64) pour np.isin / np.intersect1d."""
+    matrix = np.ascontiguousarray(np.stack(columns, axis=1)) if len(columns[0]) else np.zeros((0, len(columns)), np.int64)
+    return matrix.view(np.dtype((np.void, matrix.dtype.itemsize * matrix.shape[1]))).ravel()
+
+
+def _overlap_targets(queries, targets, by_label):
+    """Pour chaque span de ``queries``, indice d'un span chevauchant de ``targets`` (ou -1).
+    
+    Les spans d'un même document (et même label si ``by_label``) ne se chevauchent
+    pas : le dernier span cible commençant avant la fin de la requête est le seul
+    candidat possible. Une recherche dichotomique (np.searchsorted) suffit.
+    """
+    q_doc, q_start, q_end, q_label = queries
+    t_doc, t_start, t_end, t_label = targets
+    if not len(q_doc) or not len(t_doc):
+        return np.full(len(q_doc), -1, dtype=np.int64)
+    n_labels = int(max(q_label.max(), t_label.max())) + 1
+    q_group = q_doc * n_labels + q_label if by_label else q_doc
+    t_group = t_doc * n_labels + t_label if by_label else t_doc
+    width = int(max(q_end.max(), t_end.max())) + 1
+    order = np.lexsort((t_start, t_group))
+    t_keys = t_group[order] * width + t_start[order]
+    candidate = np.searchsorted(t_keys, q_group * width + q_end - 1, side='right') - 1
+    found = candidate >= 0
+    target = order[np.where(found, candidate, 0)]
+    found &= (t_group[target] == q_group) & (t_end[target] > q_start)
+    return np.where(found, target, -1)
+
+
+def _prf(tp, predicted, support):
+    """Précision, rappel et F1 (tableaux ou scalaires), 0 quand le dénominateur est nul."""
+    tp, predicted, support = (np.asarray(x, dtype=float) for x in (tp, predicted, support))
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall = np.divide(tp, support, out=np.zeros_like(tp), where=support > 0)
+    return precision, recall, _f1(precision, recall)
+
+
+def _f1(precision, recall):
+    total = precision + recall
+    return np.divide(2 * precision * recall, total, out=np.zeros_like(total), where=total > 0)
+
+
+def _score_spans(gold, pred, labels):
+    """Comptages exacts / partiels par label et matrice de confusion, sans boucle par span."""
+    n = len(labels)
+    support = np.bincount(gold[3], minlength=n)
+    predicted = np.bincount(pred[3], minlength=n)
+    exact_tp = np.bincount(pred[3][np.isin(_span_keys(*pred), _span_keys(*gold))], minlength=n)
+    # Partiel : un span prédit (resp. de référence) chevauche un span de même label de l'autre côté
+    partial_pred_tp = np.bincount(pred[3][_overlap_targets(pred, gold, True) >= 0], minlength=n)
+    partial_gold_tp = np.bincount(gold[3][_overlap_targets(gold, pred, True) >= 0], minlength=n)
+    
+    # Confusion : label de référence -> label du span prédit chevauchant ; "O" (indice n) si aucun
+    gold_match = _overlap_targets(gold, pred, False)
+    pred_match = _overlap_targets(pred, gold, False)
+    gold_side = np.concatenate([gold[3], np.full((pred_match < 0).sum(), n)])
+    pred_side = np.concatenate([np.where(gold_match >= 0, pred[3][np.maximum(gold_match, 0)], n),
+                                pred[3][pred_match < 0]])
+    confusion = np.bincount(gold_side * (n + 1) + pred_side, minlength=(n + 1) ** 2).reshape(n + 1, n + 1)
+    
+    def scores(exact, partial_p, partial_r, n_pred, n_gold):
+        p, r, f = _prf(exact, n_pred, n_gold)
+        pp = _prf(partial_p, n_pred, n_gold)[0]
+        pr = _prf(partial_r, n_pred, n_gold)[1]
+        return p, r, f, pp, pr, _f1(pp, pr)
+    
+    per_label = {}
+    p, r, f, pp, pr, pf = scores(exact_tp, partial_pred_tp, partial_gold_tp, predicted, support)
+    for i, label in enumerate(labels):
+        if support[i] or predicted[i]:
+            per_label[label] = {
+                'support': int(support[i]), 'predicted': int(predicted[i]),
+                'exact': {'tp': int(exact_tp[i]), 'precision': float(p[i]), 'recall': float(r[i]), 'f1': float(f[i])},
+                'partial': {'precision': float(pp[i]), 'recall': float(pr[i]), 'f1': float(pf[i])},
+            }
+    mp, mr, mf, mpp, mpr, mpf = scores(exact_tp.sum(), partial_pred_tp.sum(), partial_gold_tp.sum(),
+                                       predicted.sum(), support.sum())
+    micro = {
+        'support': int(support.sum()), 'predicted': int(predicted.sum()),
+        'exact': {'tp': int(exact_tp.sum()), 'precision': float(mp), 'recall': float(mr), 'f1': float(mf)},
+        'partial': {'precision': float(mpp), 'recall': float(mpr), 'f1': float(mpf)},
+    }
+    return {
+        'per_label': per_label,
+        'micro': micro,
+        'confusion': {'labels': labels + ['O'], 'matrix': confusion.tolist()},
+    }
+
+
+def gold_summary(store):
+    """Taille et répartition des labels d'un corpus de référence (calculées sur les colonnes)."""
+    return {
+        'path': str(store.path),
+        'documents': len(store),
+        'spans': int(store.meta['n_spans']),
+        'label_counts': store.label_counts(),
+    }
+
+
+def _rss_to_mb(max_rss):
+    """ru_maxrss est en Ko sous Linux et en octets sous macOS."""
+    return max_rss / (1024 * 1024) if sys.platform == 'darwin' else max_rss / 1024
+
+
+def _peak_rss_mb():
+    """RSS maximal du processus courant (None si indisponible, ex. Windows)."""
+    if resource is None:
+        return None
+    return _rss_to_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def _latency_stats(timings):
+    """Moyenne et percentiles (rang le plus proche) d'une liste de latences en ms."""
+    ordered = sorted(timings)
+    percentile = lambda q: ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+    return {
+        'mean_ms': sum(ordered) / len(ordered),
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+        'max_ms': ordered[-1],
+    }
+
+
+def compare_benchmarks(current, baseline, thresholds=REGRESSION_THRESHOLDS):
+    """Compare deux résultats de benchmark et retourne la liste des régressions."""
+    regressions = []
+    
+    def check(metric, kind, new, old, higher_is_better=False):
+        if new is None or old is None or old <= 0:
+            return
+        ratio = new / old
+        limit = thresholds[kind]
+        if (ratio < 1 - limit) if higher_is_better else (ratio > 1 + limit):
+            regressions.append({'metric': metric, 'baseline': old, 'current': new, 'ratio': ratio})
+    
+    if baseline.get('schema_version') != current['schema_version']:
+        print(f"⚠️  Baseline au schéma v{baseline.get('schema_version')} (actuel v{current['schema_version']})")
+    
+    for bucket, stats in current['latency_ms'].items():
+        old_stats = baseline.get('latency_ms', {}).get(bucket, {})
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            check(f"latency_ms.{bucket}.{key}", 'latency', stats[key], old_stats.get(key))
+    
+    old_throughput = {(t['batch_size'], t['n_process']): t for t in baseline.get('throughput', [])}
+    for entry in current['throughput']:
+        old = old_throughput.get((entry['batch_size'], entry['n_process']))
+        if old:
+            check(f"throughput.batch{entry['batch_size']}.proc{entry['n_process']}", 'throughput',
+                  entry['docs_per_second'], old['docs_per_second'], higher_is_better=True)
+    
+    if current.get('cold_start') and baseline.get('cold_start'):
+        check('cold_start.total_ms', 'cold_start', current['cold_start']['total_ms'], baseline['cold_start']['total_ms'])
+    check('peak_rss_mb', 'peak_rss', current.get('peak_rss_mb'), baseline.get('peak_rss_mb'))
+    
+    return regressions
+
+
+def _print_regressions(regressions, baseline):
+    """Affiche le résultat de la comparaison avec la baseline."""
+    if not regressions:
+        print(f"\n✅ Aucune régression par rapport à {baseline}")
+        return
+    print(f"\n❌ {len(regressions)} régression(s) par rapport à {baseline}:")
+    for reg in regressions:
+        print(f"   {reg['metric']:40} {reg['baseline']:>10.2f} → {reg['current']:>10.2f} ({reg['ratio']:.2f}x)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Tests et benchmark du modèle NER immobilier.")
+    parser.add_argument('--model', default=str(MODEL_PATH),
+                        help=f"Modèle spaCy ou artefact d'inférence exporté (défaut: {MODEL_PATH})")
+    parser.add_argument('--hybrid', action='store_true',
+                        help="Règles d'annotation avant ner + chemin rapide sans modèle (6_hybrid_pipeline.py)")
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help=f"Cache LRU de résultats par requête normalisée, 0 = désactivé (suggéré: {RESULT_CACHE_SIZE})")
+    parser.add_argument('--cache-ttl', type=float, default=RESULT_CACHE_TTL,
+                        help=f"Durée de vie des entrées du cache en secondes, 0 = illimitée (défaut: {RESULT_CACHE_TTL})")
+    parser.add_argument('--profile', action='store_true',
+                        help="Profilage par composant (tokenizer, tok2vec, ner) ajouté au rapport JSON")
+    parser.add_argument('--profile-stacks', action='store_true',
+                        help="Avec --profile : fichiers cProfile (.prof) et piles échantillonnées (.folded)")
+    parser.add_argument('--gold',
+                        help="Évalue sur un corpus de référence : dossier .annstore, JSONL ou DocBin (.spacy ou dossier)")
+    parser.add_argument('--gold-cache',
+                        help="Dossier où garder la conversion de --gold (JSONL / DocBin), réutilisée tant que "
+                             "la source ne change pas (défaut: dossier temporaire supprimé en fin de run)")
+    parser.add_argument('--evaluate', action='store_true',
+                        help="Évaluation P/R/F1 ; sans --gold, sur les BILINGUAL_EXAMPLES de 1_annotate_data.py")
+    parser.add_argument('--eval-processes', type=int, default=1,
+                        help="Processus nlp.pipe de l'évaluation (défaut: 1)")
+    parser.add_argument('--eval-limit', type=int, help="Nombre max de documents évalués")
+    parser.add_argument('--benchmark-only', action='store_true',
+                        help="N'exécute que le benchmark de performances")
+    parser.add_argument('--baseline',
+                        help="JSON de benchmark de référence : signale les régressions (code de sortie 1)")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=BENCHMARK_BATCH_SIZES,
+                        help=f"Tailles de lot nlp.pipe à mesurer (défaut: {BENCHMARK_BATCH_SIZES})")
+    parser.add_argument('--processes', type=int, nargs='+', default=BENCHMARK_PROCESSES,
+                        help=f"Nombres de processus nlp.pipe à mesurer (défaut: {BENCHMARK_PROCESSES})")
+    parser.add_argument('--cold-start-runs', type=int, default=COLD_START_RUNS,
+                        help=f"Démarrages à froid mesurés, 0 pour ignorer (défaut: {COLD_START_RUNS})")
+    return parser.parse_args()
 
 
 def main():
     """Fonction principale pour exécuter tous les tests."""
+    args = parse_args()
     
     print("\n" + "🏠"*40)
     print(" "*30 + "TESTEUR NER - IMMOBILIER")
     print("🏠"*40 + "\n")
     
     # Initialisation
-    tester = NERModelTester(MODEL_PATH)
+    tester = NERModelTester(args.model, hybrid=args.hybrid, cache_size=args.cache_size, cache_ttl=args.cache_ttl)
     
     # Chargement du modèle
     if not tester.load_model():
         return
     
+    # Évaluation sur un corpus de référence (lu en colonnes mappées en mémoire)
+    if args.gold or args.evaluate:
+        with tempfile.TemporaryDirectory(prefix='gold_') as tmp_dir:
+            if args.gold:
+                if args.gold_cache:
+                    Path(args.gold_cache).mkdir(parents=True, exist_ok=True)
+                gold = load_gold_store(args.gold, args.gold_cache or tmp_dir)
+            else:
+                gold = gold_store_from_records(({'text': text, 'labels': labels}
+                                                for text, labels in annotate.BILINGUAL_EXAMPLES),
+                                               'bilingual_examples', tmp_dir)
+            summary = gold_summary(gold)
+            tester.test_results['gold_corpus'] = summary
+            print(f"\n🗃️  Corpus de référence: {summary['documents']} documents, {summary['spans']} spans")
+            tester.evaluate(gold, n_process=args.eval_processes, limit=args.eval_limit)
+            del gold  # Libère les colonnes mappées avant la suppression du dossier temporaire
+    
     # Tests complets
-    tester.run_comprehensive_tests()
+    if not args.benchmark_only:
+        tester.run_comprehensive_tests()
+    
+    # Benchmark de performances
+    _, regressions = tester.run_benchmark(batch_sizes=args.batch_sizes, n_processes=args.processes,
+                                          cold_start_runs=args.cold_start_runs, baseline=args.baseline)
+    
+    # Profilage par composant
+    if args.profile:
+        tester.profile_components(stacks=args.profile_stacks)
     
-    # Test de performances
-    tester.test_performance()
+    if args.benchmark_only:
+        if args.profile or 'evaluation' in tester.test_results:
+            tester.save_test_report()
+        return 1 if regressions else 0
     
     # Génération des visualisations
     tester.generate_html_visualizations()
@@ -478,7 +1367,8 @@ def main():
     print(f"\n📁 Résultats disponibles dans: {OUTPUT_DIR}")
     print(f"🌐 Ouvrez '{OUTPUT_DIR}/index.html' pour voir toutes les visualisations")
     print("\n")
+    return 1 if regressions else 0
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,386 @@
+# 4_serve_model.py
+# Serveur d'inférence local avec micro-batching (asyncio + nlp.pipe)
+#
+# Les requêtes HTTP concurrentes sont regroupées en micro-lots (taille max,
+# attente max) puis traitées en un seul appel nlp.pipe : le batching de
+# tok2vec et du NER est récupéré sans changer le contrat de l'API.
+#
+# Usage:
+#   python 4_serve_model.py --port 5000 --max-batch-size 32 --max-wait-ms 5
+#   curl -X POST http://localhost:5000/analyze -d '{"text": "Appartement 3 chambres à louer Tunis"}'
+#   python benchmarks/load_generator.py --url http://localhost:5000/analyze
+#
+# Mode pré-forké (Unix) : le modèle est chargé et préchauffé une seule fois
+# dans le processus parent, puis N workers sont forkés et partagent ses pages
+# mémoire en copy-on-write :
+#   python 4_serve_model.py --workers 4
+
+import argparse
+import asyncio
+import gc
+import importlib
+import json
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+test_model = importlib.import_module('3_test_model')
+
+# --- Configuration ---
+HOST = '127.0.0.1'
+PORT = 5000
+MAX_BATCH_SIZE = 32   # Requêtes max par appel nlp.pipe
+MAX_WAIT_MS = 5.0     # Attente max après la 1re requête d'un lot
+MAX_BODY_BYTES = 1_000_000
+WARMUP_TEXTS = [
+    "Appartement 3 chambres à louer Tunis 120m² 800 TND garage",
+    "4 Bedrooms Apartment for SALE in Dhaka, Area 1800 sq ft, Price 45000 t.",
+]
+
+
+class MicroBatcher:
+    """Regroupe les requêtes en micro-lots et les exécute via nlp.pipe.
+    
+    Un lot part dès qu'il atteint ``max_batch_size`` requêtes, ou
+    ``max_wait_ms`` après l'arrivée de sa première requête. L'inférence tourne
+    dans un thread dédié pour ne pas bloquer la boucle asyncio.
+    """
+    
+    def __init__(self, tester, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.tester = tester
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ner-inference')
+        self.stats = {'requests': 0, 'batches': 0, 'max_batch': 0, 'inference_s': 0.0}
+        self._task = None
+    
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        self.executor.shutdown(wait=False)
+    
+    async def submit(self, text):
+        """Ajoute un texte à la file et attend son résultat (dict de test_single_phrase)."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((text, future))
+        return await future
+    
+    async def _collect(self):
+        """Attend une requête puis complète le lot jusqu'à la taille ou au délai max."""
+        batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+    
+    def _infer(self, texts):
+        # test_phrases consulte le cache de résultats (si activé) avant nlp.pipe
+        results = self.tester.test_phrases(texts, batch_size=len(texts))
+        return [result or empty_result(text) for text, result in zip(texts, results)]
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            texts = [text for text, _ in batch]
+            start_time = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self.executor, self._infer, texts)
+            except Exception as exc:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            self.stats['inference_s'] += time.perf_counter() - start_time
+            self.stats['requests'] += len(batch)
+            self.stats['batches'] += 1
+            self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+    
+    def summary(self):
+        batches = self.stats['batches']
+        return {
+            **self.stats,
+            'avg_batch': self.stats['requests'] / batches if batches else 0.0,
+            'queued': self.queue.qsize(),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'hybrid': self.tester.hybrid_rules.summary() if self.tester.hybrid_rules else None,
+            'result_cache': self.tester.result_cache.summary() if self.tester.result_cache else None,
+        }
+
+
+def empty_result(text):
+    """Résultat d'un texte vide (le modèle n'est pas appelé, comme test_single_phrase)."""
+    return {'category': '', 'text': text, 'entities': [], 'entity_count': 0, 'has_entities': False}
+
+
+class InferenceServer:
+    """Serveur HTTP/1.1 minimal (keep-alive) au-dessus d'asyncio.
+    
+    - ``POST /analyze`` : ``{"text": "..."}`` → entités (format test_single_phrase)
+    - ``GET /health``   : état du serveur
+    - ``GET /stats``    : statistiques de micro-batching
+    """
+    
+    def __init__(self, batcher):
+        self.batcher = batcher
+    
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {'error': 'requête invalide'}, False)
+                    break
+                
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {'error': 'Content-Length invalide'}, False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': 'corps trop volumineux'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                status, payload = await self.route(method, path, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+    
+    async def route(self, method, path, body):
+        if method == 'POST' and path == '/analyze':
+            try:
+                text = json.loads(body)['text']
+            except (ValueError, KeyError, TypeError):
+                return HTTPStatus.BAD_REQUEST, {'error': 'JSON attendu: {"text": "..."}'}
+            if not isinstance(text, str):
+                return HTTPStatus.BAD_REQUEST, {'error': '"text" doit être une chaîne'}
+            if not text.strip():
+                return HTTPStatus.OK, empty_result(text)
+            return HTTPStatus.OK, await self.batcher.submit(text)
+        if method == 'GET' and path == '/health':
+            return HTTPStatus.OK, {'status': 'ok', 'pipeline': self.batcher.tester.nlp.pipe_names}
+        if method == 'GET' and path == '/stats':
+            return HTTPStatus.OK, {**self.batcher.summary(), 'pid': os.getpid(), 'memory': process_memory()}
+        return HTTPStatus.NOT_FOUND, {'error': f'route inconnue: {method} {path}'}
+    
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+
+def process_memory(pid='self'):
+    """RSS, PSS et mémoire unique (USS = pages privées) en MB, d'après /proc (Linux).
+    
+    Retourne None si /proc/<pid>/smaps_rollup n'est pas disponible.
+    """
+    fields = {'Rss': 'rss_mb', 'Pss': 'pss_mb', 'Private_Clean': 'uss_mb', 'Private_Dirty': 'uss_mb'}
+    memory = {'rss_mb': 0.0, 'pss_mb': 0.0, 'uss_mb': 0.0}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in fields:
+                    memory[fields[name]] += int(value.split()[0]) / 1024
+    except OSError:
+        return None
+    return memory
+
+
+async def serve(tester, host=HOST, port=PORT, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS,
+                sock=None, on_ready=None):
+    """Lance le serveur ; avec ``sock``, écoute sur une socket déjà ouverte (mode pré-forké)."""
+    batcher = MicroBatcher(tester, max_batch_size, max_wait_ms)
+    batcher.start()
+    handler = InferenceServer(batcher).handle_connection
+    if sock is not None:
+        server = await asyncio.start_server(handler, sock=sock)
+    else:
+        server = await asyncio.start_server(handler, host, port)
+    if on_ready is not None:
+        on_ready()
+    else:
+        print(f"🚀 Serveur NER sur http://{host}:{port} (lots ≤ {max_batch_size}, attente ≤ {max_wait_ms} ms)")
+        print(f"   POST /analyze  |  GET /health  |  GET /stats")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+
+
+def _run_worker(tester, sock, args, index, fork_time, report_fd):
+    """Corps d'un worker forké : sert sur la socket héritée et rapporte son démarrage."""
+    def on_ready():
+        start_time = time.perf_counter()
+        tester.nlp(WARMUP_TEXTS[0])
+        report = {
+            'worker': index,
+            'pid': os.getpid(),
+            'startup_ms': (start_time - fork_time) * 1000,
+            'first_call_ms': (time.perf_counter() - start_time) * 1000,
+            'memory': process_memory(),
+        }
+        os.write(report_fd, (json.dumps(report) + '\n').encode('utf-8'))
+        os.close(report_fd)
+    
+    try:
+        asyncio.run(serve(tester, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms,
+                          sock=sock, on_ready=on_ready))
+    except KeyboardInterrupt:
+        pass
+
+
+def serve_preforked(tester, args):
+    """Charge/préchauffe le modèle une fois, puis forke ``args.workers`` workers copy-on-write."""
+    if not hasattr(os, 'fork'):
+        print("❌ Le mode pré-forké nécessite os.fork (Linux/macOS). Relancez avec --workers 1.")
+        return
+    
+    # Préchauffage dans le parent : les pages touchées sont partagées par les workers
+    for doc in tester.nlp.pipe(WARMUP_TEXTS * 4):
+        pass
+    # Les objets existants ne sont plus parcourus par le GC : moins de copies CoW
+    gc.collect()
+    gc.freeze()
+    parent_memory = process_memory()
+    
+    sock = socket.create_server((args.host, args.port), backlog=1024)
+    sock.setblocking(False)
+    report_read, report_write = os.pipe()
+    
+    pids = []
+    for index in range(args.workers):
+        fork_time = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(report_read)
+            signal.signal(signal.SIGTERM, signal.default_int_handler)
+            _run_worker(tester, sock, args, index, fork_time, report_write)
+            os._exit(0)
+        pids.append(pid)
+    os.close(report_write)
+    sock.close()
+    
+    print(f"🚀 Serveur NER pré-forké sur http://{args.host}:{args.port} : {args.workers} workers "
+          f"(lots ≤ {args.max_batch_size}, attente ≤ {args.max_wait_ms} ms)")
+    with os.fdopen(report_read) as reports:
+        workers = [json.loads(line) for line in reports]
+    
+    print(f"\n   {'worker':>6} {'pid':>8} {'démarrage':>10} {'1er appel':>10} {'RSS':>8} {'PSS':>8} {'unique':>8}")
+    for report in sorted(workers, key=lambda r: r['worker']):
+        memory = report['memory'] or {}
+        print(f"   {report['worker']:>6} {report['pid']:>8} {report['startup_ms']:>8.1f}ms {report['first_call_ms']:>8.1f}ms "
+              f"{memory.get('rss_mb', 0):>6.0f}MB {memory.get('pss_mb', 0):>6.0f}MB {memory.get('uss_mb', 0):>6.0f}MB")
+    if parent_memory and all(r['memory'] for r in workers):
+        unique_total = sum(r['memory']['uss_mb'] for r in workers)
+        print(f"\n   Parent: {parent_memory['rss_mb']:.0f} MB | mémoire unique des workers: {unique_total:.0f} MB "
+              f"(vs ~{parent_memory['rss_mb'] * len(workers):.0f} MB pour {len(workers)} chargements séparés)")
+    
+    try:
+        for _ in pids:
+            os.wait()
+    except KeyboardInterrupt:
+        print("\n👋 Arrêt des workers...")
+    finally:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in pids:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serveur d'inférence NER avec micro-batching.")
+    parser.add_argument('--model', default=str(test_model.MODEL_PATH),
+                        help=f"Modèle à servir (défaut: {test_model.MODEL_PATH}, fallback model-last)")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--max-batch-size', type=int, default=MAX_BATCH_SIZE,
+                        help=f"Requêtes max par lot (défaut: {MAX_BATCH_SIZE})")
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS,
+                        help=f"Attente max pour compléter un lot (défaut: {MAX_WAIT_MS} ms)")
+    parser.add_argument('--hybrid', action='store_true',
+                        help="Règles avant ner + chemin rapide sans modèle pour les requêtes couvertes")
+    parser.add_argument('--cache-size', type=int, default=test_model.RESULT_CACHE_SIZE,
+                        help=f"Cache LRU de résultats par requête normalisée, 0 = désactivé "
+                             f"(défaut: {test_model.RESULT_CACHE_SIZE})")
+    parser.add_argument('--cache-ttl', type=float, default=test_model.RESULT_CACHE_TTL,
+                        help=f"Durée de vie des entrées du cache en secondes, 0 = illimitée (défaut: {test_model.RESULT_CACHE_TTL})")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Workers forkés partageant le modèle en copy-on-write (Unix, défaut: 1)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    tester = test_model.NERModelTester(args.model, hybrid=args.hybrid, cache_size=args.cache_size,
+                                       cache_ttl=args.cache_ttl)
+    if not tester.load_model():
+        return
+    
+    if args.workers > 1:
+        serve_preforked(tester, args)
+        return
+    
+    try:
+        asyncio.run(serve(tester, args.host, args.port, args.max_batch_size, args.max_wait_ms))
+    except KeyboardInterrupt:
+        print("\n👋 Serveur arrêté")
+
+
+if __name__ == '__main__':
+    main()
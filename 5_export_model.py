@@ -0,0 +1,239 @@
+# 5_export_model.py
+# Export d'un artefact d'inférence compact (chargement rapide, poids mappés en mémoire)
+#
+# spacy.load(model-best) recharge tout le paquet d'entraînement : StringStore
+# complète (tous les tokens vus), vocab, sérialisation msgpack copiée en RAM.
+# L'artefact exporté ne garde que ce dont ["tok2vec","ner"] a besoin pour prédire :
+#   - config.cfg      : sections [nlp] et [components] (+ [paths] / [system] référencées), déjà complétées
+#   - strings.json    : chaînes élaguées (labels NER)
+#   - tokenizer.bin   : règles du tokenizer (absent si identiques à celles du config)
+#   - <pipe>.bin      : état non pondéré des composants (cfg, transitions NER)
+#   - skeleton.msgpack: structure des modèles thinc (dims, attrs décodés) sans les poids
+#   - weights.bin     : tous les poids (tables MultiHashEmbed + NER), alignés,
+#                       mappés en mémoire (np.memmap copy-on-write) au chargement
+#
+# Usage:
+#   python 5_export_model.py --model output_model_immo_ner_bilingual_v3/model-best
+#   python benchmarks/model_loading.py
+
+import spacy
+from spacy import util
+from thinc.model import deserialize_attr
+import numpy as np
+import srsly
+import argparse
+import json
+import time
+from pathlib import Path
+
+# --- Configuration ---
+MODEL_BASE_DIR = 'output_model_immo_ner_bilingual_v3'
+MODEL_PATH = Path(MODEL_BASE_DIR) / 'model-best'
+EXPORT_PATH = Path(MODEL_BASE_DIR) / 'model-inference'
+ARTIFACT_FORMAT_VERSION = 1  # À incrémenter si la disposition des fichiers change
+MANIFEST_FILE = 'manifest.json'
+WEIGHTS_FILE = 'weights.bin'
+SKELETON_FILE = 'skeleton.msgpack'
+WEIGHTS_ALIGNMENT = 64  # Octets ; alignement de chaque tableau dans weights.bin
+INFERENCE_SECTIONS = ('paths', 'system', 'nlp', 'components')
+
+
+def is_inference_artifact(path):
+    """Vrai si ``path`` est un artefact produit par export_inference_model."""
+    return (Path(path) / MANIFEST_FILE).exists()
+
+
+def _inference_config(nlp):
+    """Config réduite aux sections nécessaires à la construction du pipeline."""
+    config = nlp.config.copy()
+    for section in list(config.keys()):
+        if section not in INFERENCE_SECTIONS:
+            del config[section]
+    return config
+
+
+def _pruned_strings(nlp):
+    """Chaînes à conserver : labels des composants (les autres sont recréées à la volée)."""
+    strings = set()
+    for name, proc in nlp.pipeline:
+        strings.update(getattr(proc, 'labels', ()))
+    return sorted(strings)
+
+
+def _split_attrs(model, skeleton):
+    """Décode à l'export les attrs msgpack génériques (un décodage par attr coûte cher au chargement).
+    
+    Les attrs ayant un désérialiseur spécifique restent sérialisés pour thinc.
+    """
+    generic = deserialize_attr.dispatch(object)
+    decoded = []
+    for node, attrs in zip(model.walk(), skeleton['attrs']):
+        node_decoded = {}
+        for attr, value in list(attrs.items()):
+            if deserialize_attr.dispatch(type(node.attrs.get(attr))) is generic:
+                node_decoded[attr] = srsly.msgpack_loads(value)
+                del attrs[attr]
+        decoded.append(node_decoded)
+    skeleton['decoded_attrs'] = decoded
+    return skeleton
+
+
+def export_inference_model(model_path=MODEL_PATH, output_path=EXPORT_PATH):
+    """Exporte ``model_path`` en artefact d'inférence compact ; retourne le manifeste."""
+    model_path, output_path = Path(model_path), Path(output_path)
+    nlp = spacy.load(model_path)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    print(f"📦 Export de {model_path} vers {output_path}...")
+    config = _inference_config(nlp)
+    config.to_disk(output_path / 'config.cfg')
+    srsly.write_json(output_path / 'strings.json', _pruned_strings(nlp))
+    # Le tokenizer construit depuis le config suffit si ses règles sont identiques
+    tokenizer_bytes = nlp.tokenizer.to_bytes(exclude=['vocab'])
+    default_tokenizer = util.load_model_from_config(config, auto_fill=False, validate=False).tokenizer
+    custom_tokenizer = tokenizer_bytes != default_tokenizer.to_bytes(exclude=['vocab'])
+    tokenizer_file = output_path / 'tokenizer.bin'
+    if custom_tokenizer:
+        tokenizer_file.write_bytes(tokenizer_bytes)
+    elif tokenizer_file.exists():
+        tokenizer_file.unlink()
+
+    skeletons = {}
+    arrays = 0
+    offset = 0
+    with open(output_path / WEIGHTS_FILE, 'wb') as weights:
+        for name, proc in nlp.pipeline:
+            (output_path / f'{name}.bin').write_bytes(proc.to_bytes(exclude=['vocab', 'model']))
+            skeleton = proc.model.to_dict()
+            # Remplace chaque tableau de paramètres par sa position dans weights.bin
+            for node_params in skeleton['params']:
+                for param_name, value in node_params.items():
+                    if value is None:
+                        continue
+                    value = np.ascontiguousarray(value)
+                    padding = -offset % WEIGHTS_ALIGNMENT
+                    weights.write(b'\0' * padding)
+                    offset += padding
+                    weights.write(value.tobytes())
+                    node_params[param_name] = {'offset': offset, 'shape': list(value.shape),
+                                               'dtype': value.dtype.str}
+                    offset += value.nbytes
+                    arrays += 1
+            skeletons[name] = _split_attrs(proc.model, skeleton)
+    (output_path / SKELETON_FILE).write_bytes(srsly.msgpack_dumps(skeletons))
+
+    manifest = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'source': str(model_path),
+        'spacy_version': spacy.__version__,
+        'pipeline': nlp.pipe_names,
+        'custom_tokenizer': custom_tokenizer,
+        'strings': len(_pruned_strings(nlp)),
+        'source_strings': len(nlp.vocab.strings),
+        'arrays': arrays,
+        'weights_bytes': offset,
+        'meta': nlp.meta,
+    }
+    srsly.write_json(output_path / MANIFEST_FILE, manifest)
+
+    print(f"✅ {arrays} tableaux ({offset / 1024 ** 2:.1f} MB) dans {WEIGHTS_FILE}")
+    print(f"   Chaînes: {manifest['source_strings']} → {manifest['strings']}")
+    return manifest
+
+
+def load_inference_model(path=EXPORT_PATH):
+    """Charge un artefact exporté ; les poids restent mappés en mémoire.
+
+    weights.bin est mappé en copy-on-write (les noyaux Cython de thinc exigent
+    des tampons inscriptibles) : les pages sont partagées par le cache disque
+    entre processus et ne sont lues qu'au premier accès.
+    """
+    path = Path(path)
+    manifest = srsly.read_json(path / MANIFEST_FILE)
+    if manifest['format_version'] != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Format d'artefact {manifest['format_version']} non supporté "
+                         f"(attendu: {ARTIFACT_FORMAT_VERSION}) ; ré-exportez le modèle.")
+
+    config = util.load_config(path / 'config.cfg')
+    # Config déjà complété à l'export : ni auto_fill ni validation
+    nlp = util.load_model_from_config(config, auto_fill=False, validate=False)
+    nlp.meta.update(manifest['meta'])
+    for string in srsly.read_json(path / 'strings.json'):
+        nlp.vocab.strings.add(string)
+    if manifest['custom_tokenizer']:
+        nlp.tokenizer.from_bytes((path / 'tokenizer.bin').read_bytes(), exclude=['vocab'])
+
+    weights = np.memmap(path / WEIGHTS_FILE, dtype=np.uint8, mode='c') if manifest['weights_bytes'] else None
+    skeletons = srsly.msgpack_loads((path / SKELETON_FILE).read_bytes())
+    for name, proc in nlp.pipeline:
+        proc.from_bytes((path / f'{name}.bin').read_bytes(), exclude=['vocab', 'model'])
+        skeleton = skeletons[name]
+        params = skeleton['params']
+        # Structure (dims, refs, attrs) d'abord, puis les poids sans copie
+        proc.model.from_dict({**skeleton, 'params': [{} for _ in params]})
+        for node, node_params, node_attrs in zip(proc.model.walk(), params, skeleton['decoded_attrs']):
+            node.attrs.update(node_attrs)
+            for param_name, ref in node_params.items():
+                value = None
+                if ref is not None:
+                    value = np.ndarray(tuple(ref['shape']), dtype=np.dtype(ref['dtype']),
+                                       buffer=weights, offset=ref['offset'])
+                node.set_param(param_name, value)
+    return nlp
+
+
+def load_model(path):
+    """Charge un artefact d'inférence ou, à défaut, un modèle spaCy classique."""
+    if is_inference_artifact(path):
+        return load_inference_model(path)
+    return spacy.load(path)
+
+
+def verify_export(model_path, export_path, texts):
+    """Compare les entités prédites par le modèle source et l'artefact ; retourne les écarts."""
+    source, exported = spacy.load(model_path), load_inference_model(export_path)
+    mismatches = []
+    for text, doc_a, doc_b in zip(texts, source.pipe(texts), exported.pipe(texts)):
+        ents_a = [(e.start_char, e.end_char, e.label_) for e in doc_a.ents]
+        ents_b = [(e.start_char, e.end_char, e.label_) for e in doc_b.ents]
+        if ents_a != ents_b:
+            mismatches.append({'text': text, 'source': ents_a, 'export': ents_b})
+    return mismatches
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export d'un artefact d'inférence compact")
+    parser.add_argument('--model', default=str(MODEL_PATH),
+                        help=f"Modèle spaCy source (défaut: {MODEL_PATH})")
+    parser.add_argument('--output', default=str(EXPORT_PATH),
+                        help=f"Dossier de l'artefact (défaut: {EXPORT_PATH})")
+    parser.add_argument('--no-verify', action='store_true',
+                        help="Ne pas comparer les prédictions source/artefact après l'export")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not Path(args.model).exists():
+        print(f"❌ ERREUR: Modèle introuvable: {args.model}")
+        raise SystemExit(1)
+
+    export_inference_model(args.model, args.output)
+
+    start_time = time.perf_counter()
+    load_inference_model(args.output)
+    print(f"⏱️  Chargement de l'artefact: {(time.perf_counter() - start_time) * 1000:.0f} ms")
+
+    if not args.no_verify:
+        texts = [
+            "4 Bedrooms Apartment for SALE in Dhaka, Area 1800 sq ft, Price 45000 t.",
+            "Appartement S+3 de 120 m² à LOUER à Tunis. État à rénover.",
+            "ACHETER une villa NEUVE de 300 mètres carrés avec PISCINE et garage.",
+            "Je cherche à ACHETER un grand S+4 de 185 m2, avec un PARKING, dans un état MODERNE à Paris.",
+        ]
+        mismatches = verify_export(args.model, args.output, texts)
+        if mismatches:
+            print(f"⚠️  {len(mismatches)} prédiction(s) différente(s) :")
+            print(json.dumps(mismatches, ensure_ascii=False, indent=2))
+            raise SystemExit(1)
+        print(f"✅ Prédictions identiques au modèle source ({len(texts)} textes)")
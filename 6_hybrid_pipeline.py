@@ -0,0 +1,240 @@
+# 6_hybrid_pipeline.py
+# Pipeline hybride règles / neuronal avec chemin rapide déterministe
+#
+# Le composant spaCy "immo_rules" réutilise les règles haute précision de
+# 1_annotate_data.py (PINNED_RULESET : codes S+N/TN, prix avec devise, surfaces
+# en m²/sqft). Les mots-clés et le format "50k", moins fiables, restent au modèle :
+#   - les spans trouvés par ces règles sont posés avant "ner", qui les respecte
+#     et ne prédit que sur les tokens restants ;
+#   - une requête courte entièrement couverte par ces règles (ex. "S+2 450 TND")
+#     ne passe pas du tout par tok2vec + ner (doc._.fast_path = True).
+#
+# Usage:
+#   python 6_hybrid_pipeline.py                      # taux de chemin rapide, latence, écarts
+#   python 3_test_model.py --hybrid
+#   python 4_serve_model.py --hybrid
+#   python 6_hybrid_pipeline.py --gazetteer location_gazetteer.json "Flat for sale in Kalabagan"
+
+from spacy.language import Language
+from spacy.tokens import Doc
+from spacy.util import minibatch
+import argparse
+import importlib
+import time
+
+annotate = importlib.import_module('1_annotate_data')
+
+# --- Configuration ---
+COMPONENT_NAME = 'immo_rules'
+LOCATION_RULER_NAME = 'location_ruler'
+NEURAL_COMPONENTS = ['tok2vec', 'ner']
+FAST_PATH_MAX_TOKENS = 12  # Au-delà, le modèle neuronal est toujours appelé
+# Mots outils tolérés hors des spans pour considérer une requête comme couverte
+FILLER_WORDS = {
+    'a', 'an', 'the', 'for', 'in', 'at', 'on', 'with', 'and', 'of', 'to', 'by',
+    'à', 'au', 'aux', 'de', 'du', 'des', 'le', 'les', 'un', 'une', 'en', 'et',
+    'pour', 'avec', 'sur', 'dans', 'par',
+}
+
+if not Doc.has_extension('fast_path'):
+    Doc.set_extension('fast_path', default=False)
+
+
+class ImmoRules:
+    """Pose les entités des règles haute précision et court-circuite le modèle si elles suffisent.
+
+    Les composants de ``neural_components`` sont désactivés dans le pipeline et
+    appelés par ce composant, uniquement pour les documents hors chemin rapide.
+    """
+
+    def __init__(self, nlp, name, labels=None, fast_path=True, max_tokens=FAST_PATH_MAX_TOKENS,
+                 neural_components=NEURAL_COMPONENTS):
+        self.nlp = nlp
+        self.name = name
+        # Labels produits par les règles haute précision, éventuellement restreints par ``labels``
+        rule_labels = {'TYPE', 'AREA', 'PRICE'}
+        self.labels = tuple(sorted(rule_labels & set(labels) if labels else rule_labels))
+        self.fast_path = fast_path
+        self.max_tokens = max_tokens
+        self.neural_components = list(neural_components)
+        self.ruleset = annotate.PINNED_RULESET
+        self.stats = {'docs': 0, 'fast_path': 0, 'rule_entities': 0}
+
+    def rule_spans(self, doc):
+        """Spans des règles, sans chevauchement ; un match qui coupe un token est ignoré."""
+        lower_text = doc.text.lower()
+        if len(lower_text) != len(doc.text):
+            return []  # Décalage des offsets après lower() (rare) : on laisse faire le modèle
+        candidates = [c for c in self.ruleset.find_spans(lower_text) if c[2] in self.labels]
+        spans = []
+        for start, end, label in annotate.resolve_overlaps(candidates):
+            span = doc.char_span(start, end, label=label, alignment_mode='strict')
+            if span is not None:
+                spans.append(span)
+        return spans
+
+    def is_covered(self, doc, spans):
+        """Vrai si chaque token est dans un span, une ponctuation ou un mot outil."""
+        if not spans or len(doc) > self.max_tokens:
+            return False
+        covered = {i for span in spans for i in range(span.start, span.end)}
+        return all(i in covered or token.is_punct or token.is_space or token.lower_ in FILLER_WORDS
+                   for i, token in enumerate(doc))
+
+    def apply_rules(self, doc):
+        """Pose les spans (les autres tokens restent « non annotés » pour ner) ; retourne le chemin rapide."""
+        spans = self.rule_spans(doc)
+        doc.set_ents(spans, default='unmodified')
+        doc._.fast_path = self.fast_path and self.is_covered(doc, spans)
+        self.stats['docs'] += 1
+        self.stats['fast_path'] += doc._.fast_path
+        self.stats['rule_entities'] += len(spans)
+        return doc._.fast_path
+
+    def __call__(self, doc):
+        if not self.apply_rules(doc):
+            for name in self.neural_components:
+                doc = self.nlp.get_pipe(name)(doc)
+        return doc
+
+    def pipe(self, docs, batch_size=128):
+        for batch in minibatch(docs, size=batch_size):
+            neural = [doc for doc in batch if not self.apply_rules(doc)]
+            for name in self.neural_components:
+                neural = list(self.nlp.get_pipe(name).pipe(neural, batch_size=batch_size))
+            yield from batch
+
+    def summary(self):
+        docs = self.stats['docs']
+        return {**self.stats, 'fast_path_rate': self.stats['fast_path'] / docs if docs else 0.0}
+
+    def reset_stats(self):
+        self.stats = dict.fromkeys(self.stats, 0)
+
+
+@Language.factory(
+    COMPONENT_NAME,
+    default_config={
+        'labels': None,
+        'fast_path': True,
+        'max_tokens': FAST_PATH_MAX_TOKENS,
+        'neural_components': NEURAL_COMPONENTS,
+    },
+)
+def make_immo_rules(nlp, name, labels, fast_path, max_tokens, neural_components):
+    return ImmoRules(nlp, name, labels, fast_path, max_tokens, neural_components)
+
+
+def add_hybrid_rules(nlp, fast_path=True, max_tokens=FAST_PATH_MAX_TOKENS, labels=None):
+    """Ajoute "immo_rules" en tête du pipeline et lui délègue tok2vec + ner ; retourne le composant."""
+    neural = [name for name in NEURAL_COMPONENTS if name in nlp.pipe_names]
+    rules = nlp.add_pipe(COMPONENT_NAME, first=True, config={
+        'labels': labels, 'fast_path': fast_path, 'max_tokens': max_tokens, 'neural_components': neural,
+    })
+    for name in neural:
+        nlp.disable_pipe(name)
+    return rules
+
+
+def add_location_ruler(nlp, gazetteer, label='LOCATION'):
+    """Ajoute un entity_ruler alimenté par l'index des lieux (1_annotate_data.py) ; retourne le composant.
+
+    Placé avant "ner" (ou juste après "immo_rules", qui appelle lui-même ner) :
+    les lieux connus sont posés sans écraser les entités existantes.
+    """
+    if not isinstance(gazetteer, annotate.LocationGazetteer):
+        gazetteer = annotate.LocationGazetteer.load(gazetteer)
+    if COMPONENT_NAME in nlp.pipe_names:
+        placement = {'after': COMPONENT_NAME}
+    elif 'ner' in nlp.pipe_names:
+        placement = {'before': 'ner'}
+    else:
+        placement = {}
+    ruler = nlp.add_pipe('entity_ruler', name=LOCATION_RULER_NAME,
+                         config={'phrase_matcher_attr': 'LOWER', 'overwrite_ents': False}, **placement)
+    with nlp.select_pipes(enable=[]):
+        ruler.add_patterns(gazetteer.entity_ruler_patterns(label))
+    return ruler
+
+
+def _p50_ms(timings):
+    return sorted(timings)[len(timings) // 2] * 1000 if timings else None
+
+
+def compare_pipelines(nlp_neural, nlp_hybrid, corpus, iterations=3):
+    """Latence par requête (p50) et entités divergentes, par tranche du corpus de benchmark.
+    
+    La latence est aussi donnée pour les seuls documents du chemin rapide,
+    comparés au modèle neuronal sur ces mêmes textes.
+    """
+    rules = nlp_hybrid.get_pipe(COMPONENT_NAME)
+    results = {}
+    for bucket, texts in corpus.items():
+        rules.reset_stats()
+        changed = 0
+        fast_texts = set()
+        for doc_a, doc_b in zip(nlp_neural.pipe(texts), nlp_hybrid.pipe(texts)):
+            ents_a = [(e.start_char, e.end_char, e.label_) for e in doc_a.ents]
+            ents_b = [(e.start_char, e.end_char, e.label_) for e in doc_b.ents]
+            changed += ents_a != ents_b
+            if doc_b._.fast_path:
+                fast_texts.add(doc_b.text)
+        summary = rules.summary()
+        
+        timings = {'neural': [], 'hybrid': [], 'fast_neural': [], 'fast_hybrid': []}
+        for _ in range(iterations):
+            for text in texts:
+                for key, nlp in (('neural', nlp_neural), ('hybrid', nlp_hybrid)):
+                    start_time = time.perf_counter()
+                    nlp(text)
+                    elapsed = time.perf_counter() - start_time
+                    timings[key].append(elapsed)
+                    if text in fast_texts:
+                        timings[f'fast_{key}'].append(elapsed)
+        results[bucket] = {
+            'texts': len(texts),
+            'fast_path_rate': summary['fast_path_rate'],
+            'changed_docs': changed,
+            **{f'{key}_p50_ms': _p50_ms(values) for key, values in timings.items()},
+        }
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pipeline hybride règles / NER : couverture et latence")
+    parser.add_argument('--model', help="Modèle à charger (défaut: celui de 3_test_model.py)")
+    parser.add_argument('--max-tokens', type=int, default=FAST_PATH_MAX_TOKENS,
+                        help=f"Longueur max d'une requête éligible au chemin rapide (défaut: {FAST_PATH_MAX_TOKENS})")
+    parser.add_argument('--iterations', type=int, default=3)
+    parser.add_argument('--gazetteer', help="Index des lieux (1_annotate_data.py --gazetteer) ajouté en entity_ruler")
+    parser.add_argument('text', nargs='*', help="Textes à analyser (sinon: corpus de benchmark)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    test_model = importlib.import_module('3_test_model')
+    model_path = args.model or test_model.MODEL_PATH
+    nlp_neural = test_model.export_model.load_model(model_path)
+    nlp_hybrid = test_model.export_model.load_model(model_path)
+    add_hybrid_rules(nlp_hybrid, max_tokens=args.max_tokens)
+    if args.gazetteer:
+        add_location_ruler(nlp_hybrid, args.gazetteer)
+
+    if args.text:
+        for doc in nlp_hybrid.pipe(args.text):
+            path = "⚡ règles" if doc._.fast_path else "🧠 règles + ner"
+            print(f"{path:<16} {doc.text}")
+            for ent in doc.ents:
+                print(f"{'':<16}   {ent.text} → {ent.label_}")
+        raise SystemExit(0)
+
+    corpus = test_model.NERModelTester(model_path).build_benchmark_corpus()
+    results = compare_pipelines(nlp_neural, nlp_hybrid, corpus, args.iterations)
+    fmt = lambda value: f"{value:.2f}ms" if value is not None else "-"
+    print(f"\n{'tranche':>8} {'textes':>7} {'rapide':>7} {'modifiés':>9} {'p50 ner':>9} {'p50 hybride':>12}"
+          f" {'rapides: ner':>13} {'→ règles':>9}")
+    for bucket, result in results.items():
+        print(f"{bucket:>8} {result['texts']:>7} {result['fast_path_rate']:>7.0%} {result['changed_docs']:>9} "
+              f"{fmt(result['neural_p50_ms']):>9} {fmt(result['hybrid_p50_ms']):>12} "
+              f"{fmt(result['fast_neural_p50_ms']):>13} {fmt(result['fast_hybrid_p50_ms']):>9}")
@@ -0,0 +1,261 @@
+# 7_normalize_entities.py
+# Normalisation vectorisée des entités en colonnes typées
+#
+# Le modèle renvoie des spans bruts ("à§³50,000 taka", "$50k", "1800 sq ft", "S+3").
+# Ce post-traitement les convertit par lots entiers (expressions régulières
+# pandas sur des colonnes, aucune boucle Python par ligne) en une table :
+#   price (float) + currency (ISO 4217), area_m2, beds / baths (entiers),
+#   type canonique + rooms (depuis S+N / TN), transaction (sale / rent), location.
+#
+# Usage:
+#   python 7_normalize_entities.py "Flat for rent 3 Bedrooms 1800 sq ft, 45k taka"
+#   python 7_normalize_entities.py --input house_price_bd.csv --column Title --output extraction.parquet
+
+import pandas as pd
+import argparse
+import importlib
+import time
+from pathlib import Path
+
+# --- Configuration ---
+CHUNK_SIZE = 10000  # Textes passés à nlp.pipe puis normalisés ensemble
+SQFT_TO_M2 = 0.09290304
+DEFAULT_CURRENCY = None  # Devise des prix sans devise explicite (ex. "5 K"), None = inconnue
+
+# Symboles / mots de devise -> code ISO 4217 (formes en minuscules)
+CURRENCIES = {
+    '৳': 'BDT', 'à§³': 'BDT', 'taka': 'BDT', 'tk': 'BDT', 'bdt': 'BDT', 't': 'BDT',
+    'tnd': 'TND', 'dt': 'TND',
+    '€': 'EUR', 'eur': 'EUR', 'euro': 'EUR', 'euros': 'EUR',
+    '$': 'USD', 'usd': 'USD', 'dollar': 'USD', 'dollars': 'USD',
+}
+# Multiplicateurs de prix (50k, 2 lakh, 3.5 crore)
+MULTIPLIERS = {
+    'k': 1e3, 'm': 1e6, 'mn': 1e6, 'million': 1e6, 'millions': 1e6,
+    'lakh': 1e5, 'lakhs': 1e5, 'lac': 1e5, 'lacs': 1e5, 'crore': 1e7, 'crores': 1e7, 'cr': 1e7,
+}
+TYPE_CANONICAL = {
+    'flat': 'apartment', 'apartment': 'apartment', 'appartement': 'apartment',
+    'house': 'house', 'maison': 'house', 'villa': 'villa', 'studio': 'studio',
+    'duplex': 'duplex', 'penthouse': 'penthouse',
+}
+TRANSACTION_CANONICAL = {
+    'sale': 'sale', 'buy': 'sale', 'vendre': 'sale', 'vente': 'sale', 'acheter': 'sale',
+    'rent': 'rent', 'louer': 'rent', 'location': 'rent',
+}
+
+NUMBER_PATTERN = r'(\d+(?:[.,\s]\d+)*)'
+# Séparateurs de milliers uniquement : 50,000 / 1.200.000 / 39 000 000
+THOUSANDS_PATTERN = r'\d{1,3}(?:([.,\s])\d{3})(?:\1\d{3})*'
+CURRENCY_PATTERN = r'(à§³|৳|\$|€|\b(?:tnd|dt|bdt|taka|tk|euros?|eur|usd|dollars?|t)\b)'
+MULTIPLIER_PATTERN = r'\d\s*(k|mn|m|millions?|lakhs?|lacs?|crores?|cr)\b'
+AREA_UNIT_PATTERN = r'(sq\.?\s?f(?:ee)?t|sqft|square\s?f(?:ee|oo)t|m\s?2|m²|mÂ²|mètres?\s?carrés?|metres?\s?carres?)'
+
+COLUMNS = ['doc_id', 'text', 'price', 'currency', 'area_m2', 'area_value', 'area_unit',
+           'beds', 'baths', 'type', 'rooms', 'transaction', 'location']
+
+
+def entity_frame(items, offset=0):
+    """Table longue (doc_id, label, text) des entités de Docs spaCy ou de résultats NERModelTester.
+
+    ``offset`` décale les doc_id (numérotation continue entre les blocs).
+    """
+    doc_ids, labels, texts = [], [], []
+    for doc_id, item in enumerate(items, offset):
+        if item is None:
+            continue
+        if isinstance(item, dict):
+            entities = ((entity['label'], entity['text']) for entity in item['entities'])
+        else:
+            entities = ((ent.label_, ent.text) for ent in item.ents)
+        for label, text in entities:
+            doc_ids.append(doc_id)
+            labels.append(label)
+            texts.append(text)
+    return pd.DataFrame({'doc_id': doc_ids, 'label': pd.Categorical(labels), 'text': pd.Series(texts, dtype=object)})
+
+
+def parse_numbers(values):
+    """Série de chaînes numériques -> float (milliers "50,000" / décimales "3.5" ou "120,5")."""
+    values = values.str.strip()
+    thousands = values.str.fullmatch(THOUSANDS_PATTERN).fillna(False).astype(bool)
+    # Sinon, seul le dernier séparateur est décimal : "1,234.5" -> "1234.5", "120,5" -> "120.5"
+    decimal = (values.str.replace(r'\s', '', regex=True)
+                     .str.replace(r'[.,](?=.*[.,])', '', regex=True)
+                     .str.replace(',', '.', regex=False))
+    cleaned = decimal.where(~thousands, values.str.replace(r'[.,\s]', '', regex=True))
+    return pd.to_numeric(cleaned, errors='coerce')
+
+
+def normalize_prices(texts, default_currency=DEFAULT_CURRENCY):
+    """price (float, multiplicateurs appliqués) et currency (ISO) d'une série de spans PRICE."""
+    lower = texts.str.lower()
+    amount = parse_numbers(lower.str.extract(NUMBER_PATTERN, expand=False))
+    multiplier = lower.str.extract(MULTIPLIER_PATTERN, expand=False).map(MULTIPLIERS).fillna(1.0)
+    currency = lower.str.extract(CURRENCY_PATTERN, expand=False).map(CURRENCIES)
+    if default_currency:
+        currency = currency.fillna(default_currency)
+    return pd.DataFrame({'price': amount * multiplier, 'currency': currency})
+
+
+def normalize_areas(texts):
+    """area_value, area_unit ('sqft' / 'm2') et area_m2 d'une série de spans AREA."""
+    lower = texts.str.lower()
+    value = parse_numbers(lower.str.extract(NUMBER_PATTERN, expand=False))
+    unit = lower.str.extract(AREA_UNIT_PATTERN, expand=False)
+    is_sqft = unit.str.match(r'sq|square').fillna(False).astype(bool)
+    unit = unit.where(unit.isna(), 'm2').mask(is_sqft, 'sqft')
+    factor = unit.map({'sqft': SQFT_TO_M2, 'm2': 1.0})
+    return pd.DataFrame({'area_value': value, 'area_unit': unit, 'area_m2': value * factor})
+
+
+def normalize_counts(texts):
+    """Premier entier d'une série de spans BEDS / BATHS ("3 Bedrooms", "2BA")."""
+    return pd.to_numeric(texts.str.extract(r'(\d+)', expand=False), errors='coerce').astype('Int64')
+
+
+def normalize_types(texts):
+    """type canonique, rooms et beds déduits de S+N (N chambres) et TN (N pièces)."""
+    lower = texts.str.lower().str.strip()
+    s_plus = pd.to_numeric(lower.str.extract(r'^s?\s*\+\s*(\d+)', expand=False), errors='coerce')
+    t_rooms = pd.to_numeric(lower.str.extract(r'^t\s*-?\s*(\d+)$', expand=False), errors='coerce')
+    kind = lower.map(TYPE_CANONICAL).mask(s_plus.notna() | t_rooms.notna(), 'apartment')
+    return pd.DataFrame({
+        'type': kind,
+        'rooms': (s_plus + 1).fillna(t_rooms).astype('Int64'),
+        'type_beds': s_plus.fillna(t_rooms - 1).clip(lower=0).astype('Int64'),
+    })
+
+
+def _first_parsed(part, column):
+    """Première ligne par document où ``column`` a pu être lue."""
+    part = part[part[column].notna()]
+    return part[~part.index.duplicated()]
+
+
+def normalize_entities(entities, n_docs=None, offset=0, texts=None, default_currency=DEFAULT_CURRENCY):
+    """Table longue d'entités -> une ligne typée par document (première valeur par label).
+
+    Les documents sans entité gardent une ligne vide si ``n_docs`` est donné.
+    Les chambres d'un S+N / TN complètent ``beds`` quand aucune entité BEDS n'est trouvée.
+    """
+    by_label = {label: group for label, group in entities.groupby('label', observed=True)}
+    empty = entities.iloc[:0]
+    parts = []
+
+    # Montant et devise (valeur et unité) viennent du même span : premier span lisible du document
+    prices = by_label.get('PRICE', empty)
+    parts.append(_first_parsed(normalize_prices(prices['text'], default_currency).set_index(prices['doc_id']), 'price'))
+    areas = by_label.get('AREA', empty)
+    parts.append(_first_parsed(normalize_areas(areas['text']).set_index(areas['doc_id']), 'area_value'))
+    for label, column in (('BEDS', 'beds'), ('BATHS', 'baths')):
+        counts = by_label.get(label, empty)
+        parts.append(normalize_counts(counts['text']).rename(column).to_frame().set_index(counts['doc_id']))
+    types = by_label.get('TYPE', empty)
+    parts.append(normalize_types(types['text']).set_index(types['doc_id']))
+    transactions = by_label.get('TRANSACTION', empty)
+    parts.append(transactions['text'].str.lower().str.strip().map(TRANSACTION_CANONICAL)
+                 .rename('transaction').to_frame().set_index(transactions['doc_id']))
+    locations = by_label.get('LOCATION', empty)
+    parts.append(locations['text'].str.strip().rename('location').to_frame().set_index(locations['doc_id']))
+
+    # groupby().first() : première valeur non nulle de chaque colonne, par document
+    records = pd.concat([part.groupby(level=0).first() for part in parts], axis=1)
+    if n_docs is not None:
+        records = records.reindex(pd.RangeIndex(offset, offset + n_docs))
+    records.index.name = 'doc_id'
+    records['beds'] = records['beds'].fillna(records.pop('type_beds'))
+    if texts is not None:
+        records['text'] = list(texts)
+    records = records.reset_index()
+    return records[[column for column in COLUMNS if column in records.columns]]
+
+
+def extract_structured(nlp, texts, chunk_size=CHUNK_SIZE, batch_size=256, n_process=1,
+                       default_currency=DEFAULT_CURRENCY):
+    """Applique ``nlp`` par blocs et produit un DataFrame typé par bloc (générateur)."""
+    chunk = []
+    offset = 0
+    for text in texts:
+        chunk.append(text)
+        if len(chunk) >= chunk_size:
+            yield _extract_chunk(nlp, chunk, offset, batch_size, n_process, default_currency)
+            offset += len(chunk)
+            chunk = []
+    if chunk:
+        yield _extract_chunk(nlp, chunk, offset, batch_size, n_process, default_currency)
+
+
+def _extract_chunk(nlp, texts, offset, batch_size, n_process, default_currency):
+    docs = nlp.pipe(texts, batch_size=batch_size, n_process=n_process)
+    return normalize_entities(entity_frame(docs, offset), len(texts), offset, texts, default_currency)
+
+
+def to_arrow(records):
+    """DataFrame -> pyarrow.Table (paquet optionnel ``pyarrow``)."""
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("La sortie Arrow nécessite le paquet 'pyarrow' (pip install pyarrow).")
+    return pyarrow.Table.from_pandas(records, preserve_index=False)
+
+
+def write_table(records, path, fmt=None):
+    """Écrit la table au format ``fmt`` ou, à défaut, selon l'extension : .parquet (pyarrow), .csv ou .jsonl."""
+    path = Path(path)
+    fmt = fmt or path.suffix.lstrip('.')
+    if fmt == 'parquet':
+        to_arrow(records)  # Message explicite si pyarrow manque
+        records.to_parquet(path, index=False)
+    elif fmt == 'jsonl':
+        records.to_json(path, orient='records', lines=True, force_ascii=False)
+    else:
+        records.to_csv(path, index=False)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extraction et normalisation des entités en colonnes typées")
+    parser.add_argument('--model', help="Modèle à charger (défaut: celui de 3_test_model.py)")
+    parser.add_argument('--hybrid', action='store_true', help="Pipeline hybride règles + NER (6_hybrid_pipeline.py)")
+    parser.add_argument('--input', help="CSV dont la colonne --column est analysée")
+    parser.add_argument('--column', default='Title', help="Colonne de texte du CSV (défaut: Title)")
+    parser.add_argument('--limit', type=int, help="Nombre max de lignes lues")
+    parser.add_argument('--output', help="Fichier de sortie (.parquet, .csv ou .jsonl)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--n-process', type=int, default=1, help="Processus nlp.pipe")
+    parser.add_argument('--default-currency', default=DEFAULT_CURRENCY,
+                        help="Devise ISO des prix sans devise explicite (ex. BDT)")
+    parser.add_argument('text', nargs='*', help="Textes à analyser")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    test_model = importlib.import_module('3_test_model')
+    tester = test_model.NERModelTester(args.model or test_model.MODEL_PATH, hybrid=args.hybrid)
+    if not tester.load_model():
+        raise SystemExit(1)
+
+    if args.input:
+        texts = pd.read_csv(args.input, usecols=[args.column], nrows=args.limit)[args.column].fillna('').astype(str)
+    else:
+        texts = args.text
+    if not len(texts):
+        print("❌ ERREUR: Aucun texte (arguments ou --input)")
+        raise SystemExit(1)
+
+    start_time = time.perf_counter()
+    records = pd.concat(extract_structured(tester.nlp, texts, args.chunk_size, n_process=args.n_process,
+                                           default_currency=args.default_currency), ignore_index=True)
+    elapsed = time.perf_counter() - start_time
+    print(f"\n⏱️  {len(records)} documents en {elapsed:.1f} s ({len(records) / elapsed:.0f} docs/s)")
+
+    if args.output:
+        write_table(records, args.output)
+        print(f"💾 Table sauvegardée: {args.output}")
+    else:
+        with pd.option_context('display.max_columns', None, 'display.width', 200):
+            print(records.head(20).to_string(index=False))
+    print("\n📊 Valeurs renseignées:")
+    for column in COLUMNS[2:]:
+        print(f"   {column:<12} {records[column].notna().mean():>6.1%}")
@@ -0,0 +1,251 @@
+# 8_bulk_extract.py
+# Extraction en masse reprenable sur de gros fichiers d'annonces
+#
+# Remplace la boucle df['description'].apply(extract_entities) de Docs/setup.md :
+#   - lecture en flux par blocs (CSV, JSONL éventuellement .gz, Parquet) ;
+#   - nlp.pipe dans un pool de processus (modèle chargé une fois via NERModelTester,
+#     avec son fallback model-last, puis hérité par fork quand c'est possible) ;
+#   - un shard de sortie par bloc, écrit dans un fichier temporaire puis renommé (atomique) ;
+#   - checkpoint.json liste les shards terminés : un job tué reprend là où il s'est arrêté.
+#
+# Usage:
+#   python 8_bulk_extract.py --input annonces.csv --column description --output extraction/ --workers 4
+#   python 8_bulk_extract.py --input annonces.csv --column description --output extraction/   # reprise
+#   python 8_bulk_extract.py --input listings.jsonl.gz --output extraction/ --format parquet --restart
+
+import pandas as pd
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+test_model = importlib.import_module('3_test_model')
+normalize = importlib.import_module('7_normalize_entities')
+
+# --- Configuration ---
+CHUNK_SIZE = 20000  # Lignes par bloc = par shard de sortie
+CHECKPOINT_FILE = 'checkpoint.json'
+CHECKPOINT_VERSION = 1  # À incrémenter si le contenu des shards change (force un redémarrage)
+SHARD_PATTERN = 'part-{:05d}.{}'
+FORMATS = ('jsonl', 'csv', 'parquet')
+DEFAULT_COLUMNS = {'.csv': 'Title', '.jsonl': 'text', '.parquet': 'Title'}
+MAX_PENDING_PER_WORKER = 2  # Blocs en vol par worker (borne la mémoire)
+
+_tester = None  # NERModelTester du processus (hérité par fork ou chargé par _init_worker)
+
+
+def input_suffix(path):
+    """Extension significative : .csv, .jsonl ou .parquet (ignore .gz / .zst / .bz2)."""
+    suffixes = [s for s in Path(path).suffixes if s not in ('.gz', '.zst', '.bz2', '.xz')]
+    return suffixes[-1] if suffixes else ''
+
+
+def iter_chunks(path, column, chunk_size=CHUNK_SIZE, id_column=None):
+    """Blocs (index, DataFrame[text(, id)]) lus en flux, sans charger tout le fichier."""
+    suffix = input_suffix(path)
+    columns = [column] + ([id_column] if id_column else [])
+    if suffix == '.csv':
+        reader = pd.read_csv(path, usecols=columns, chunksize=chunk_size)
+    elif suffix == '.jsonl':
+        reader = (chunk[columns] for chunk in pd.read_json(path, lines=True, chunksize=chunk_size))
+    elif suffix == '.parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("La lecture Parquet nécessite le paquet 'pyarrow' (pip install pyarrow).")
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns)
+        reader = (batch.to_pandas() for batch in batches)
+    else:
+        raise ValueError(f"Format d'entrée non supporté: {path} (attendu: .csv, .jsonl[.gz], .parquet)")
+    yield from enumerate(reader)
+
+
+def _init_worker(model_path, hybrid):
+    """Initialise un worker : réutilise le modèle hérité par fork, sinon le charge en silence."""
+    global _tester
+    if _tester is None:
+        _tester = test_model.NERModelTester(model_path, hybrid=hybrid)
+        with contextlib.redirect_stdout(io.StringIO()):
+            if not _tester.load_model():
+                raise RuntimeError(f"Impossible de charger le modèle: {model_path}")
+
+
+def extract_chunk(index, chunk, column, id_column, offset, batch_size, default_currency):
+    """Entités brutes + colonnes typées (7_normalize_entities.py) d'un bloc."""
+    texts = chunk[column].fillna('').astype(str).tolist()
+    docs = list(_tester.nlp.pipe(texts, batch_size=batch_size))
+    records = normalize.normalize_entities(normalize.entity_frame(docs, offset), len(texts), offset, texts,
+                                           default_currency)
+    if id_column:
+        records.insert(1, id_column, chunk[id_column].to_numpy())
+    records['entities'] = [json.dumps([[e.start_char, e.end_char, e.label_] for e in doc.ents]) for doc in docs]
+    return index, records
+
+
+def write_shard_atomic(records, path, fmt):
+    """Écrit dans un fichier temporaire du même dossier puis renomme (jamais de shard partiel)."""
+    tmp_path = path.with_name(f'.{path.name}.tmp')
+    normalize.write_table(records, tmp_path, fmt)
+    os.replace(tmp_path, path)
+
+
+def run_signature(args, model_fingerprint):
+    """Paramètres qui déterminent le contenu des shards : une reprise exige qu'ils soient identiques."""
+    stat = Path(args.input).stat()
+    signature = {
+        'version': CHECKPOINT_VERSION,
+        'input': str(Path(args.input).resolve()),
+        'input_size': stat.st_size,
+        'input_mtime_ns': stat.st_mtime_ns,
+        'column': args.column,
+        'id_column': args.id_column,
+        'chunk_size': args.chunk_size,
+        'format': args.format,
+        'default_currency': args.default_currency,
+        'model': model_fingerprint,
+    }
+    return json.loads(json.dumps(signature))  # Même forme que relu depuis checkpoint.json
+
+
+class CheckpointMismatch(ValueError):
+    """Le checkpoint du dossier de sortie appartient à un autre job (entrée, modèle ou options)."""
+
+
+class Checkpoint:
+    """Shards terminés d'un job, persistés de façon atomique dans ``checkpoint.json``."""
+
+    def __init__(self, output_dir, signature):
+        self.path = Path(output_dir) / CHECKPOINT_FILE
+        self.signature = signature
+        self.completed = {}  # index de shard -> nombre de lignes
+
+    def load(self):
+        """Reprend un checkpoint existant ; CheckpointMismatch s'il provient d'un autre job."""
+        if not self.path.exists():
+            return self
+        state = json.loads(self.path.read_text(encoding='utf-8'))
+        if state['signature'] != self.signature:
+            changed = [key for key in self.signature if state['signature'].get(key) != self.signature[key]]
+            raise CheckpointMismatch(f"Checkpoint d'un autre job ({', '.join(changed)} différent) : "
+                                     f"utilisez --restart ou un autre --output.")
+        self.completed = {int(index): rows for index, rows in state['completed'].items()}
+        return self
+
+    def mark_done(self, index, rows):
+        self.completed[index] = rows
+        tmp_path = self.path.with_name(f'.{self.path.name}.tmp')
+        tmp_path.write_text(json.dumps({'signature': self.signature, 'completed': self.completed}, indent=2),
+                            encoding='utf-8')
+        os.replace(tmp_path, self.path)
+
+
+def clear_output(output_dir):
+    """Supprime shards, temporaires et checkpoint d'un job précédent (--restart)."""
+    for path in Path(output_dir).iterdir():
+        if path.name == CHECKPOINT_FILE or path.name.startswith(('part-', '.part-', f'.{CHECKPOINT_FILE}')):
+            path.unlink()
+
+
+def run_extraction(tester, args):
+    """Traite les blocs non terminés et retourne (blocs traités, lignes traitées)."""
+    output_dir = Path(args.output)
+    checkpoint = Checkpoint(output_dir, run_signature(args, tester.model_fingerprint())).load()
+    if checkpoint.completed:
+        print(f"↩️  Reprise: {len(checkpoint.completed)} shard(s) déjà écrits "
+              f"({sum(checkpoint.completed.values())} lignes)")
+
+    def pending_chunks():
+        offset = 0
+        for index, chunk in iter_chunks(args.input, args.column, args.chunk_size, args.id_column):
+            if index not in checkpoint.completed:
+                yield index, chunk, offset
+            offset += len(chunk)
+
+    def finish(index, records):
+        write_shard_atomic(records, output_dir / SHARD_PATTERN.format(index, args.format), args.format)
+        checkpoint.mark_done(index, len(records))
+        print(f"💾 Shard {index:05d}: {len(records)} lignes")
+        return len(records)
+
+    task_args = (args.column, args.id_column)
+    done_chunks = done_rows = 0
+    global _tester
+    _tester = tester
+    if args.workers <= 1:
+        for index, chunk, offset in pending_chunks():
+            done_rows += finish(*extract_chunk(index, chunk, *task_args, offset, args.batch_size,
+                                               args.default_currency))
+            done_chunks += 1
+        return done_chunks, done_rows
+
+    # fork : les workers héritent du modèle déjà chargé ; sinon chacun le charge une fois
+    method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else None
+    if method is None:
+        _tester = None
+    with ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context(method),
+                             initializer=_init_worker, initargs=(str(tester.loaded_model_path), tester.hybrid)) as pool:
+        futures = set()
+        for index, chunk, offset in pending_chunks():
+            futures.add(pool.submit(extract_chunk, index, chunk, *task_args, offset, args.batch_size,
+                                    args.default_currency))
+            if len(futures) >= args.workers * MAX_PENDING_PER_WORKER:
+                finished, futures = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    done_rows += finish(*future.result())
+                    done_chunks += 1
+        for future in wait(futures).done:
+            done_rows += finish(*future.result())
+            done_chunks += 1
+    return done_chunks, done_rows
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extraction NER en masse, par shards, reprenable")
+    parser.add_argument('--input', required=True, help="Fichier d'annonces (.csv, .jsonl[.gz], .parquet)")
+    parser.add_argument('--output', required=True, help="Dossier des shards et du checkpoint")
+    parser.add_argument('--column', help="Colonne de texte (défaut: Title pour CSV/Parquet, text pour JSONL)")
+    parser.add_argument('--id-column', help="Colonne identifiant recopiée dans les shards")
+    parser.add_argument('--model', help="Modèle à charger (défaut: celui de 3_test_model.py)")
+    parser.add_argument('--hybrid', action='store_true', help="Pipeline hybride règles + NER (6_hybrid_pipeline.py)")
+    parser.add_argument('--format', choices=FORMATS, default='jsonl', help="Format des shards (défaut: jsonl)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help=f"Lignes par shard (défaut: {CHUNK_SIZE})")
+    parser.add_argument('--batch-size', type=int, default=test_model.BATCH_SIZE, help="Taille des lots nlp.pipe")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processus d'extraction")
+    parser.add_argument('--default-currency', help="Devise ISO des prix sans devise explicite (ex. BDT)")
+    parser.add_argument('--restart', action='store_true', help="Ignore le checkpoint et repart de zéro")
+    args = parser.parse_args()
+    if input_suffix(args.input) not in DEFAULT_COLUMNS:
+        parser.error(f"format d'entrée non supporté: {args.input} (attendu: .csv, .jsonl[.gz], .parquet)")
+    args.column = args.column or DEFAULT_COLUMNS[input_suffix(args.input)]
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not Path(args.input).exists():
+        print(f"❌ ERREUR: Fichier introuvable: {args.input}")
+        raise SystemExit(1)
+    Path(args.output).mkdir(parents=True, exist_ok=True)
+    if args.restart:
+        clear_output(args.output)
+
+    tester = test_model.NERModelTester(args.model or test_model.MODEL_PATH, hybrid=args.hybrid)
+    if not tester.load_model():
+        raise SystemExit(1)
+
+    start_time = time.perf_counter()
+    try:
+        chunks, rows = run_extraction(tester, args)
+    except CheckpointMismatch as e:
+        print(f"❌ ERREUR: {e}")
+        raise SystemExit(1)
+    elapsed = time.perf_counter() - start_time
+    print(f"\n✅ {chunks} shard(s), {rows} lignes en {elapsed:.1f} s"
+          + (f" ({rows / elapsed:.0f} docs/s)" if rows else ""))
+    print(f"   Sortie: {args.output}/{SHARD_PATTERN.format(0, args.format).replace('00000', '*')}")
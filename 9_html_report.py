@@ -0,0 +1,301 @@
+# 9_html_report.py
+# Rapport HTML paginé pour de gros volumes de prédictions
+#
+# Au lieu d'une page displacy complète par phrase, les documents sont rendus
+# en balisage léger (<mark class="e e-LABEL">) dans des pages de PAGE_SIZE
+# documents, qui partagent une seule feuille de style (report.css) :
+#   index.html   : légende, liste des pages et recherche (lit index.json)
+#   index.json   : index compact [page, n° de doc, labels, début du texte, différent]
+#   index.js     : le même index chargé par <script> (fetch est bloqué en file://)
+#   pages/*.html : pages rendues en parallèle (processus)
+#   manifest.json: empreinte de chaque page ; un nouveau run ne ré-écrit que
+#                  les pages dont au moins un document est nouveau ou modifié
+#
+# Un document peut porter une référence ("reference" : gold ou autre modèle) :
+# les différences sont alors surlignées et filtrables dans l'index.
+#
+# Usage:
+#   python 9_html_report.py --input extraction/ --output test_results/report
+#   python 9_html_report.py --input nouveau_modele.jsonl --compare ancien_modele.jsonl --only-diffs
+
+import argparse
+import gzip
+import hashlib
+import html
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# --- Configuration ---
+PAGE_SIZE = 500  # Documents par page HTML
+SNIPPET_CHARS = 80  # Début du texte conservé dans index.json (recherche)
+REPORT_FORMAT_VERSION = 1  # À incrémenter si le balisage change (force un rendu complet)
+DEFAULT_COLOR = '#DDDDDD'
+
+STYLESHEET = """body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; max-width: 1200px; margin: 0 auto;
+       padding: 30px; background: #f4f6f8; color: #2C3E50; }
+h1 { text-align: center; }
+nav { display: flex; justify-content: space-between; margin: 15px 0; }
+a { color: #3498db; text-decoration: none; }
+.doc { background: white; border-radius: 8px; padding: 12px 16px; margin: 10px 0; box-shadow: 0 2px 6px rgba(0,0,0,0.06); }
+.doc.diff { border-left: 4px solid #E74C3C; }
+.meta { color: #7F8C8D; font-size: 12px; margin-bottom: 6px; }
+.text { line-height: 2.4; }
+.ref { opacity: 0.75; border-top: 1px dashed #ccc; margin-top: 6px; }
+.e { padding: 0.25em 0.4em; margin: 0 0.15em; border-radius: 0.35em; line-height: 1; }
+.e span { font-size: 0.7em; font-weight: bold; margin-left: 0.4em; text-transform: uppercase; }
+.legend { display: flex; flex-wrap: wrap; gap: 8px; }
+#search { width: 100%; padding: 10px; font-size: 16px; margin: 10px 0; }
+#results div { padding: 4px 0; }
+"""
+
+INDEX_SCRIPT = """
+const state = {entries: REPORT_INDEX.docs};
+const ESCAPES = {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'};
+function escapeHtml(value) {
+  return String(value).replace(/[&<>"]/g, (ch) => ESCAPES[ch]);
+}
+function search() {
+  const query = document.getElementById('search').value.toLowerCase();
+  const onlyDiffs = document.getElementById('diffs').checked;
+  const results = [];
+  for (const [page, doc, labels, snippet, diff] of state.entries) {
+    if (onlyDiffs && !diff) continue;
+    if (query && !snippet.toLowerCase().includes(query) && !labels.toLowerCase().includes(query)) continue;
+    results.push(`<div><a href="pages/page-${String(page).padStart(5, '0')}.html#d${doc}">#${doc}</a> `
+                 + `<small>${escapeHtml(labels)}</small> ${escapeHtml(snippet)}</div>`);
+    if (results.length >= 200) break;
+  }
+  document.getElementById('results').innerHTML = results.join('');
+}
+"""
+
+
+def label_styles(colors):
+    """Règles CSS par label (une fois dans report.css, pas d'attribut style par entité)."""
+    rules = [f".e {{ background: {DEFAULT_COLOR}; }}"]
+    return "\n".join(rules + [f".e-{label} {{ background: {color}; }}" for label, color in colors.items()])
+
+
+def render_entities(text, entities):
+    """Balisage HTML d'un texte et de ses entités [(start, end, label)], triées et sans chevauchement."""
+    parts = []
+    position = 0
+    for start, end, label in sorted(entities):
+        if start < position:
+            continue
+        parts.append(html.escape(text[position:start]))
+        parts.append(f'<mark class="e e-{html.escape(label)}">{html.escape(text[start:end])}'
+                     f'<span>{html.escape(label)}</span></mark>')
+        position = end
+    parts.append(html.escape(text[position:]))
+    return "".join(parts)
+
+
+def normalize_record(record):
+    """Record {"text", "entities" | "labels", ["reference"], ["category"]} -> entités en triplets."""
+    def spans(value):
+        if isinstance(value, str):  # Shards de 8_bulk_extract.py : offsets sérialisés en JSON
+            value = json.loads(value)
+        return [(e['start'], e['end'], e['label']) if isinstance(e, dict) else tuple(e) for e in value or []]
+
+    entities = spans(record.get('entities', record.get('labels')))
+    reference = spans(record['reference']) if record.get('reference') is not None else None
+    return {
+        'text': record['text'],
+        'entities': entities,
+        'reference': reference,
+        'category': record.get('category', ''),
+        'diff': reference is not None and sorted(reference) != sorted(entities),
+    }
+
+
+def doc_fingerprint(record):
+    content = json.dumps([record['text'], sorted(record['entities']), record['reference'] and sorted(record['reference']),
+                          record['category']], ensure_ascii=False)
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def render_page(page, docs, title, is_last):
+    """HTML d'une page : ``docs`` = [(n° de doc, record)].
+
+    Le nombre total de pages n'apparaît pas : ajouter des documents ne touche
+    que l'ancienne dernière page (lien « suivante »).
+    """
+    rows = []
+    for doc_id, record in docs:
+        meta = f"#{doc_id}" + (f" · {html.escape(record['category'])}" if record['category'] else "")
+        reference = ""
+        if record['reference'] is not None:
+            meta += " · ⚠ différent de la référence" if record['diff'] else " · = référence"
+            reference = f'<div class="text ref">{render_entities(record["text"], record["reference"])}</div>'
+        rows.append(f'<div class="doc{" diff" if record["diff"] else ""}" id="d{doc_id}"><div class="meta">{meta}</div>'
+                    f'<div class="text">{render_entities(record["text"], record["entities"])}</div>{reference}</div>')
+
+    previous_link = f'<a href="page-{page - 1:05d}.html">← précédente</a>' if page > 1 else '<span></span>'
+    next_link = '<span></span>' if is_last else f'<a href="page-{page + 1:05d}.html">suivante →</a>'
+    nav = f'<nav>{previous_link}<a href="../index.html">index</a>{next_link}</nav>'
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(title)} – page {page}</title>'
+            f'<link rel="stylesheet" href="../report.css"></head><body><h1>{html.escape(title)}</h1>'
+            f'<p style="text-align:center">Page {page}</p>{nav}{"".join(rows)}{nav}</body></html>')
+
+
+def _write_page(path, page, docs, title, is_last):
+    """Rendu + écriture atomique d'une page (exécuté dans les workers)."""
+    tmp_path = path.with_name(f'.{path.name}.tmp')
+    tmp_path.write_text(render_page(page, docs, title, is_last), encoding='utf-8')
+    os.replace(tmp_path, path)
+    return page
+
+
+def render_index(title, n_docs, n_pages, n_diffs, colors, has_reference):
+    legend = "".join(f'<mark class="e e-{label}">{label}</mark>' for label in colors)
+    pages = " ".join(f'<a href="pages/page-{page:05d}.html">{page}</a>' for page in range(1, n_pages + 1))
+    diffs = (f'<label><input type="checkbox" id="diffs" onchange="search()"> différences uniquement ({n_diffs})</label>'
+             if has_reference else '<input type="checkbox" id="diffs" hidden>')
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(title)}</title>'
+            f'<link rel="stylesheet" href="report.css"></head><body><h1>🏠 {html.escape(title)}</h1>'
+            f'<p style="text-align:center">{n_docs} documents, {n_pages} pages de {PAGE_SIZE}</p>'
+            f'<h2>🎨 Légende</h2><div class="legend">{legend}</div>'
+            f'<h2>🔎 Recherche</h2><input id="search" placeholder="texte ou label..." oninput="search()">{diffs}'
+            f'<div id="results"></div><h2>📄 Pages</h2><p>{pages}</p>'
+            f'<script src="index.js"></script><script>{INDEX_SCRIPT}search();</script></body></html>')
+
+
+def write_report(records, output_dir, colors, title="NER Model - Prédictions", page_size=PAGE_SIZE, workers=1,
+                 only_diffs=False):
+    """Écrit le rapport paginé ; retourne {'documents', 'pages', 'rendered', 'skipped', 'diffs'}.
+
+    ``records`` est consommé en flux : le parent ne garde que l'index compact
+    et la page en cours ; au plus ``2 * workers`` pages sont en vol.
+    """
+    output_dir = Path(output_dir)
+    pages_dir = output_dir / 'pages'
+    pages_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / 'manifest.json'
+    previous = json.loads(manifest_path.read_text(encoding='utf-8')) if manifest_path.exists() else {}
+    if previous.get('format_version') != REPORT_FORMAT_VERSION or previous.get('page_size') != page_size \
+            or previous.get('title') != title:
+        previous = {}
+    previous_pages = previous.get('pages', {})
+
+    (output_dir / 'report.css').write_text(STYLESHEET + label_styles(colors) + "\n", encoding='utf-8')
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    futures = []
+    page_hashes = {}
+    stats = {'documents': 0, 'rendered': 0, 'diffs': 0}
+    index_docs = []
+    has_reference = False
+
+    def close_page(docs, digest, is_last):
+        page = len(page_hashes) + 1
+        digest.update(b'last' if is_last else b'')
+        page_hashes[page] = digest.hexdigest()
+        path = pages_dir / f'page-{page:05d}.html'
+        if previous_pages.get(str(page)) == page_hashes[page] and path.exists():
+            return
+        stats['rendered'] += 1
+        if executor is None:
+            _write_page(path, page, docs, title, is_last)
+            return
+        futures.append(executor.submit(_write_page, path, page, docs, title, is_last))
+        if len(futures) >= 2 * workers:
+            futures.pop(0).result()
+
+    try:
+        page_docs, digest = [], hashlib.blake2b(digest_size=16)
+        for doc_id, raw in enumerate(records):
+            record = normalize_record(raw)
+            if only_diffs and not record['diff']:
+                continue
+            # Page pleine : on sait maintenant qu'elle n'est pas la dernière
+            if len(page_docs) >= page_size:
+                close_page(page_docs, digest, is_last=False)
+                page_docs, digest = [], hashlib.blake2b(digest_size=16)
+            has_reference |= record['reference'] is not None
+            stats['diffs'] += record['diff']
+            stats['documents'] += 1
+            labels = " ".join(sorted({label for _, _, label in record['entities']}))
+            index_docs.append([len(page_hashes) + 1, doc_id, labels, record['text'][:SNIPPET_CHARS], int(record['diff'])])
+            page_docs.append((doc_id, record))
+            digest.update(doc_fingerprint(record).encode('ascii'))
+        if page_docs:
+            close_page(page_docs, digest, is_last=True)
+        for future in futures:
+            future.result()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    n_pages = len(page_hashes)
+    for old_page in range(n_pages + 1, previous.get('n_pages', 0) + 1):
+        (pages_dir / f'page-{old_page:05d}.html').unlink(missing_ok=True)
+    index_json = json.dumps({'docs': index_docs}, ensure_ascii=False, separators=(',', ':'))
+    (output_dir / 'index.json').write_text(index_json, encoding='utf-8')
+    (output_dir / 'index.js').write_text(f"const REPORT_INDEX = {index_json};\n", encoding='utf-8')
+    (output_dir / 'index.html').write_text(
+        render_index(title, stats['documents'], n_pages, stats['diffs'], colors, has_reference), encoding='utf-8')
+    manifest_path.write_text(json.dumps({'format_version': REPORT_FORMAT_VERSION, 'page_size': page_size, 'title': title,
+                                         'n_pages': n_pages, 'pages': page_hashes}, indent=2), encoding='utf-8')
+    return {**stats, 'pages': n_pages, 'skipped': n_pages - stats['rendered']}
+
+
+def iter_records(path):
+    """Records JSONL d'un fichier (éventuellement .gz) ou d'un dossier de shards 8_bulk_extract.py (.jsonl)."""
+    path = Path(path)
+    files = sorted(path.glob('*.jsonl*')) if path.is_dir() else [path]
+    for file in files:
+        opener = gzip.open if file.suffix == '.gz' else open
+        with opener(file, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def with_reference(records, reference_records):
+    """Associe ligne à ligne les entités d'une autre sortie (gold, ancien modèle) comme référence.
+
+    ValueError si les deux flux n'ont pas le même nombre de lignes (un rapport
+    de différences tronqué paraîtrait complet).
+    """
+    missing = object()
+    for index, (record, reference) in enumerate(itertools.zip_longest(records, reference_records, fillvalue=missing)):
+        if record is missing or reference is missing:
+            shorter = '--input' if record is missing else '--compare'
+            raise ValueError(f"{shorter} s'arrête à la ligne {index} : --input et --compare doivent avoir "
+                             f"le même nombre de lignes")
+        yield {**record, 'reference': reference.get('entities', reference.get('labels'))}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rapport HTML paginé, incrémental, rendu en parallèle")
+    parser.add_argument('--input', required=True,
+                        help="JSONL de prédictions {text, entities|labels} ou dossier de shards de 8_bulk_extract.py")
+    parser.add_argument('--compare', help="JSONL de référence (gold ou autre modèle), aligné ligne à ligne sur --input")
+    parser.add_argument('--output', default='test_results/report', help="Dossier du rapport (défaut: test_results/report)")
+    parser.add_argument('--title', default="NER Model - Prédictions")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, help=f"Documents par page (défaut: {PAGE_SIZE})")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processus de rendu")
+    parser.add_argument('--only-diffs', action='store_true', help="Avec --compare : uniquement les documents différents")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    import importlib
+    args = parse_args()
+    colors = importlib.import_module('3_test_model').COLORS
+    records = iter_records(args.input)
+    if args.compare:
+        records = with_reference(records, iter_records(args.compare))
+    try:
+        result = write_report(records, args.output, colors, args.title, args.page_size, args.workers, args.only_diffs)
+    except ValueError as e:
+        print(f"❌ ERREUR: {e}")
+        raise SystemExit(1)
+    print(f"✅ {result['documents']} documents, {result['pages']} pages "
+          f"({result['rendered']} rendues, {result['skipped']} inchangées)"
+          + (f", {result['diffs']} différences" if args.compare else ""))
+    print(f"🌐 {Path(args.output) / 'index.html'}")
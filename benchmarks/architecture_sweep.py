@@ -0,0 +1,250 @@
+# benchmarks/architecture_sweep.py
+# Balayage vitesse / précision des hyperparamètres d'architecture de config_bilingual_fixed.cfg.
+#
+# Chaque variante (produit cartésien de la grille) est entraînée avec
+# `python -m spacy train` (en mode réduit avec --quick / --max-steps), puis
+# évaluée : ents_f (meta.json de model-best), latence par requête (p50/p95),
+# débit nlp.pipe, taille sur disque et nombre de paramètres. La configuration
+# de base est toujours incluse comme référence. Sortie : tableau de Pareto
+# (ents_f ↑, p50 ↓) en Markdown + JSON détaillé.
+#
+# Usage:
+#   python benchmarks/architecture_sweep.py --train corpus/train --dev corpus/dev --quick \
+#       --grid 'width=[64,96]' 'depth=[2,4]' 'hidden_width=[32,64]'
+#   python benchmarks/architecture_sweep.py --grid 'rows=[[3500,1000,2000,2000],[7000,2000,4000,4000]]'
+
+import argparse
+import importlib
+import itertools
+import json
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+test_model = importlib.import_module('3_test_model')
+train_model = importlib.import_module('2_train_model')
+
+CONFIG_FILE = ROOT / train_model.CONFIG_FILE
+SWEEP_DIR = ROOT / 'sweeps'
+QUICK_MAX_STEPS = 600  # --quick : pas d'entraînement par variante
+TRAINING_FILE = 'training.json'  # Paramètres d'entraînement d'une variante (condition de réutilisation)
+THROUGHPUT_BATCH_SIZE = 128
+# Raccourcis de la grille -> chemins du config (width doit rester identique pour embed et encode)
+ALIASES = {
+    'width': ['components.tok2vec.model.embed.width', 'components.tok2vec.model.encode.width'],
+    'depth': ['components.tok2vec.model.encode.depth'],
+    'window_size': ['components.tok2vec.model.encode.window_size'],
+    'maxout_pieces': ['components.tok2vec.model.encode.maxout_pieces'],
+    'rows': ['components.tok2vec.model.embed.rows'],
+    'hidden_width': ['components.ner.model.hidden_width'],
+}
+DEFAULT_GRID = ['width=[64,96]', 'depth=[2,4]', 'hidden_width=[32,64]']
+
+
+def parse_grid(specs):
+    """``['width=[64,96]', ...]`` -> {'width': [64, 96], ...} (valeurs JSON)."""
+    grid = {}
+    for spec in specs:
+        key, _, values = spec.partition('=')
+        values = json.loads(values)
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"Grille invalide pour {key!r} : une liste JSON non vide est attendue ({spec})")
+        grid[key.strip()] = values
+    return grid
+
+
+def expand_grid(grid):
+    """Liste des variantes : (nom, {raccourci: valeur}), la configuration de base en premier."""
+    variants = [('base', {})]
+    keys = list(grid)
+    for values in itertools.product(*(grid[key] for key in keys)):
+        settings = dict(zip(keys, values))
+        name = '_'.join(f"{key}-{json.dumps(value).replace(' ', '').replace(',', '.')}" for key, value in settings.items())
+        variants.append((name, settings))
+    return variants
+
+
+def config_overrides(settings):
+    """Raccourcis -> overrides `--section.key valeur` de spacy train."""
+    overrides = {}
+    for key, value in settings.items():
+        for path in ALIASES.get(key, [key]):
+            overrides[path] = value
+    return overrides
+
+
+def train_variant(name, settings, sweep_dir, train_path, dev_path, max_steps=None, force=False):
+    """Entraîne une variante ; retourne son dossier.
+
+    Un model-best existant est réutilisé (sauf ``force``) seulement s'il a été
+    entraîné avec les mêmes données, overrides et ``max_steps`` (``training.json``).
+    Les chemins doivent être absolus : spacy train tourne dans ROOT.
+    """
+    output = sweep_dir / name
+    training = {'config': str(CONFIG_FILE), 'train': str(train_path), 'dev': str(dev_path),
+                'max_steps': max_steps, 'overrides': config_overrides(settings)}
+    training_file = output / TRAINING_FILE
+    if (output / 'model-best' / 'meta.json').exists() and not force:
+        previous = json.loads(training_file.read_text(encoding='utf-8')) if training_file.exists() else None
+        if previous == training:
+            print(f"⏭️  {name}: déjà entraînée")
+            return output
+        print(f"♻️  {name}: paramètres d'entraînement différents, ré-entraînement")
+
+    command = [sys.executable, '-m', 'spacy', 'train', str(CONFIG_FILE), '--output', str(output),
+               '--paths.train', str(train_path), '--paths.dev', str(dev_path)]
+    if max_steps:
+        command += ['--training.max_steps', str(max_steps),
+                    '--training.eval_frequency', str(max(max_steps // 5, 1))]
+    for path, value in config_overrides(settings).items():
+        command += [f'--{path}', json.dumps(value)]
+
+    output.mkdir(parents=True, exist_ok=True)
+    print(f"🏋️  {name}: entraînement...")
+    start_time = time.perf_counter()
+    training_file.unlink(missing_ok=True)
+    with open(output / 'train.log', 'w', encoding='utf-8') as log:
+        subprocess.run(command, stdout=log, stderr=subprocess.STDOUT, check=True, cwd=ROOT)
+    training_file.write_text(json.dumps(training, indent=2), encoding='utf-8')
+    print(f"✅ {name}: entraînée en {time.perf_counter() - start_time:.0f} s")
+    return output
+
+
+def count_parameters(nlp):
+    """Nombre de poids des modèles thinc du pipeline."""
+    total = 0
+    for _, proc in nlp.pipeline:
+        model = getattr(proc, 'model', None)
+        if model is None or not hasattr(model, 'walk'):
+            continue
+        for node in model.walk():
+            for param in node.param_names:
+                if node.has_param(param):
+                    total += node.get_param(param).size
+    return total
+
+
+def measure_variant(model_dir, corpus, iterations=2, batch_size=THROUGHPUT_BATCH_SIZE):
+    """ents_f (meta.json), latence par requête, débit nlp.pipe, taille et paramètres de model-best."""
+    model_path = model_dir / 'model-best'
+    nlp = test_model.export_model.load_model(model_path)
+    performance = json.loads((model_path / 'meta.json').read_text(encoding='utf-8')).get('performance', {})
+
+    requests = corpus['short'] + corpus['title']
+    for text in requests[:20]:
+        nlp(text)  # Préchauffage
+    timings = []
+    for _ in range(iterations):
+        for text in requests:
+            start_time = time.perf_counter()
+            nlp(text)
+            timings.append((time.perf_counter() - start_time) * 1000)
+
+    documents = corpus['title'] + corpus['long']
+    start_time = time.perf_counter()
+    for _ in nlp.pipe(documents, batch_size=batch_size):
+        pass
+    docs_per_second = len(documents) / (time.perf_counter() - start_time)
+
+    return {
+        'ents_f': performance.get('ents_f'),
+        'ents_p': performance.get('ents_p'),
+        'ents_r': performance.get('ents_r'),
+        'latency_ms': test_model._latency_stats(timings),
+        'docs_per_second': docs_per_second,
+        'size_mb': sum(f.stat().st_size for f in model_path.rglob('*') if f.is_file()) / 1024 ** 2,
+        'parameters': count_parameters(nlp),
+    }
+
+
+def pareto_front(results):
+    """Marque les variantes non dominées sur (ents_f max, p50 min)."""
+    for result in results:
+        f1, p50 = result['ents_f'] or 0.0, result['latency_ms']['p50_ms']
+        result['pareto'] = not any(
+            (other['ents_f'] or 0.0) >= f1 and other['latency_ms']['p50_ms'] <= p50
+            and ((other['ents_f'] or 0.0) > f1 or other['latency_ms']['p50_ms'] < p50)
+            for other in results if other is not result
+        )
+    return results
+
+
+def pareto_table(results):
+    """Tableau Markdown trié par latence, relatif à la variante de base."""
+    base = next(r for r in results if r['name'] == 'base')
+    lines = [
+        "| variante | ents_f | Δ F1 (pts) | p50 ms | p95 ms | accélération | docs/s | taille MB | paramètres | Pareto |",
+        "|---|---|---|---|---|---|---|---|---|---|",
+    ]
+    for r in sorted(results, key=lambda r: r['latency_ms']['p50_ms']):
+        f1 = (r['ents_f'] or 0.0) * 100
+        delta = f1 - (base['ents_f'] or 0.0) * 100
+        speedup = base['latency_ms']['p50_ms'] / r['latency_ms']['p50_ms']
+        lines.append(
+            f"| {r['name']} | {f1:.2f} | {delta:+.2f} | {r['latency_ms']['p50_ms']:.2f} | "
+            f"{r['latency_ms']['p95_ms']:.2f} | x{speedup:.2f} | {r['docs_per_second']:.0f} | "
+            f"{r['size_mb']:.1f} | {r['parameters']:,} | {'★' if r['pareto'] else ''} |"
+        )
+    return "\n".join(lines)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Balayage d'architectures : ents_f vs latence (Pareto).")
+    parser.add_argument('--grid', nargs='+', default=DEFAULT_GRID,
+                        help=f"Raccourci ou chemin de config = liste JSON (raccourcis: {', '.join(ALIASES)})")
+    parser.add_argument('--train', default=ROOT / train_model.TRAIN_OUTPUT_FILE, help="Données d'entraînement (.spacy ou dossier)")
+    parser.add_argument('--dev', default=ROOT / train_model.DEV_OUTPUT_FILE, help="Données de dev (.spacy ou dossier)")
+    parser.add_argument('--output', help=f"Dossier du balayage (défaut: {SWEEP_DIR.name}/sweep_<date>)")
+    parser.add_argument('--quick', action='store_true', help=f"Entraînement réduit ({QUICK_MAX_STEPS} pas)")
+    parser.add_argument('--max-steps', type=int, help="Pas d'entraînement par variante (prioritaire sur --quick)")
+    parser.add_argument('--jobs', type=int, default=1, help="Entraînements en parallèle (mesures toujours séquentielles)")
+    parser.add_argument('--force', action='store_true', help="Ré-entraîne les variantes déjà présentes")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # Chemins absolus : vérifiés depuis le répertoire courant, utilisés par spacy train depuis ROOT
+    args.train, args.dev = Path(args.train).resolve(), Path(args.dev).resolve()
+    for path in (args.train, args.dev):
+        if not path.exists():
+            print(f"❌ ERREUR: Données introuvables: {path} (voir 2_train_model.py)")
+            return 1
+
+    sweep_dir = Path(args.output) if args.output else SWEEP_DIR / f"sweep_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    sweep_dir = sweep_dir.resolve()
+    sweep_dir.mkdir(parents=True, exist_ok=True)
+    variants = expand_grid(parse_grid(args.grid))
+    max_steps = args.max_steps or (QUICK_MAX_STEPS if args.quick else None)
+    print(f"🧪 {len(variants)} variantes → {sweep_dir}" + (f" ({max_steps} pas)" if max_steps else ""))
+
+    # 1. Entraînements (éventuellement en parallèle)
+    with ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as executor:
+        model_dirs = list(executor.map(
+            lambda variant: train_variant(*variant, sweep_dir, args.train, args.dev, max_steps, args.force), variants))
+
+    # 2. Mesures séquentielles (aucun entraînement concurrent ne fausse la latence)
+    corpus = test_model.NERModelTester(test_model.MODEL_PATH).build_benchmark_corpus()
+    results = []
+    for (name, settings), model_dir in zip(variants, model_dirs):
+        print(f"⏱️  {name}: mesure...")
+        results.append({'name': name, 'settings': settings, 'overrides': config_overrides(settings),
+                        **measure_variant(model_dir, corpus)})
+
+    table = pareto_table(pareto_front(results))
+    print("\n" + table)
+    (sweep_dir / 'pareto.md').write_text(table + "\n", encoding='utf-8')
+    with open(sweep_dir / 'results.json', 'w', encoding='utf-8') as f:
+        json.dump({'config': str(CONFIG_FILE), 'max_steps': max_steps, 'grid': args.grid, 'results': results},
+                  f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Résultats: {sweep_dir / 'pareto.md'} et {sweep_dir / 'results.json'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
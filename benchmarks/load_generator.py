@@ -0,0 +1,123 @@
+# benchmarks/load_generator.py
+# Générateur de charge local pour 4_serve_model.py : N clients concurrents
+# (connexions keep-alive) envoient des requêtes POST /analyze tirées du corpus
+# de benchmark de 3_test_model.py, puis le débit et la latence sont mesurés.
+#
+# Usage: python benchmarks/load_generator.py --url http://127.0.0.1:5000/analyze --concurrency 32 --requests 5000
+
+import argparse
+import asyncio
+import importlib
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+test_model = importlib.import_module('3_test_model')
+
+
+async def _http_request(reader, writer, method, host, path, payload=None):
+    """Envoie une requête HTTP/1.1 keep-alive et retourne (status, corps JSON)."""
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else b''
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body
+    )
+    await writer.drain()
+    
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def _client(url, texts, counter, total, latencies, errors):
+    """Un client virtuel : une connexion, requêtes enchaînées jusqu'à épuisement du quota."""
+    reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+    try:
+        while counter[0] < total:
+            text = texts[counter[0] % len(texts)]
+            counter[0] += 1
+            start_time = time.perf_counter()
+            try:
+                status, _ = await _http_request(reader, writer, 'POST', url.netloc, url.path, {'text': text})
+            except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+                errors.append('connexion')
+                break
+            if status != 200:
+                errors.append(status)
+            else:
+                latencies.append((time.perf_counter() - start_time) * 1000)
+    finally:
+        writer.close()
+
+
+async def run_load(url, texts, concurrency, total):
+    """Lance ``concurrency`` clients pour ``total`` requêtes ; retourne le résumé."""
+    url = urlsplit(url)
+    counter, latencies, errors = [0], [], []
+    start_time = time.perf_counter()
+    await asyncio.gather(*(_client(url, texts, counter, total, latencies, errors) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start_time
+    
+    server_stats = None
+    try:
+        reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+        _, server_stats = await _http_request(reader, writer, 'GET', url.netloc, '/stats')
+        writer.close()
+    except (ConnectionError, OSError):
+        pass
+    
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'elapsed_s': elapsed,
+        'requests_per_second': len(latencies) / elapsed,
+        'latency_ms': test_model._latency_stats(latencies) if latencies else None,
+        'server': server_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Générateur de charge pour le serveur NER.")
+    parser.add_argument('--url', default=f"http://127.0.0.1:5000/analyze")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32],
+                        help="Nombre(s) de clients concurrents (un run par valeur)")
+    parser.add_argument('--requests', type=int, default=2000, help="Requêtes par run")
+    parser.add_argument('--corpus', choices=['short', 'title', 'long', 'all'], default='all')
+    parser.add_argument('--seed', type=int, default=test_model.BENCHMARK_SEED)
+    parser.add_argument('--output', help="Sauvegarde les résultats en JSON")
+    args = parser.parse_args()
+    
+    corpus = test_model.NERModelTester(test_model.MODEL_PATH).build_benchmark_corpus(seed=args.seed)
+    texts = [t for bucket, ts in corpus.items() for t in ts if args.corpus in ('all', bucket)]
+    random.Random(args.seed).shuffle(texts)
+    
+    results = []
+    print(f"{'clients':>8} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'erreurs':>8} {'lot moyen':>10}")
+    for concurrency in args.concurrency:
+        result = asyncio.run(run_load(args.url, texts, concurrency, args.requests))
+        results.append(result)
+        latency = result['latency_ms'] or {}
+        avg_batch = (result['server'] or {}).get('avg_batch', 0.0)
+        print(f"{concurrency:>8} {result['requests_per_second']:>8.0f} {latency.get('p50_ms', 0):>8.2f} "
+              f"{latency.get('p95_ms', 0):>8.2f} {latency.get('p99_ms', 0):>8.2f} {result['errors']:>8} {avg_batch:>10.1f}")
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Résultats sauvegardés: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
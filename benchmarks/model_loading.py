@@ -0,0 +1,99 @@
+# benchmarks/model_loading.py
+# Démarrage à froid : spacy.load(model-best) vs artefact d'inférence de 5_export_model.py.
+# Chaque mesure tourne dans un processus neuf (import + chargement + premier appel),
+# avec la mémoire après chargement (RSS, PSS, pages privées) et le RSS maximal.
+#
+# Usage: python benchmarks/model_loading.py --runs 5
+
+import argparse
+import importlib
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+export_model = importlib.import_module('5_export_model')
+
+TEXT = "Appartement S+3 de 120 m² à LOUER à Tunis, 800 TND, avec garage."
+
+LOADERS = {
+    'spacy.load': "import spacy\nload = spacy.load\n",
+    'artefact': (
+        "import importlib\n"
+        f"sys.path.insert(0, {str(ROOT)!r})\n"
+        "load = importlib.import_module('5_export_model').load_inference_model\n"
+    ),
+}
+
+SCRIPT = """import json, sys, time
+t0 = time.perf_counter()
+{loader}t1 = time.perf_counter()
+nlp = load(sys.argv[1])
+t2 = time.perf_counter()
+nlp(sys.argv[2])
+t3 = time.perf_counter()
+memory = {{}}
+try:
+    fields = {{'Rss': 'rss_mb', 'Pss': 'pss_mb', 'Private_Clean': 'uss_mb', 'Private_Dirty': 'uss_mb'}}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if name in fields:
+                memory[fields[name]] = memory.get(fields[name], 0) + int(value.split()[0]) / 1024
+except OSError:
+    pass
+try:
+    import resource
+    memory['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+except ImportError:
+    pass
+print(json.dumps({{'import_ms': (t1 - t0) * 1000, 'load_ms': (t2 - t1) * 1000,
+                  'first_doc_ms': (t3 - t2) * 1000, **memory}}))
+"""
+
+
+def measure(loader, model_path, runs):
+    """Médiane de ``runs`` démarrages à froid pour un chargeur donné."""
+    script = SCRIPT.format(loader=LOADERS[loader])
+    measures = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', script, str(model_path), TEXT],
+                                capture_output=True, text=True, check=True, cwd=ROOT).stdout
+        measures.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: sorted(m[key] for m in measures)[len(measures) // 2] for key in measures[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps de chargement et mémoire : spacy.load vs artefact.")
+    parser.add_argument('--model', default=str(export_model.MODEL_PATH))
+    parser.add_argument('--artifact', default=str(export_model.EXPORT_PATH))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help="Sauvegarde les résultats en JSON")
+    args = parser.parse_args()
+
+    if not export_model.is_inference_artifact(args.artifact):
+        export_model.export_inference_model(args.model, args.artifact)
+
+    results = {
+        'spacy.load': measure('spacy.load', args.model, args.runs),
+        'artefact': measure('artefact', args.artifact, args.runs),
+    }
+
+    print(f"\n{'chargeur':>12} {'import':>9} {'chargement':>11} {'1er doc':>9} {'RSS':>8} {'privé':>8} {'RSS max':>8}")
+    for loader, result in results.items():
+        peak = result.get('peak_rss_kb', 0) / 1024
+        print(f"{loader:>12} {result['import_ms']:>7.0f}ms {result['load_ms']:>9.0f}ms {result['first_doc_ms']:>7.1f}ms "
+              f"{result.get('rss_mb', 0):>6.0f}MB {result.get('uss_mb', 0):>6.0f}MB {peak:>6.0f}MB")
+    base, artifact = results['spacy.load'], results['artefact']
+    print(f"\n⏱️  Chargement: x{base['load_ms'] / artifact['load_ms']:.1f} plus rapide")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'runs': args.runs, 'text': TEXT, 'results': results}, f, indent=2)
+        print(f"💾 Résultats sauvegardés: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/overlap_resolution.py
+# Compare la résolution des chevauchements de 1_annotate_data.py (bisect)
+# à l'ancienne boucle quadratique, en fonction du nombre de candidats.
+#
+# Usage: python benchmarks/overlap_resolution.py [--sizes 10 100 1000 5000]
+
+import argparse
+import importlib
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+annotate = importlib.import_module('1_annotate_data')
+
+LABELS = sorted(set(annotate.KEYWORDS.values()) | {'BEDS', 'BATHS', 'AREA', 'PRICE', 'LOCATION'})
+
+
+def resolve_overlaps_quadratic(candidates):
+    """Ancienne implémentation (référence) : chaque candidat contre tous les spans retenus."""
+    final_annotations = []
+    for start, end, tag in sorted(candidates, key=lambda x: (x[1] - x[0]), reverse=True):
+        is_overlapping = False
+        for fs, fe, ftag in final_annotations:
+            if max(start, fs) < min(end, fe):
+                is_overlapping = True
+                break
+        if not is_overlapping:
+            final_annotations.append((start, end, tag))
+    final_annotations.sort(key=lambda x: x[0])
+    return final_annotations
+
+
+def make_candidates(n, rng):
+    """Candidats synthétiques : description longue avec mots-clés et nombres répétés."""
+    text_length = n * 8
+    candidates = []
+    for _ in range(n):
+        start = rng.randrange(text_length)
+        candidates.append((start, start + rng.randint(0, 20), rng.choice(LABELS)))
+    return candidates
+
+
+def best_time(func, candidates, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func(candidates)
+        best = min(best, time.perf_counter() - start_time)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la résolution des chevauchements.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 100, 500, 1000, 5000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'candidats':>10} {'quadratique (ms)':>18} {'bisect (ms)':>12} {'gain':>8}")
+    for n in args.sizes:
+        candidates = make_candidates(n, rng)
+        expected = resolve_overlaps_quadratic(candidates)
+        assert annotate.resolve_overlaps(candidates) == expected, "Résultats différents !"
+
+        quadratic = best_time(resolve_overlaps_quadratic, candidates, args.repeat)
+        sweep = best_time(annotate.resolve_overlaps, candidates, args.repeat)
+        print(f"{n:>10} {quadratic * 1000:>18.3f} {sweep * 1000:>12.3f} {quadratic / sweep:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()